@@ -0,0 +1,120 @@
+# Cold-start benchmark: in fresh Python processes, measures the import time of ro_wordpiece,
+# the construction time of a RoBertWordPieceTokenizer and the latency of its first two encodes.
+# The 'lazy' mode is the normal usage, in which transformers is not imported and the
+# lexicon is only loaded by the first encode; the 'eager' mode imports transformers and
+# loads the lexicon upfront, like the CLI tools and workers used to do.
+# Run it from the root of the repository with:
+# python3 -m benchmarks.bench_coldstart [-r <process count>] [-o <results .json>]
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+import numpy as np
+from benchmarks.bench_suite import read_corola_sentences, write_stand_in_lexicon, train_stand_in_vocab
+from rodna.tokenizer import RoTokenizer
+
+
+_repo_folder = Path(__file__).parent.parent
+_default_vocab_file = _repo_folder / 'model' / 'vocab.txt'
+_child_code = '''
+import sys
+import json
+from time import perf_counter
+start = perf_counter()
+if sys.argv[1] == 'eager':
+    import transformers
+import ro_wordpiece
+import_seconds = perf_counter() - start
+start = perf_counter()
+tokenizer = ro_wordpiece.RoBertWordPieceTokenizer.from_file(vocab=sys.argv[2])
+if sys.argv[1] == 'eager':
+    tokenizer._lexicon_pretokenizer._romanian_tokenizer.load_lexicon()
+construct_seconds = perf_counter() - start
+start = perf_counter()
+tokenizer.encode('Sîntem OK şi ar trebui să-mi meargă, în principiu.')
+first_encode_seconds = perf_counter() - start
+start = perf_counter()
+tokenizer.encode('Ia s-o vedem de fapt, dacă pîrîie cum trebuie.')
+second_encode_seconds = perf_counter() - start
+print(json.dumps({
+    'import': import_seconds,
+    'construct': construct_seconds,
+    'first_encode': first_encode_seconds,
+    'second_encode': second_encode_seconds,
+    'total': import_seconds + construct_seconds + first_encode_seconds,
+    'transformers_imported': 'transformers' in sys.modules
+}))
+'''
+
+
+def run_child(mode: str, vocab_file: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', _child_code, mode, vocab_file],
+                            cwd=_repo_folder, capture_output=True, text=True, check=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_coldstart(vocab_file: str, repeat: int = 5) -> dict:
+    results = {}
+
+    for mode in ['eager', 'lazy']:
+        runs = [run_child(mode, vocab_file) for _ in range(repeat)]
+        results[mode] = {key: float(np.median([x[key] for x in runs]))
+                         for key in ['import', 'construct', 'first_encode', 'second_encode', 'total']}
+        results[mode]['transformers_imported'] = runs[0]['transformers_imported']
+    # end for
+
+    return results
+
+
+if __name__ == '__main__':
+    repeat_count = 5
+    output_json = None
+
+    while len(sys.argv) > 2 and sys.argv[1] in ['-r', '-o']:
+        if sys.argv[1] == '-r':
+            repeat_count = int(sys.argv[2])
+        else:
+            output_json = sys.argv[2]
+        # end if
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        if 'RWPT_WORDFORMS' not in os.environ and not os.path.exists(RoTokenizer.default_wordforms_file):
+            os.environ['RWPT_WORDFORMS'] = os.path.join(tmp_folder, 'wordforms.txt')
+            write_stand_in_lexicon(read_corola_sentences(), os.environ['RWPT_WORDFORMS'])
+        # end if
+
+        if os.path.exists(_default_vocab_file):
+            coldstart_vocab_file = str(_default_vocab_file)
+        else:
+            coldstart_vocab_file = train_stand_in_vocab(tmp_folder)
+        # end if
+
+        coldstart_results = run_coldstart(coldstart_vocab_file, repeat=repeat_count)
+    # end with
+
+    print(f'Median of [{repeat_count}] fresh processes, in milliseconds:')
+    print(f'{"mode":<8}{"import":>10}{"construct":>12}{"1st encode":>12}{"2nd encode":>12}{"total":>10}' +
+          '  transformers imported')
+
+    for mode, values in coldstart_results.items():
+        print(f'{mode:<8}{values["import"] * 1000:10.1f}{values["construct"] * 1000:12.1f}' +
+              f'{values["first_encode"] * 1000:12.1f}{values["second_encode"] * 1000:12.1f}' +
+              f'{values["total"] * 1000:10.1f}  {values["transformers_imported"]}')
+    # end for
+
+    print('Cold-start speed-up: ' +
+          f'{coldstart_results["eager"]["total"] / coldstart_results["lazy"]["total"]:.2f}x')
+
+    if output_json is not None:
+        with open(output_json, mode='w', encoding='utf-8') as f:
+            json.dump(coldstart_results, f, indent=2)
+        # end with
+    # end if
@@ -0,0 +1,81 @@
+# Per-keystroke latency of re-encoding an edited document: encoding the whole
+# document again vs. the IncrementalEncoder, for documents of increasing size.
+# Each keystroke inserts or deletes one character at a random position.
+# Run it from the root of the repository with:
+# python3 -m benchmarks.bench_incremental [<keystroke count>]
+
+import sys
+import random
+from pathlib import Path
+from time import perf_counter
+import numpy as np
+from benchmarks.bench_suite import read_corola_sentences
+from ro_incremental import IncrementalEncoder
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+_default_vocab_file = Path(__file__).parent.parent / 'model' / 'vocab.txt'
+
+
+def make_keystrokes(text_length: int, count: int, seed: int = 1234) -> list[tuple[int, int, str]]:
+    """Alternating insertions and deletions, such that the document length stays the same."""
+
+    rnd = random.Random(seed)
+    keystrokes = []
+
+    for i in range(count):
+        position = rnd.randint(0, text_length - 1)
+
+        if i % 2 == 0:
+            keystrokes.append((position, position, rnd.choice('aeiîșt ')))
+        else:
+            keystrokes.append((position, position + 1, ''))
+        # end if
+    # end for
+
+    return keystrokes
+
+
+def run_incremental(tokenizer: RoBertWordPieceTokenizer, text: str, keystrokes: list) -> dict:
+    full_times = []
+    document = text
+
+    for start, end, replacement in keystrokes:
+        document = document[:start] + replacement + document[end:]
+        begin = perf_counter()
+        tokenizer.encode(document, add_special_tokens=False)
+        full_times.append(perf_counter() - begin)
+    # end for
+
+    encoder = IncrementalEncoder(tokenizer, text)
+    incremental_times = []
+
+    for start, end, replacement in keystrokes:
+        begin = perf_counter()
+        encoder.edit(start, end, replacement)
+        incremental_times.append(perf_counter() - begin)
+    # end for
+
+    return {
+        'full_ms': float(np.median(full_times)) * 1000,
+        'incremental_ms': float(np.median(incremental_times)) * 1000,
+        'incremental_p99_ms': float(np.percentile(incremental_times, 99)) * 1000,
+        'widened': encoder.stats['widened']
+    }
+
+
+if __name__ == '__main__':
+    keystroke_count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    bench_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=str(_default_vocab_file))
+    sentences = read_corola_sentences()
+
+    print(f'Median of [{keystroke_count}] keystrokes, in milliseconds:')
+    print(f'{"chars":>10}{"full":>10}{"incremental":>14}{"inc. p99":>10}{"widened":>9}')
+
+    for sentence_count in [10, 100, 300]:
+        doc_text = ' '.join([sentences[i % len(sentences)] for i in range(sentence_count)])
+        results = run_incremental(bench_tokenizer, doc_text,
+                                  make_keystrokes(len(doc_text), keystroke_count))
+        print(f'{len(doc_text):>10}{results["full_ms"]:10.2f}{results["incremental_ms"]:14.2f}' +
+              f'{results["incremental_p99_ms"]:10.2f}{results["widened"]:>9}')
+    # end for
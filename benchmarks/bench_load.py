@@ -0,0 +1,112 @@
+# Load-time benchmark: in fresh Python processes, measures the time to a ready
+# RoBertWordPieceTokenizer (lexicon loaded, first encode done), when built from
+# vocab.txt and the word forms file, as RoBertWordPieceTokenizer.from_file() does,
+# and when loaded from the RoBertWordPieceTokenizer.save_pretrained() artifact folder.
+# Run it from the root of the repository with:
+# python3 -m benchmarks.bench_load [-r <process count>] [-o <results .json>]
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+import numpy as np
+from benchmarks.bench_suite import read_corola_sentences, write_stand_in_lexicon, train_stand_in_vocab
+from rodna.tokenizer import RoTokenizer
+
+
+_repo_folder = Path(__file__).parent.parent
+_default_vocab_file = _repo_folder / 'model' / 'vocab.txt'
+_child_code = '''
+import sys
+import json
+from time import perf_counter
+import ro_wordpiece
+start = perf_counter()
+if sys.argv[1] == 'from_file':
+    tokenizer = ro_wordpiece.RoBertWordPieceTokenizer.from_file(vocab=sys.argv[2])
+    tokenizer._lexicon_pretokenizer._romanian_tokenizer.load_lexicon()
+else:
+    tokenizer = ro_wordpiece.RoBertWordPieceTokenizer.from_pretrained(sys.argv[2])
+load_seconds = perf_counter() - start
+start = perf_counter()
+tokenizer.encode('Sîntem OK şi ar trebui să-mi meargă, în principiu.')
+first_encode_seconds = perf_counter() - start
+print(json.dumps({
+    'load': load_seconds,
+    'first_encode': first_encode_seconds,
+    'total': load_seconds + first_encode_seconds
+}))
+'''
+
+
+def run_child(mode: str, path: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', _child_code, mode, path],
+                            cwd=_repo_folder, capture_output=True, text=True, check=True).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_load(vocab_file: str, pretrained_folder: str, repeat: int = 5) -> dict:
+    results = {}
+
+    for mode, path in [('from_file', vocab_file), ('from_pretrained', pretrained_folder)]:
+        runs = [run_child(mode, path) for _ in range(repeat)]
+        results[mode] = {key: float(np.median([x[key] for x in runs]))
+                         for key in ['load', 'first_encode', 'total']}
+    # end for
+
+    return results
+
+
+if __name__ == '__main__':
+    repeat_count = 5
+    output_json = None
+
+    while len(sys.argv) > 2 and sys.argv[1] in ['-r', '-o']:
+        if sys.argv[1] == '-r':
+            repeat_count = int(sys.argv[2])
+        else:
+            output_json = sys.argv[2]
+        # end if
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        if 'RWPT_WORDFORMS' not in os.environ and not os.path.exists(RoTokenizer.default_wordforms_file):
+            os.environ['RWPT_WORDFORMS'] = os.path.join(tmp_folder, 'wordforms.txt')
+            write_stand_in_lexicon(read_corola_sentences(), os.environ['RWPT_WORDFORMS'])
+        # end if
+
+        if os.path.exists(_default_vocab_file):
+            load_vocab_file = str(_default_vocab_file)
+        else:
+            load_vocab_file = train_stand_in_vocab(tmp_folder)
+        # end if
+
+        from ro_wordpiece import RoBertWordPieceTokenizer
+
+        load_pretrained_folder = os.path.join(tmp_folder, 'pretrained')
+        RoBertWordPieceTokenizer.from_file(vocab=load_vocab_file).save_pretrained(load_pretrained_folder)
+        load_results = run_load(load_vocab_file, load_pretrained_folder, repeat=repeat_count)
+    # end with
+
+    print(f'Median of [{repeat_count}] fresh processes, in milliseconds:')
+    print(f'{"mode":<18}{"load":>10}{"1st encode":>12}{"total":>10}')
+
+    for mode, values in load_results.items():
+        print(f'{mode:<18}{values["load"] * 1000:10.1f}{values["first_encode"] * 1000:12.1f}' +
+              f'{values["total"] * 1000:10.1f}')
+    # end for
+
+    print('Load speed-up: ' +
+          f'{load_results["from_file"]["total"] / load_results["from_pretrained"]["total"]:.2f}x')
+
+    if output_json is not None:
+        with open(output_json, mode='w', encoding='utf-8') as f:
+            json.dump(load_results, f, indent=2)
+        # end with
+    # end if
@@ -0,0 +1,385 @@
+# Throughput, latency, startup time and memory benchmarks of the Romanian tokenization
+# pipeline, with the plain BertWordPieceTokenizer as a reference. The inputs are the
+# CoRoLa sample sentences and synthetic short and long texts made from them.
+# If rodna/data/wordforms.txt is missing, a stand-in lexicon is made from the CoRoLa samples,
+# and if model/vocab.txt is missing, a stand-in vocabulary is trained on them,
+# so absolute numbers are only comparable between runs with the same lexicon and vocabulary.
+# Run it from the root of the repository with:
+# python3 -m benchmarks.bench_suite [-r <repeat count>] [-o <results .json>] [-b <baseline .json>] [-t <tolerance>]
+# or compare two stored results, without running the benchmarks, with:
+# python3 -m benchmarks.bench_suite -c <results .json> -b <baseline .json> [-t <tolerance>]
+# Regressions are printed and make the exit code 1.
+
+import os
+import re
+import sys
+import json
+import random
+import platform
+import resource
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from typing import Callable
+import numpy as np
+
+
+results_format_version = 1
+_repo_folder = Path(__file__).parent.parent
+_corola_folder = _repo_folder / 'corola'
+_default_vocab_file = _repo_folder / 'model' / 'vocab.txt'
+_word_pattern = re.compile(r'\w+(?:-\w+)*')
+
+
+def read_corola_sentences() -> list[str]:
+    sentences = []
+
+    for txt in sorted(os.listdir(_corola_folder)):
+        if txt.endswith('.txt'):
+            with open(_corola_folder / txt, mode='r', encoding='utf-8') as f:
+                sentences.extend([line.strip() for line in f if line.strip()])
+            # end with
+        # end if
+    # end for
+
+    return sentences
+
+
+def make_datasets(sentences: list[str], seed: int = 1234) -> dict[str, list[str]]:
+    """The benchmark inputs: the CoRoLa sentences, short texts of 2 to 6 words
+    and long texts of 40 sentences each."""
+
+    rnd = random.Random(seed)
+    words = [x for sentence in sentences for x in sentence.split()]
+    short_texts = [' '.join(rnd.choices(words, k=rnd.randint(2, 6))) for _ in range(len(sentences))]
+    long_texts = [' '.join(rnd.choices(sentences, k=40)) for _ in range(10)]
+
+    return {'corola': sentences, 'short': short_texts, 'long': long_texts}
+
+
+def write_stand_in_lexicon(sentences: list[str], output_file: str) -> None:
+    """Writes the word forms of `sentences`, as is and lowercased, as a small `wordforms.txt`."""
+
+    wordforms = set()
+
+    for sentence in sentences:
+        for word in _word_pattern.findall(sentence):
+            wordforms.add(word)
+            wordforms.add(word.lower())
+        # end for
+    # end for
+
+    with open(output_file, mode='w', encoding='utf-8') as f:
+        f.writelines([x + '\n' for x in sorted(wordforms)])
+    # end with
+
+
+def train_stand_in_vocab(output_folder: str) -> str:
+    from benchmarks.bench_training import make_training_files
+    from ro_wordpiece import RoBertWordPieceTokenizer
+
+    tokenizer = RoBertWordPieceTokenizer(train_mode=True)
+    tokenizer.train(files=make_training_files(output_folder, repeat=2, file_count=1),
+                    vocab_size=5000, min_frequency=1, show_progress=False)
+    tokenizer.save_model(directory=output_folder)
+
+    return os.path.join(output_folder, 'vocab.txt')
+
+
+def current_rss_mb() -> float:
+    """The resident set size of this process, or its peak value where `/proc` is not available."""
+
+    try:
+        with open('/proc/self/statm', mode='r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        # end with
+    except (OSError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, KiB on Linux
+        return max_rss / (1024 * 1024) if sys.platform == 'darwin' else max_rss / 1024
+    # end try
+
+
+def measure_startup(name: str, factory: Callable, results: dict):
+    """Calls `factory()`, records its time and RSS increase and returns its result."""
+
+    rss_before = current_rss_mb()
+    start = perf_counter()
+    instance = factory()
+    seconds = perf_counter() - start
+    results[name] = {'seconds': seconds, 'rss_mb_delta': current_rss_mb() - rss_before}
+
+    return instance
+
+
+def measure_calls(function: Callable, texts: list[str], repeat: int, batch_size: int = 0) -> dict:
+    """Calls `function` on each text, or on batches of `batch_size` texts, `repeat` times,
+    after one warm-up call. Latencies are per call, i.e. per text or per batch."""
+
+    if batch_size > 0:
+        inputs = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    else:
+        inputs = texts
+    # end if
+
+    function(inputs[0])
+    latencies = []
+
+    for _ in range(repeat):
+        for x in inputs:
+            start = perf_counter()
+            function(x)
+            latencies.append(perf_counter() - start)
+        # end for
+    # end for
+
+    seconds = float(sum(latencies))
+    items = len(texts) * repeat
+    chars = sum([len(x) for x in texts]) * repeat
+    latencies_ms = np.asarray(latencies) * 1000.
+
+    return {
+        'calls': len(latencies),
+        'items': items,
+        'chars': chars,
+        'seconds': seconds,
+        'items_per_second': items / seconds,
+        'chars_per_second': chars / seconds,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies_ms, 50)),
+            'p90': float(np.percentile(latencies_ms, 90)),
+            'p99': float(np.percentile(latencies_ms, 99)),
+            'max': float(latencies_ms.max())
+        }
+    }
+
+
+def run_benchmarks(repeat: int = 3, batch_size: int = 64) -> dict:
+    # Only meaningful if nothing was imported before
+    startup = {}
+    rss_before = current_rss_mb()
+    start = perf_counter()
+    from tokenizers import BertWordPieceTokenizer
+    from ro_normalizer import RomanianNormalizer
+    from ro_pretokenizer import RomanianPreTokenizer
+    from ro_wordpiece import RoBertWordPieceTokenizer, RoBertPreTrainedTokenizer
+    from rodna.tokenizer import RoTokenizer
+    startup['import'] = {'seconds': perf_counter() - start, 'rss_mb_delta': current_rss_mb() - rss_before}
+
+    sentences = read_corola_sentences()
+    datasets = make_datasets(sentences)
+    lexicon = 'wordforms.txt'
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        if 'RWPT_WORDFORMS' not in os.environ:
+            if not os.path.exists(RoTokenizer.default_wordforms_file):
+                lexicon = 'stand-in'
+                os.environ['RWPT_WORDFORMS'] = os.path.join(tmp_folder, 'wordforms.txt')
+                write_stand_in_lexicon(sentences, os.environ['RWPT_WORDFORMS'])
+            # end if
+        else:
+            lexicon = os.environ['RWPT_WORDFORMS']
+        # end if
+
+        if os.path.exists(_default_vocab_file):
+            vocab_file = str(_default_vocab_file)
+            vocabulary = 'model/vocab.txt'
+        else:
+            vocab_file = train_stand_in_vocab(tmp_folder)
+            vocabulary = 'stand-in'
+        # end if
+
+        # The lexicon is loaded lazily, so the startup figures include loading it,
+        # while the stand-in wordforms.txt still exists
+        def make_ro_tokenizer():
+            instance = RoTokenizer()
+            instance.load_lexicon()
+            return instance
+
+        def make_ro_pretokenizer():
+            instance = RomanianPreTokenizer()
+            instance._romanian_tokenizer.load_lexicon()
+            return instance
+
+        def make_ro_wordpiece():
+            instance = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+            instance._lexicon_pretokenizer._romanian_tokenizer.load_lexicon()
+            return instance
+
+        def make_ro_pretrained():
+            instance = RoBertPreTrainedTokenizer.from_pretrained(vocab_file, model_max_length=512)
+            instance._ro_wordpiece_tokenizer._lexicon_pretokenizer._romanian_tokenizer.load_lexicon()
+            return instance
+
+        ro_normalizer = measure_startup('RomanianNormalizer', RomanianNormalizer, startup)
+        ro_tokenizer = measure_startup('RoTokenizer', make_ro_tokenizer, startup)
+        ro_pretokenizer = measure_startup('RomanianPreTokenizer', make_ro_pretokenizer, startup)
+        ro_wordpiece = measure_startup('RoBertWordPieceTokenizer', make_ro_wordpiece, startup)
+        ro_pretrained = measure_startup('RoBertPreTrainedTokenizer', make_ro_pretrained, startup)
+        bert_wordpiece = measure_startup(
+            'BertWordPieceTokenizer',
+            lambda: BertWordPieceTokenizer(vocab_file, lowercase=False, strip_accents=False), startup)
+
+        if lexicon == 'stand-in':
+            del os.environ['RWPT_WORDFORMS']
+        # end if
+    # end with
+
+    targets = [
+        ('RomanianNormalizer.normalize_str', ro_normalizer.normalize_str, 0),
+        ('RomanianNormalizer.normalize_batch', ro_normalizer.normalize_batch, batch_size),
+        ('RoTokenizer.tokenize', ro_tokenizer.tokenize, 0),
+        ('RomanianPreTokenizer.pre_tokenize_str', ro_pretokenizer.pre_tokenize_str, 0),
+        ('RoBertWordPieceTokenizer.encode', ro_wordpiece.encode, 0),
+        ('RoBertWordPieceTokenizer.encode_batch', ro_wordpiece.encode_batch, batch_size),
+        ('RoBertPreTrainedTokenizer.__call__', lambda x: ro_pretrained(text=x), 0),
+        ('BertWordPieceTokenizer.encode', bert_wordpiece.encode, 0),
+        ('BertWordPieceTokenizer.encode_batch', bert_wordpiece.encode_batch, batch_size)
+    ]
+    benchmarks = {}
+
+    for name, function, function_batch_size in targets:
+        for dataset_name, texts in datasets.items():
+            print(f'Running [{name}] on [{dataset_name}]', file=sys.stderr, flush=True)
+            benchmarks[f'{name}/{dataset_name}'] = \
+                measure_calls(function, texts, repeat=repeat, batch_size=function_batch_size)
+        # end for
+    # end for
+
+    return {
+        'version': results_format_version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'lexicon': lexicon,
+        'vocabulary': vocabulary,
+        'repeat': repeat,
+        'batch_size': batch_size,
+        'startup': startup,
+        'benchmarks': benchmarks,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float = 0.15) -> list[str]:
+    """Returns the regressions of `results` with respect to `baseline`: throughputs that are lower,
+    or median latencies and startup times that are higher, by more than `tolerance`."""
+
+    regressions = []
+
+    for key, values in results['benchmarks'].items():
+        if key not in baseline['benchmarks']:
+            continue
+        # end if
+
+        base_values = baseline['benchmarks'][key]
+
+        if values['items_per_second'] < base_values['items_per_second'] * (1. - tolerance):
+            regressions.append(f'[{key}] throughput: {values["items_per_second"]:.1f} items/s, ' +
+                               f'baseline {base_values["items_per_second"]:.1f} items/s')
+        # end if
+
+        if values['latency_ms']['p50'] > base_values['latency_ms']['p50'] * (1. + tolerance):
+            regressions.append(f'[{key}] p50 latency: {values["latency_ms"]["p50"]:.3f} ms, ' +
+                               f'baseline {base_values["latency_ms"]["p50"]:.3f} ms')
+        # end if
+    # end for
+
+    for key, values in results['startup'].items():
+        if key in baseline['startup'] and \
+                values['seconds'] > baseline['startup'][key]['seconds'] * (1. + tolerance):
+            regressions.append(f'[{key}] startup: {values["seconds"]:.3f} s, ' +
+                               f'baseline {baseline["startup"][key]["seconds"]:.3f} s')
+        # end if
+    # end for
+
+    for key in ['lexicon', 'vocabulary']:
+        if results.get(key) != baseline.get(key):
+            print(f'Warning: the {key} differs from the baseline one, ' +
+                  f'[{results.get(key)}] vs. [{baseline.get(key)}]', file=sys.stderr, flush=True)
+        # end if
+    # end for
+
+    return regressions
+
+
+def print_results(results: dict) -> None:
+    print(f'Lexicon: {results["lexicon"]}, vocabulary: {results["vocabulary"]}')
+
+    for key, values in results['startup'].items():
+        print(f'{key:<45} startup {values["seconds"]:9.3f} s {values["rss_mb_delta"]:9.1f} MB')
+    # end for
+
+    for key, values in results['benchmarks'].items():
+        latency = values['latency_ms']
+        print(f'{key:<52} {values["items_per_second"]:11.1f} items/s ' +
+              f'{values["chars_per_second"]:13.1f} chars/s ' +
+              f'p50 {latency["p50"]:8.3f} ms p99 {latency["p99"]:8.3f} ms')
+    # end for
+
+    print(f'Max RSS: {results["max_rss_mb"]:.1f} MB')
+
+
+if __name__ == '__main__':
+    repeat_count = 3
+    output_json = None
+    baseline_json = None
+    current_json = None
+    tolerance = 0.15
+
+    while len(sys.argv) > 2 and sys.argv[1] in ['-r', '-o', '-b', '-c', '-t']:
+        match sys.argv[1]:
+            case '-r':
+                repeat_count = int(sys.argv[2])
+            case '-o':
+                output_json = sys.argv[2]
+            case '-b':
+                baseline_json = sys.argv[2]
+            case '-c':
+                current_json = sys.argv[2]
+            case _:
+                tolerance = float(sys.argv[2])
+        # end match
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 1 or (current_json is not None and baseline_json is None):
+        print('Usage: python3 -m benchmarks.bench_suite [-r <repeat count>] [-o <results .json>] ' +
+              '[-b <baseline .json>] [-c <results .json to compare, instead of running>] [-t <tolerance>]',
+              file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    if current_json is not None:
+        with open(current_json, mode='r', encoding='utf-8') as f:
+            bench_results = json.load(f)
+        # end with
+    else:
+        bench_results = run_benchmarks(repeat=repeat_count)
+    # end if
+
+    print_results(bench_results)
+
+    if output_json is not None:
+        with open(output_json, mode='w', encoding='utf-8') as f:
+            json.dump(bench_results, f, indent=2)
+        # end with
+    # end if
+
+    if baseline_json is not None:
+        with open(baseline_json, mode='r', encoding='utf-8') as f:
+            bench_regressions = compare_results(bench_results, json.load(f), tolerance=tolerance)
+        # end with
+
+        for regression in bench_regressions:
+            print(f'REGRESSION {regression}')
+        # end for
+
+        if bench_regressions:
+            exit(1)
+        # end if
+
+        print(f'No regressions, with a tolerance of {tolerance:.0%}')
+    # end if
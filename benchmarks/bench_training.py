@@ -0,0 +1,128 @@
+# Compares the Python (TrainingPreTokenizer) and the native (built-in tokenizers
+# components) training pipelines of the RoBertWordPieceTokenizer, on the CoRoLa samples.
+# Run it from the root of the repository with:
+# python3 -m benchmarks.bench_training [<repeat count>]
+
+import os
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+from time import perf_counter
+from ro_normalizer import RomanianNormalizer
+from ro_pretokenizer import RomanianPreTokenizer
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+_corola_folder = Path(__file__).parent.parent / 'corola'
+
+
+def make_training_files(output_folder: str, repeat: int, file_count: int = 4) -> list[str]:
+    """Normalizes and pre-tokenizes the CoRoLa sample sentences, like `ro_traindata.py` does,
+    and writes them `repeat` times in `file_count` training files."""
+
+    ro_normal = RomanianNormalizer()
+    ro_pretok = RomanianPreTokenizer()
+    lines = []
+
+    for txt in sorted(os.listdir(_corola_folder)):
+        if txt.endswith('.txt'):
+            with open(_corola_folder / txt, mode='r', encoding='utf-8') as f:
+                for sentence in f:
+                    sentence = ro_normal.normalize_str(sentence)
+                    tokens = ro_pretok.pre_tokenize_str(sentence)
+                    lines.append('_tk_'.join([x[0] for x in tokens]) + '\n')
+                # end for
+            # end with
+        # end if
+    # end for
+
+    training_files = []
+
+    for i in range(file_count):
+        training_file = os.path.join(output_folder, f'train-{i + 1}.txt')
+
+        with open(training_file, mode='w', encoding='utf-8') as f:
+            for _ in range(repeat):
+                f.writelines(lines)
+            # end for
+        # end with
+
+        training_files.append(training_file)
+    # end for
+
+    return training_files
+
+
+def count_words(training_files: list[str], tokenizer: RoBertWordPieceTokenizer) -> Counter:
+    """Computes the word counts that the WordPiece trainer sees, i.e. the input of the training."""
+
+    normalizer = tokenizer.normalizer
+    pre_tokenizer = tokenizer.pre_tokenizer
+    word_counts = Counter()
+
+    for training_file in training_files:
+        with open(training_file, mode='r', encoding='utf-8') as f:
+            for line in f:
+                if normalizer is not None:
+                    line = normalizer.normalize_str(line)
+                # end if
+
+                word_counts.update([x[0] for x in pre_tokenizer.pre_tokenize_str(line)])
+            # end for
+        # end with
+    # end for
+
+    return word_counts
+
+
+def train_vocabulary(tokenizer: RoBertWordPieceTokenizer,
+                     training_files: list[str]) -> tuple[dict[str, int], float]:
+    start_time = perf_counter()
+    tokenizer.train(files=training_files, vocab_size=30000,
+                    min_frequency=2, show_progress=False)
+    train_time = perf_counter() - start_time
+
+    return tokenizer.get_vocab(), train_time
+
+
+def vocabulary_overlap(vocab_1: dict[str, int], vocab_2: dict[str, int]) -> float:
+    terms_1 = set(vocab_1)
+    terms_2 = set(vocab_2)
+
+    return len(terms_1 & terms_2) / len(terms_1 | terms_2)
+
+
+if __name__ == '__main__':
+    repeat_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    python_tokenizer = RoBertWordPieceTokenizer(train_mode=True, native_train=False)
+    native_tokenizer = RoBertWordPieceTokenizer(train_mode=True, native_train=True)
+
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        files = make_training_files(output_folder=tmp_folder, repeat=repeat_count)
+
+        # 1. Training input has to be the same
+        if count_words(files, python_tokenizer) != count_words(files, native_tokenizer):
+            print('ERROR: the two pipelines produce different training words!',
+                  file=sys.stderr, flush=True)
+            exit(1)
+        # end if
+
+        print('The two pipelines produce identical training word counts.')
+
+        # 2. Training time
+        python_vocab, python_time = train_vocabulary(python_tokenizer, files)
+        native_vocab, native_time = train_vocabulary(native_tokenizer, files)
+        python_vocab_2, _ = train_vocabulary(
+            RoBertWordPieceTokenizer(train_mode=True, native_train=False), files)
+    # end with
+
+    print(f'Python pre-tokenizer: {python_time:.3f}s, {len(python_vocab)} vocabulary entries')
+    print(f'Native pre-tokenizer: {native_time:.3f}s, {len(native_vocab)} vocabulary entries')
+    print(f'Speed-up: {python_time / native_time:.2f}x')
+    # The WordPieceTrainer breaks ties between equally frequent pairs in a random order,
+    # so two runs on the same input may differ slightly. Report the run-to-run baseline as well.
+    print('Vocabulary overlap, Python vs. native: ' +
+          f'{vocabulary_overlap(python_vocab, native_vocab):.4f}')
+    print('Vocabulary overlap, Python vs. Python: ' +
+          f'{vocabulary_overlap(python_vocab, python_vocab_2):.4f}')
@@ -0,0 +1,155 @@
+# Per-worker startup time and memory of RoBertWordPieceTokenizer workers:
+# - spawn: each worker rebuilds the tokenizer from the vocabulary and lexicon files,
+#   or unpickles it (with its lexicon snapshot), as a DataLoader worker would;
+# - fork: the workers share the tokenizer of the parent, with or without
+#   prepare_for_fork() (gc.freeze()); reported is the memory that each worker
+#   had to copy (Private_Dirty, Linux only) after a garbage collection and some encodes.
+# Run it from the root of the repository with:
+# python3 -m benchmarks.bench_workers [<worker count>]
+
+import os
+import sys
+import gc
+import json
+import pickle
+import subprocess
+import multiprocessing
+from pathlib import Path
+from time import perf_counter, sleep
+import numpy as np
+from benchmarks.bench_suite import read_corola_sentences, current_rss_mb
+
+
+_repo_folder = Path(__file__).parent.parent
+_default_vocab_file = _repo_folder / 'model' / 'vocab.txt'
+_worker_stats = {}
+_worker_tokenizer = None
+_worker_texts = []
+
+
+def private_dirty_mb() -> float:
+    """The memory written by this process, i.e. not shared (anymore) with its parent."""
+
+    try:
+        with open('/proc/self/smaps_rollup', mode='r') as f:
+            for line in f:
+                if line.startswith('Private_Dirty:'):
+                    return int(line.split()[1]) / 1024
+                # end if
+            # end for
+        # end with
+    except OSError:
+        pass
+    # end try
+
+    return float('nan')
+
+
+def _init_from_files(vocab_file: str) -> None:
+    global _worker_tokenizer
+    from ro_wordpiece import RoBertWordPieceTokenizer
+
+    start = perf_counter()
+    _worker_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+    _worker_tokenizer.encode('Merg acasă.')
+    _worker_stats.update({'startup_seconds': perf_counter() - start, 'rss_mb': current_rss_mb()})
+
+
+def _init_from_pickle(pickled_tokenizer: bytes) -> None:
+    global _worker_tokenizer
+    # Import before timing, as in _init_from_files()
+    import ro_wordpiece
+
+    start = perf_counter()
+    _worker_tokenizer = pickle.loads(pickled_tokenizer)
+    _worker_tokenizer.encode('Merg acasă.')
+    _worker_stats.update({'startup_seconds': perf_counter() - start, 'rss_mb': current_rss_mb()})
+
+
+def _get_worker_stats(_) -> tuple[int, dict]:
+    sleep(0.05)
+    return os.getpid(), dict(_worker_stats)
+
+
+def _encode_in_fork(_) -> tuple[int, float]:
+    sleep(0.05)
+    gc.collect()
+
+    for text in _worker_texts:
+        _worker_tokenizer.encode(text)
+    # end for
+
+    return os.getpid(), private_dirty_mb()
+
+
+def run_spawn(vocab_file: str, worker_count: int, from_pickle: bool) -> dict:
+    from ro_wordpiece import RoBertWordPieceTokenizer
+
+    if from_pickle:
+        tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+        tokenizer.encode('Merg acasă.')
+        initializer, initargs = _init_from_pickle, (pickle.dumps(tokenizer),)
+    else:
+        initializer, initargs = _init_from_files, (vocab_file,)
+    # end if
+
+    with multiprocessing.get_context('spawn').Pool(worker_count, initializer=initializer,
+                                                   initargs=initargs) as pool:
+        stats = dict(pool.map(_get_worker_stats, range(4 * worker_count), chunksize=1))
+    # end with
+
+    return {'startup_seconds': float(np.median([x['startup_seconds'] for x in stats.values()])),
+            'rss_mb': float(np.median([x['rss_mb'] for x in stats.values()]))}
+
+
+def run_fork(vocab_file: str, worker_count: int, freeze: bool) -> dict:
+    global _worker_tokenizer, _worker_texts
+    from ro_wordpiece import RoBertWordPieceTokenizer
+
+    _worker_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+    _worker_texts = read_corola_sentences()
+
+    if freeze:
+        _worker_tokenizer.prepare_for_fork()
+    else:
+        _worker_tokenizer.encode('Merg acasă.')
+    # end if
+
+    with multiprocessing.get_context('fork').Pool(worker_count) as pool:
+        stats = dict(pool.map(_encode_in_fork, range(4 * worker_count), chunksize=1))
+    # end with
+
+    return {'private_dirty_mb': float(np.median(list(stats.values())))}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == 'fork':
+        # Each fork mode runs in its own process, as gc.freeze() cannot be undone
+        print(json.dumps(run_fork(sys.argv[2], worker_count=int(sys.argv[3]), freeze=False)))
+        exit(0)
+    elif len(sys.argv) == 4 and sys.argv[1] == 'fork-freeze':
+        print(json.dumps(run_fork(sys.argv[2], worker_count=int(sys.argv[3]), freeze=True)))
+        exit(0)
+    # end if
+
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    bench_vocab_file = str(_default_vocab_file)
+
+    if not os.path.exists(bench_vocab_file):
+        print(f'Vocabulary file [{bench_vocab_file}] is missing', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    for label, pickled in [('spawn, rebuilt from files', False), ('spawn, unpickled', True)]:
+        spawn_stats = run_spawn(bench_vocab_file, workers, from_pickle=pickled)
+        print(f'{label:<32} startup {spawn_stats["startup_seconds"] * 1000:8.1f} ms, ' +
+              f'RSS {spawn_stats["rss_mb"]:8.1f} MB')
+    # end for
+
+    for label, mode in [('fork', 'fork'), ('fork, prepare_for_fork()', 'fork-freeze')]:
+        output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_workers', mode,
+                                 bench_vocab_file, str(workers)],
+                                cwd=_repo_folder, capture_output=True, text=True, check=True).stdout
+        fork_stats = json.loads(output.strip().splitlines()[-1])
+        print(f'{label:<32} copied memory per worker {fork_stats["private_dirty_mb"]:8.1f} MB')
+    # end for
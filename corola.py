@@ -3,18 +3,27 @@
 
 import sys
 import os
-import re
+from collections import Counter
+from multiprocessing import Pool
+from typing import Iterator
 from tqdm import tqdm
+from ro_corpusio import open_corpus, list_corpus_files, CorpusWriter
+from ro_normalizer import RomanianNormalizer
+from ro_pretokenizer import RomanianPreTokenizer
+from ro_traindata import filter_weird_line
+from ro_profiler import start_process_profiler, merge_profiles, clear_profiles
 
 
-_token_rx = re.compile(
-    r'<w>(.+)</w>|' +
-    r'<mwe>(.+)</mwe>|' +
-    r'<abbr>(.+)</abbr>|' +
-    r'<pct>(.+)</pct>|' +
-    r'<num>(.+)</num>|' +
-    r'<sym>(.+)</sym>'
-)
+_ro_normalizer = RomanianNormalizer()
+# Token tags and their closing tags
+_token_tags = {
+    '<w>': '</w>',
+    '<mwe>': '</mwe>',
+    '<abbr>': '</abbr>',
+    '<pct>': '</pct>',
+    '<num>': '</num>',
+    '<sym>': '</sym>'
+}
 
 
 def entity_expansion(token: str) -> str:
@@ -26,48 +35,51 @@ def entity_expansion(token: str) -> str:
     return token
 
 
-def get_sentences_from_xml(xml_file: str,
-                           sentence_size: int = 2) -> list[str]:
+def get_token_from_line(line: str) -> tuple[str, str] | None:
+    """If the stripped `line` is a token line, e.g. `<w>text</w>`, returns the
+    opening tag and the (non-empty) text of the token. Otherwise, returns `None`."""
+
+    open_tag = line[:line.find('>') + 1]
+    close_tag = _token_tags.get(open_tag)
+
+    if close_tag is not None and line.endswith(close_tag) and \
+            len(line) > len(open_tag) + len(close_tag):
+        return open_tag, line[len(open_tag):-len(close_tag)]
+    # end if
+
+    return None
+
+
+def iter_sentence_pieces_from_xml(xml_file: str,
+                                  sentence_size: int = 2) -> Iterator[list[tuple[str, str]]]:
     """Takes a sentence split and tokenized file from the 'correct'
-    folder of the CoRoLa corpus.
-    Minimum sentence size is determined by `sentence_size`, default `2`."""
+    folder of the CoRoLa corpus and yields the pieces of each sentence,
+    as `(tag, text)` pairs, e.g. `('<w>', 'Nu')` or `('<spc/>', ' ')`.
+    Minimum sentence size, in pieces, is determined by `sentence_size`, default `2`."""
 
-    result = []
     current_sentence = []
     inside_sentence = False
 
-    with open(xml_file, mode='r', encoding='utf-8') as f:
+    with open_corpus(xml_file, mode='r') as f:
         for line in f:
             line = line.strip()
 
             if line == '</s>':
                 if len(current_sentence) >= sentence_size:
-                    result.append(''.join(current_sentence))
+                    yield current_sentence
                 # end if
                 inside_sentence = False
             elif line == '<s>':
                 current_sentence = []
                 inside_sentence = True
             else:
-                m = _token_rx.fullmatch(line)
-                no_match = True
-
-                if m:
-                    for tok in m.groups():
-                        if tok:
-                            tok = entity_expansion(token=tok)
-                            current_sentence.append(tok)
-                            break
-                        # end if
-                    # end for
-
-                    no_match = False
-                elif line == '<spc/>' or line == '<eol/>':
-                    current_sentence.append(' ')
-                    no_match = False
-                # end if
+                tag_tok = get_token_from_line(line)
 
-                if no_match and inside_sentence and line != '<w/>':
+                if tag_tok is not None:
+                    current_sentence.append((tag_tok[0], entity_expansion(token=tag_tok[1])))
+                elif line == '<spc/>' or line == '<eol/>':
+                    current_sentence.append(('<spc/>', ' '))
+                elif inside_sentence and line != '<w/>':
                     print(f'No match for line [{line}] in file [{xml_file}]',
                           file=sys.stderr, flush=True)
                 # end if
@@ -75,50 +87,308 @@ def get_sentences_from_xml(xml_file: str,
         # end for
     # end with
 
-    return result
 
+def iter_sentences_from_xml(xml_file: str,
+                            sentence_size: int = 2) -> Iterator[str]:
+    """Takes a sentence split and tokenized file from the 'correct'
+    folder of the CoRoLa corpus and yields its sentences, one at a time.
+    Minimum sentence size is determined by `sentence_size`, default `2`."""
+
+    for pieces in iter_sentence_pieces_from_xml(xml_file=xml_file, sentence_size=sentence_size):
+        yield ''.join([x[1] for x in pieces])
+    # end for
 
-if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print('Usage: python3 corola.py <CoRoLa "correct" folder with .xml files> <output folder>')
-        exit(1)
-    # end if
 
-    correct_folder = sys.argv[1]
-    output_folder = sys.argv[2]
-    current_sentence_chunk = []
-    file_counter = 1
+def get_gold_tokens(pieces: list[tuple[str, str]]) -> list[str]:
+    """Returns the CoRoLa tokens of a sentence. Consecutive `<mwe>`
+    pieces, including their spaces, make up a single token."""
+
+    tokens = []
+    inside_mwe = False
 
-    for xf in tqdm(os.listdir(correct_folder), desc='CoRoLa'):
-        if xf.endswith('.xml'):
-            sentences = get_sentences_from_xml(os.path.join(correct_folder, xf))
-            
-            if len(current_sentence_chunk) + len(sentences) < 100000:
-                current_sentence_chunk.extend(sentences)
+    for tag, text in pieces:
+        if tag == '<mwe>':
+            if inside_mwe:
+                tokens[-1] += text
             else:
-                output_sentence_file = os.path.join(output_folder,
-                                                    f'corola-sentences-{file_counter}.txt')
-                
-                with open(output_sentence_file, mode='w', encoding='utf-8') as f:
-                    for snt in current_sentence_chunk:
-                        print(snt, file=f)
-                    # end for
-                # end with
+                tokens.append(text)
+                inside_mwe = True
+            # end if
+        elif tag == '<spc/>':
+            inside_mwe = False
+        else:
+            tokens.append(text)
+            inside_mwe = False
+        # end if
+    # end for
 
-                file_counter += 1
-                current_sentence_chunk = []
-                current_sentence_chunk.extend(sentences)
+    return tokens
+
+
+def get_sentences_from_xml(xml_file: str,
+                           sentence_size: int = 2) -> list[str]:
+    """Takes a sentence split and tokenized file from the 'correct'
+    folder of the CoRoLa corpus.
+    Minimum sentence size is determined by `sentence_size`, default `2`."""
+
+    return list(iter_sentences_from_xml(xml_file=xml_file, sentence_size=sentence_size))
+
+
+def get_gold_training_line(pieces: list[tuple[str, str]]) -> str:
+    """Makes a `_tk_`-delimited training line, as `ro_traindata.py` does,
+    but from the CoRoLa tokens of the sentence, instead of re-tokenizing it."""
+
+    tokens = [_ro_normalizer.normalize_str(sequence=tok) for tok in get_gold_tokens(pieces)]
+    return filter_weird_line(tokens=tokens)
+
+
+def extract_file(xml_file: str) -> tuple[int, str]:
+    """Worker function: returns the number of sentences in `xml_file`
+    and the sentences, as `\n`-terminated text."""
+
+    sentence_count = 0
+    lines = []
+
+    for snt in iter_sentences_from_xml(xml_file=xml_file):
+        lines.append(snt)
+        lines.append('\n')
+        sentence_count += 1
+    # end for
+
+    return sentence_count, ''.join(lines)
+
+
+def extract_gold_file(xml_file: str) -> tuple[int, str]:
+    """Worker function: returns the number of sentences in `xml_file`
+    and their training lines, as `\n`-terminated text."""
+
+    sentence_count = 0
+    lines = []
+
+    for pieces in iter_sentence_pieces_from_xml(xml_file=xml_file):
+        lines.append(get_gold_training_line(pieces))
+        lines.append('\n')
+        sentence_count += 1
+    # end for
+
+    return sentence_count, ''.join(lines)
+
+
+def compare_gold_tokenization(xml_files: list[str], max_sentences: int = 10000) -> dict:
+    """Pre-tokenizes at most `max_sentences` sentences with the `RomanianPreTokenizer` and
+    compares the token boundaries with the CoRoLa ones. Boundaries are offsets in the
+    normalized sentence with the spaces removed, so MWE spaces do not count."""
+
+    ro_pretok = RomanianPreTokenizer()
+    report = {
+        'sentences': 0,
+        'identical_sentences': 0,
+        'gold_tokens': 0,
+        'ro_tokens': 0,
+        'common_tokens': 0,
+        'gold_boundaries': 0,
+        'ro_boundaries': 0,
+        'common_boundaries': 0
+    }
+    gold_only = Counter()
+    ro_only = Counter()
+
+    def _spans(tokens: list[str]) -> dict[tuple[int, int], str]:
+        spans = {}
+        offset = 0
+
+        for tok in tokens:
+            tok_len = len(tok.replace(' ', ''))
+            spans[(offset, offset + tok_len)] = tok
+            offset += tok_len
+        # end for
+
+        return spans
+
+    for xml_file in xml_files:
+        for pieces in iter_sentence_pieces_from_xml(xml_file=xml_file):
+            if report['sentences'] >= max_sentences:
+                break
+            # end if
+
+            sentence = _ro_normalizer.normalize_str(sequence=''.join([x[1] for x in pieces]))
+            gold_tokens = [_ro_normalizer.normalize_str(sequence=tok) for tok in get_gold_tokens(pieces)]
+            gold_tokens = [tok for tok in gold_tokens if tok]
+            ro_tokens = [x[0] for x in ro_pretok.pre_tokenize_str(sequence=sentence)]
+            gold_spans = _spans(gold_tokens)
+            ro_spans = _spans(ro_tokens)
+            # The end of the sentence is not a boundary
+            gold_bounds = set([x[1] for x in gold_spans]) - set([max([0] + [x[1] for x in gold_spans])])
+            ro_bounds = set([x[1] for x in ro_spans]) - set([max([0] + [x[1] for x in ro_spans])])
+
+            report['sentences'] += 1
+            report['gold_tokens'] += len(gold_spans)
+            report['ro_tokens'] += len(ro_spans)
+            report['common_tokens'] += len(gold_spans.keys() & ro_spans.keys())
+            report['gold_boundaries'] += len(gold_bounds)
+            report['ro_boundaries'] += len(ro_bounds)
+            report['common_boundaries'] += len(gold_bounds & ro_bounds)
+
+            if gold_spans.keys() == ro_spans.keys():
+                report['identical_sentences'] += 1
             # end if
+
+            gold_only.update([gold_spans[x] for x in gold_spans.keys() - ro_spans.keys()])
+            ro_only.update([ro_spans[x] for x in ro_spans.keys() - gold_spans.keys()])
+        # end for
+
+        if report['sentences'] >= max_sentences:
+            break
         # end if
     # end for
 
-    if current_sentence_chunk:
+    report['gold_only_tokens'] = gold_only.most_common(20)
+    report['ro_only_tokens'] = ro_only.most_common(20)
+
+    return report
+
+
+def print_gold_comparison(report: dict) -> None:
+    def _ratio(a: int, b: int) -> float:
+        return a / b if b > 0 else 1.
+
+    print(f'Sentences: {report["sentences"]}')
+    print('Sentences with identical tokenization: ' +
+          f'{_ratio(report["identical_sentences"], report["sentences"]):.2%}')
+    print(f'Tokens: {report["gold_tokens"]} CoRoLa, {report["ro_tokens"]} RoTokenizer, ' +
+          f'{report["common_tokens"]} identical')
+    print('Boundary precision (RoTokenizer vs. CoRoLa): ' +
+          f'{_ratio(report["common_boundaries"], report["ro_boundaries"]):.2%}')
+    print('Boundary recall (RoTokenizer vs. CoRoLa): ' +
+          f'{_ratio(report["common_boundaries"], report["gold_boundaries"]):.2%}')
+    print('Most frequent CoRoLa-only tokens: ' +
+          ', '.join([f'[{tok}]: {freq}' for tok, freq in report['gold_only_tokens']]))
+    print('Most frequent RoTokenizer-only tokens: ' +
+          ', '.join([f'[{tok}]: {freq}' for tok, freq in report['ro_only_tokens']]))
+
+
+def write_sentence_chunks(xml_files: list[str], output_folder: str,
+                          chunk_size: int = 100000, process_count: int = 1,
+                          compression: str = '', gold_tokens: bool = False,
+                          profile_folder: str | None = None) -> None:
+    """Extracts the sentences of the `xml_files` in parallel and writes them, in the order of
+    `xml_files`, in `corola-sentences-<n>.txt` files of less than `chunk_size` sentences.
+    The sentences of an .xml file are never split across chunks.
+    If `gold_tokens` is `True`, the `_tk_`-delimited training lines are written instead,
+    using the CoRoLa tokenization (the `ro_traindata.py` step is not needed anymore).
+    If `profile_folder` is given, the worker processes are profiled with the sampling profiler."""
+
+    file_counter = 1
+    chunk_sentence_count = 0
+    chunk_writer = None
+
+    def _chunk_writer() -> CorpusWriter:
         output_sentence_file = os.path.join(output_folder,
-                                            f'corola-sentences-{file_counter}.txt')
+                                            f'corola-sentences-{file_counter}.txt{compression}')
+        return CorpusWriter(output_sentence_file)
+
+    if profile_folder is not None:
+        pool = Pool(processes=process_count, initializer=start_process_profiler, initargs=(profile_folder,))
+    else:
+        pool = Pool(processes=process_count)
+    # end if
+
+    with pool:
+        extract_func = extract_gold_file if gold_tokens else extract_file
+
+        for sentence_count, sentences in tqdm(pool.imap(extract_func, xml_files),
+                                              total=len(xml_files), desc='CoRoLa'):
+            if chunk_sentence_count + sentence_count >= chunk_size:
+                # The current chunk is written out, even if it is empty
+                if chunk_writer is None:
+                    chunk_writer = _chunk_writer()
+                # end if
+
+                chunk_writer.close()
+                chunk_writer = None
+                chunk_sentence_count = 0
+                file_counter += 1
+            # end if
+
+            if sentence_count > 0:
+                if chunk_writer is None:
+                    chunk_writer = _chunk_writer()
+                # end if
+
+                chunk_writer.write_text(sentences)
+                chunk_sentence_count += sentence_count
+            # end if
+        # end for
+
+        # Let the workers exit normally, e.g. to save their profiles
+        pool.close()
+        pool.join()
+    # end with
+
+    if chunk_writer is not None:
+        chunk_writer.close()
+    # end if
+
+
+if __name__ == '__main__':
+    process_count = os.cpu_count()
+    chunk_size = 100000
+    compression = ''
+    gold_tokens = False
+    profile_folder = None
+
+    if len(sys.argv) == 4 and sys.argv[1] == '-c':
+        # Only compare the CoRoLa and RoTokenizer tokenizations, on a sample
+        print_gold_comparison(compare_gold_tokenization(
+            xml_files=list_corpus_files(sys.argv[3], extension='.xml'),
+            max_sentences=int(sys.argv[2])))
+        exit(0)
+    # end if
+
+    while len(sys.argv) > 3 and sys.argv[1] in ['-p', '-n', '-z', '-g', '--profile']:
+        if sys.argv[1] == '-g':
+            gold_tokens = True
+            sys.argv.pop(1)
+            continue
+        elif sys.argv[1] == '-p':
+            process_count = int(sys.argv[2])
+        elif sys.argv[1] == '-n':
+            chunk_size = int(sys.argv[2])
+        elif sys.argv[1] == '--profile':
+            profile_folder = sys.argv[2]
+        elif sys.argv[2] not in ['gz', 'bz2', 'xz', 'none']:
+            # Left in sys.argv, such that the usage is printed
+            break
+        else:
+            compression = '.' + sys.argv[2] if sys.argv[2] != 'none' else ''
+        # end if
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 3:
+        print('Usage: python3 corola.py [-p <count>] [-n <max sentences per chunk>] [-z gz|bz2|xz|none] [-g] ' +
+              '[--profile <profile output folder>] <CoRoLa "correct" folder with .xml files> <output folder>')
+        print('       (-g writes training lines, using the CoRoLa tokenization)')
+        print('   or: python3 corola.py -c <sample sentence count> <CoRoLa "correct" folder with .xml files>')
+        exit(1)
+    # end if
+
+    correct_folder = sys.argv[1]
+    output_folder = sys.argv[2]
+
+    if profile_folder is not None:
+        clear_profiles(profile_folder)
+    # end if
+
+    # Only the workers are profiled: the main process mostly waits for them
+    write_sentence_chunks(
+        xml_files=list_corpus_files(correct_folder, extension='.xml'),
+        output_folder=output_folder, chunk_size=chunk_size,
+        process_count=process_count, compression=compression, gold_tokens=gold_tokens,
+        profile_folder=profile_folder)
 
-        with open(output_sentence_file, mode='w', encoding='utf-8') as f:
-            for snt in current_sentence_chunk:
-                print(snt, file=f)
-            # end for
-        # end with
+    if profile_folder is not None:
+        print(merge_profiles(profile_folder), file=sys.stderr, end='', flush=True)
     # end if
@@ -0,0 +1,198 @@
+# Length-bucketed dynamic batching: examples of similar lengths are batched together,
+# and each batch is padded only to its own (bucket) maximum length,
+# instead of padding everything to `model_max_length`.
+
+import sys
+import random
+from typing import Iterator, Optional, Union
+import numpy as np
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+def compute_lengths(texts: list[str], tokenizer, batch_size: int = 1000) -> np.ndarray:
+    """Computes the number of ids of each encoded text, special tokens included.
+    `tokenizer` is a `RoBertWordPieceTokenizer` or a `RoBertPreTrainedTokenizer`.
+    If you already have the encodings (e.g. a `ShardedTokenDataset`), use their lengths instead."""
+
+    special_count = tokenizer.num_special_tokens_to_add(False)
+    # Do the encoding with the fast, batched, underlying tokenizer
+    ro_tokenizer = getattr(tokenizer, '_ro_wordpiece_tokenizer', tokenizer)
+    lengths = np.empty(len(texts), dtype=np.int64)
+
+    for i in range(0, len(texts), batch_size):
+        encodings = ro_tokenizer.encode_batch(texts[i:i + batch_size], add_special_tokens=False)
+        lengths[i:i + len(encodings)] = [len(x.ids) + special_count for x in encodings]
+    # end for
+
+    return lengths
+
+
+class LengthBucketSampler(object):
+    """Groups the example indices in buckets of `bucket_width` lengths and makes batches
+    from each bucket, of at most `batch_size` examples and, if `max_tokens` is given,
+    of at most `max_tokens` padded ids. It can be used as a PyTorch `batch_sampler`."""
+
+    def __init__(self, lengths: Union[list[int], np.ndarray],
+                 batch_size: int = 32,
+                 max_tokens: Optional[int] = None,
+                 bucket_width: int = 8,
+                 max_length: Optional[int] = None,
+                 shuffle: bool = False,
+                 seed: int = 0,
+                 drop_last: bool = False) -> None:
+        self._lengths = np.asarray(lengths, dtype=np.int64)
+        self._batch_size = batch_size
+        self._max_tokens = max_tokens
+        self._bucket_width = bucket_width
+        self._max_length = max_length
+        self._shuffle = shuffle
+        self._seed = seed
+        self._drop_last = drop_last
+        self._epoch = 0
+        self._batches = self._make_batches()
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths
+
+    def bucket_max_length(self, length: int) -> int:
+        """The length to which the examples of `length` are padded."""
+
+        bucket_max = -(-length // self._bucket_width) * self._bucket_width
+
+        if self._max_length is not None:
+            bucket_max = min(bucket_max, self._max_length)
+        # end if
+
+        return max(bucket_max, 1)
+
+    def _make_batches(self) -> list[list[int]]:
+        rnd = random.Random(self._seed + self._epoch)
+        buckets = {}
+
+        for i in np.argsort(self._lengths, kind='stable').tolist():
+            bucket_max = self.bucket_max_length(int(self._lengths[i]))
+
+            if bucket_max not in buckets:
+                buckets[bucket_max] = []
+            # end if
+
+            buckets[bucket_max].append(i)
+        # end for
+
+        batches = []
+
+        for bucket_max, indices in buckets.items():
+            if self._shuffle:
+                rnd.shuffle(indices)
+            # end if
+
+            batch_size = self._batch_size
+
+            if self._max_tokens is not None:
+                batch_size = max(1, min(batch_size, self._max_tokens // bucket_max))
+            # end if
+
+            for j in range(0, len(indices), batch_size):
+                batch = indices[j:j + batch_size]
+
+                if len(batch) < batch_size and self._drop_last:
+                    continue
+                # end if
+
+                batches.append(batch)
+            # end for
+        # end for
+
+        if self._shuffle:
+            rnd.shuffle(batches)
+        # end if
+
+        return batches
+
+    def set_epoch(self, epoch: int) -> None:
+        """Reshuffles the batches, reproducibly, for a new epoch (if `shuffle=True`)."""
+
+        self._epoch = epoch
+        self._batches = self._make_batches()
+
+    def __iter__(self) -> Iterator[list[int]]:
+        return iter(self._batches)
+
+    def __len__(self) -> int:
+        return len(self._batches)
+
+    def padded_token_count(self) -> int:
+        """The number of ids, padding included, in all batches."""
+
+        result = 0
+
+        for batch in self._batches:
+            result += len(batch) * int(self._lengths[batch].max())
+        # end for
+
+        return result
+
+
+def iter_padded_batches(texts: list[str], tokenizer, sampler: LengthBucketSampler,
+                        pad_to_bucket_max: bool = False, **kwargs) -> Iterator[tuple[list[int], dict]]:
+    """Calls the `tokenizer` (a `RoBertPreTrainedTokenizer`) on the batches of `sampler` and yields
+    `(indices, encoded batch)` pairs. A batch is padded to its longest example or, with
+    `pad_to_bucket_max=True`, to the maximum length of its bucket (fewer distinct shapes)."""
+
+    for batch in sampler:
+        batch_texts = [texts[i] for i in batch]
+
+        if pad_to_bucket_max:
+            bucket_max = sampler.bucket_max_length(int(sampler.lengths[batch].max()))
+            yield batch, tokenizer(text=batch_texts, padding='max_length',
+                                   max_length=bucket_max, **kwargs)
+        else:
+            yield batch, tokenizer(text=batch_texts, padding='longest', **kwargs)
+        # end if
+    # end for
+
+
+def pad_sequences(sequences: list[Union[list[int], np.ndarray]], pad_id: int,
+                  pad_to: Optional[int] = None) -> dict[str, np.ndarray]:
+    """Pads already encoded sequences (e.g. from a `ShardedTokenDataset`) into
+    `input_ids` and `attention_mask` arrays, to the longest sequence or to `pad_to`."""
+
+    max_len = max([len(x) for x in sequences]) if sequences else 0
+
+    if pad_to is not None:
+        max_len = max(max_len, pad_to)
+    # end if
+
+    input_ids = np.full((len(sequences), max_len), pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(sequences), max_len), dtype=np.int64)
+
+    for i, seq in enumerate(sequences):
+        input_ids[i, :len(seq)] = seq
+        attention_mask[i, :len(seq)] = 1
+    # end for
+
+    return {'input_ids': input_ids, 'attention_mask': attention_mask}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print('Usage: python3 ro_batching.py <vocab.txt> <sentences .txt file> <max tokens per batch>',
+              file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    ro_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=sys.argv[1])
+
+    with open(sys.argv[2], mode='r', encoding='utf-8') as f:
+        input_texts = [line.strip() for line in f]
+    # end with
+
+    text_lengths = compute_lengths(input_texts, ro_tokenizer)
+    bucket_sampler = LengthBucketSampler(text_lengths, batch_size=len(input_texts),
+                                         max_tokens=int(sys.argv[3]))
+    max_padded = len(input_texts) * int(text_lengths.max())
+
+    print(f'[{len(bucket_sampler)}] batches, ' +
+          f'[{bucket_sampler.padded_token_count()}] padded ids vs. [{max_padded}] ' +
+          'when padding to the longest text', file=sys.stderr, flush=True)
@@ -0,0 +1,186 @@
+# Corpus input/output shared by the corola.py and ro_traindata.py scripts.
+# Compression is chosen by file extension (.gz, .bz2 or .xz) and
+# writing is buffered and done in batches of lines.
+
+import io
+import os
+import gzip
+import bz2
+import lzma
+from pathlib import Path
+from typing import IO, Iterable, Optional, Union
+
+
+compression_suffixes = ['.gz', '.bz2', '.xz']
+# Large buffers, since disk/NFS bandwidth is the limit on the CoRoLa runs
+default_buffer_size = 1024 * 1024
+default_batch_size = 10000
+
+
+def compression_suffix(path: Union[str, Path]) -> str:
+    """Returns the compression extension of `path`, e.g. `.gz`, or `''` if
+    the file is not compressed."""
+
+    suffix = Path(path).suffix
+
+    if suffix in compression_suffixes:
+        return suffix
+    # end if
+
+    return ''
+
+
+def is_corpus_file(path: Union[str, Path], extension: str) -> bool:
+    """Tests if `path` has the `extension` (e.g. `.txt`),
+    optionally followed by a compression extension (e.g. `.txt.gz`)."""
+
+    name = Path(path).name
+    suffix = compression_suffix(path)
+
+    if suffix:
+        name = name[:-len(suffix)]
+    # end if
+
+    return name.endswith(extension)
+
+
+def open_corpus(path: Union[str, Path], mode: str = 'r',
+                buffer_size: int = default_buffer_size,
+                compresslevel: int = 6) -> IO[str]:
+    """Opens a UTF-8 corpus file for reading (`mode='r'`) or writing (`mode='w'` or `mode='a'`),
+    transparently (de)compressing it if its name ends in `.gz`, `.bz2` or `.xz`."""
+
+    if mode not in ['r', 'w', 'a']:
+        raise ValueError(f'Unsupported corpus file mode [{mode}]')
+    # end if
+
+    match compression_suffix(path):
+        case '.gz':
+            binary_file = gzip.open(path, mode=mode + 'b', compresslevel=compresslevel)
+        case '.bz2':
+            binary_file = bz2.open(path, mode=mode + 'b', compresslevel=max(compresslevel, 1))
+        case '.xz':
+            binary_file = lzma.open(path, mode=mode + 'b',
+                                    preset=None if mode == 'r' else compresslevel)
+        case _:
+            return open(path, mode=mode, encoding='utf-8', buffering=buffer_size)
+    # end match
+
+    if mode == 'r':
+        binary_file = io.BufferedReader(binary_file, buffer_size=buffer_size)
+    else:
+        binary_file = io.BufferedWriter(binary_file, buffer_size=buffer_size)
+    # end if
+
+    return io.TextIOWrapper(binary_file, encoding='utf-8')
+
+
+class CorpusWriter(object):
+    """Writes lines of text to a (compressed) corpus file, in batches.
+    With `multi_member=True` and a `.gz` file, each batch is written as a separate
+    gzip member, such that the resulting shards can be concatenated or split at member
+    boundaries, e.g. with `cat shard-*.txt.gz > all.txt.gz`."""
+
+    def __init__(self, path: Union[str, Path], mode: str = 'w',
+                 batch_size: int = default_batch_size,
+                 buffer_size: int = default_buffer_size,
+                 compresslevel: int = 6,
+                 multi_member: bool = False) -> None:
+        self._path = path
+        self._batch_size = batch_size
+        self._compresslevel = compresslevel
+        self._multi_member = multi_member and compression_suffix(path) == '.gz'
+        self._batch = []
+        self.line_count = 0
+
+        if self._multi_member:
+            self._file = open(path, mode=mode + 'b', buffering=buffer_size)
+        else:
+            self._file = open_corpus(path, mode=mode,
+                                     buffer_size=buffer_size, compresslevel=compresslevel)
+        # end if
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write_line(self, line: str) -> None:
+        """Adds `line` to the current batch. `line` should not end in `\\n`."""
+
+        self._batch.append(line)
+        self._batch.append('\n')
+        self.line_count += 1
+
+        if len(self._batch) >= 2 * self._batch_size:
+            self.flush()
+        # end if
+
+    def write_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.write_line(line)
+        # end for
+
+    def write_text(self, text: str) -> None:
+        """Writes a block of already formatted, `\\n`-terminated lines."""
+
+        self._batch.append(text)
+        self.line_count += text.count('\n')
+        self.flush()
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        # end if
+
+        if self._multi_member:
+            self._file.write(gzip.compress(''.join(self._batch).encode('utf-8'),
+                                           compresslevel=self._compresslevel))
+        else:
+            self._file.writelines(self._batch)
+        # end if
+
+        self._batch = []
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        # end if
+
+        self.flush()
+        self._file.close()
+
+
+def list_corpus_files(folder: Union[str, Path], extension: str) -> list[str]:
+    """Lists, in `os.listdir()` order, the files from `folder` that have
+    the given `extension`, optionally compressed."""
+
+    result = []
+
+    for name in os.listdir(folder):
+        if is_corpus_file(name, extension=extension):
+            result.append(os.path.join(folder, name))
+        # end if
+    # end for
+
+    return result
+
+
+def change_compression(path: Union[str, Path], suffix: Optional[str]) -> str:
+    """Replaces the compression extension of `path` with `suffix`.
+    If `suffix` is `None`, `path` is returned unchanged."""
+
+    path = str(path)
+
+    if suffix is None:
+        return path
+    # end if
+
+    crt_suffix = compression_suffix(path)
+
+    if crt_suffix:
+        path = path[:-len(crt_suffix)]
+    # end if
+
+    return path + suffix
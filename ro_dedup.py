@@ -0,0 +1,308 @@
+# Removes repeated sentences (headers, boilerplate, etc.) from the output of corola.py,
+# before it is prepared for training with ro_traindata.py. Only the first occurrence
+# of each sentence, in input file order, is kept. Sentences are compared by the 64-bit
+# BLAKE2b hash of their normalized form, and the hashes are deduplicated on disk,
+# one partition at a time, such that the corpus size is not limited by the RAM:
+# 1. each input file is hashed, in parallel;
+# 2. the (hash, sentence index) records are split in partitions by their hash high bits;
+# 3. each partition is sorted and the non-first occurrences are marked in a bitmap;
+# 4. each input file is copied to the output folder without its marked sentences.
+# Empty lines (document separators) are always kept.
+# Also has the clean-up of the vocab.txt files saved by the WordPiece trainer.
+
+import os
+import sys
+import hashlib
+import tempfile
+from pathlib import Path
+from multiprocessing import Pool
+import numpy as np
+from tqdm import tqdm
+from ro_normalizer import RomanianNormalizer
+from ro_corpusio import open_corpus, list_corpus_files, change_compression, CorpusWriter
+
+
+hash_dtype = np.dtype('<u8')
+record_dtype = np.dtype([('hash', '<u8'), ('index', '<u8')])
+default_partition_count = 64
+_ro_normalizer = RomanianNormalizer()
+
+
+def sentence_hash(sentence: str) -> int:
+    """The 64-bit hash of the normalized `sentence`."""
+
+    text = _ro_normalizer.normalize_str(sentence).strip()
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def hash_file(input_file: str, output_file: str) -> int:
+    """Worker function: saves in `output_file` (an `.npz` file) the line numbers
+    of the non-empty lines of `input_file` and their hashes. Returns the line count."""
+
+    line_numbers = []
+    hashes = []
+    line_count = 0
+
+    with open_corpus(input_file, mode='r') as f:
+        for line in f:
+            if line.strip():
+                line_numbers.append(line_count)
+                hashes.append(sentence_hash(line))
+            # end if
+
+            line_count += 1
+        # end for
+    # end with
+
+    np.savez(output_file,
+             lines=np.asarray(line_numbers, dtype=np.int64),
+             hashes=np.asarray(hashes, dtype=hash_dtype))
+
+    return line_count
+
+
+def _hash_file_star(args: tuple) -> int:
+    return hash_file(*args)
+
+
+def _partition_hashes(hash_files: list[str], line_counts: list[int],
+                      work_folder: str, partition_count: int) -> list[str]:
+    """Appends the (hash, global line index) records of all files to
+    `partition_count` partition files, by the high bits of the hash."""
+
+    partition_bits = max(1, (partition_count - 1).bit_length())
+    partition_files = [os.path.join(work_folder, f'part-{p:05d}.bin') for p in range(2 ** partition_bits)]
+    handles = [open(x, mode='wb') for x in partition_files]
+    offset = 0
+
+    try:
+        for hash_file_path, line_count in zip(hash_files, line_counts):
+            data = np.load(hash_file_path)
+            records = np.empty(len(data['hashes']), dtype=record_dtype)
+            records['hash'] = data['hashes']
+            records['index'] = data['lines'] + offset
+            partitions = (records['hash'] >> np.uint64(64 - partition_bits)).astype(np.int64)
+            order = np.argsort(partitions, kind='stable')
+            bounds = np.searchsorted(partitions[order], np.arange(len(handles) + 1))
+
+            for p, fh in enumerate(handles):
+                if bounds[p] < bounds[p + 1]:
+                    fh.write(records[order[bounds[p]:bounds[p + 1]]].tobytes())
+                # end if
+            # end for
+
+            offset += line_count
+            os.remove(hash_file_path)
+        # end for
+    finally:
+        for fh in handles:
+            fh.close()
+        # end for
+    # end try
+
+    return partition_files
+
+
+def _mark_duplicates(partition_files: list[str], bitmap: np.ndarray) -> tuple[int, int]:
+    """Sets the bits of the non-first occurrences in `bitmap`.
+    Returns the sentence count and the duplicate count."""
+
+    sentence_count = 0
+    duplicate_count = 0
+
+    for partition_file in partition_files:
+        records = np.fromfile(partition_file, dtype=record_dtype)
+        os.remove(partition_file)
+
+        if len(records) == 0:
+            continue
+        # end if
+
+        order = np.lexsort((records['index'], records['hash']))
+        hashes = records['hash'][order]
+        is_duplicate = np.zeros(len(hashes), dtype=bool)
+        is_duplicate[1:] = hashes[1:] == hashes[:-1]
+        duplicates = records['index'][order][is_duplicate]
+        np.bitwise_or.at(bitmap, (duplicates >> np.uint64(3)).astype(np.int64),
+                         (np.uint8(1) << (duplicates & np.uint64(7)).astype(np.uint8)))
+        sentence_count += len(records)
+        duplicate_count += len(duplicates)
+    # end for
+
+    return sentence_count, duplicate_count
+
+
+def copy_unique_lines(input_file: str, output_file: str, bitmap_file: str, offset: int) -> int:
+    """Worker function: copies the lines of `input_file` whose bits are not set in
+    the duplicates bitmap, starting at the global line index `offset`.
+    Returns the number of written lines."""
+
+    bitmap = np.memmap(bitmap_file, dtype=np.uint8, mode='r')
+    bits = None
+
+    with CorpusWriter(output_file) as ff:
+        with open_corpus(input_file, mode='r') as f:
+            for i, line in enumerate(f):
+                if i % 65536 == 0:
+                    # Unpack the bits of the next lines, a chunk at a time
+                    start = offset + i
+                    chunk = bitmap[start >> 3:(start >> 3) + 65536 // 8 + 1]
+                    bits = np.unpackbits(chunk, bitorder='little')[start & 7:]
+                # end if
+
+                if not bits[i % 65536]:
+                    ff.write_line(line.rstrip('\n'))
+                # end if
+            # end for
+        # end with
+
+        return ff.line_count
+    # end with
+
+
+def _copy_unique_lines_star(args: tuple) -> int:
+    return copy_unique_lines(*args)
+
+
+def dedup_corpus(input_files: list[str], output_folder: str, process_count: int = 1,
+                 partition_count: int = default_partition_count,
+                 work_folder: str | None = None, compression: str | None = None) -> dict:
+    """Writes the `input_files` to `output_folder`, with the same names, without the repeated
+    sentences. `work_folder` holds the temporary hash partitions and the duplicates bitmap;
+    it defaults to `output_folder`. Returns a report with the sentence and duplicate counts."""
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=work_folder or output_folder) as tmp_folder:
+        hash_files = [os.path.join(tmp_folder, f'hashes-{i:06d}.npz') for i in range(len(input_files))]
+
+        with Pool(processes=process_count) as pool:
+            line_counts = list(tqdm(pool.imap(_hash_file_star, zip(input_files, hash_files)),
+                                    total=len(input_files), desc='Hashing'))
+        # end with
+
+        partition_files = _partition_hashes(hash_files, line_counts, tmp_folder, partition_count)
+        total_lines = sum(line_counts)
+        bitmap_file = os.path.join(tmp_folder, 'duplicates.bin')
+        bitmap = np.memmap(bitmap_file, dtype=np.uint8, mode='w+', shape=((total_lines >> 3) + 1,))
+        sentence_count, duplicate_count = _mark_duplicates(partition_files, bitmap)
+        bitmap.flush()
+        del bitmap
+
+        copy_args = []
+        offset = 0
+
+        for input_file, line_count in zip(input_files, line_counts):
+            output_file = change_compression(Path(output_folder) / Path(input_file).name, suffix=compression)
+            copy_args.append((input_file, output_file, bitmap_file, offset))
+            offset += line_count
+        # end for
+
+        with Pool(processes=process_count) as pool:
+            written_lines = sum(tqdm(pool.imap(_copy_unique_lines_star, copy_args),
+                                     total=len(copy_args), desc='Writing'))
+        # end with
+    # end with
+
+    return {
+        'files': len(input_files),
+        'lines': total_lines,
+        'sentences': sentence_count,
+        'unique_sentences': sentence_count - duplicate_count,
+        'duplicate_sentences': duplicate_count,
+        'dedup_ratio': duplicate_count / sentence_count if sentence_count > 0 else 0.,
+        'written_lines': written_lines
+    }
+
+
+def print_dedup_report(report: dict) -> None:
+    print(f'Files: {report["files"]}')
+    print(f'Sentences: {report["sentences"]}')
+    print(f'Unique sentences: {report["unique_sentences"]}')
+    print(f'Duplicate sentences: {report["duplicate_sentences"]} ({report["dedup_ratio"]:.2%})')
+
+
+def clean_vocab_file(vocab_file: str, output_file: str | None = None) -> dict:
+    """Removes the duplicate and empty terms from `vocab_file`, keeping the first occurrence.
+    The WordPiece model uses line numbers as ids and the last duplicate wins, so the lines
+    of the other occurrences are id gaps, i.e. ids that no term maps to. The cleaned vocabulary
+    is written to `output_file` (by default, `vocab_file` is replaced) and has contiguous ids.
+    Returns the report: the `duplicates` as `(term, line number)` pairs and the id `gaps`."""
+
+    with open(vocab_file, mode='r', encoding='utf-8') as f:
+        lines = [line.rstrip() for line in f]
+    # end with
+
+    last_id = {}
+
+    for i, term in enumerate(lines):
+        last_id[term] = i
+    # end for
+
+    gaps = [i for i, term in enumerate(lines) if last_id[term] != i or not term]
+    seen_terms = set()
+    terms = []
+    duplicates = []
+
+    for i, term in enumerate(lines):
+        if not term:
+            print(f'vocab.txt line [{i}] is empty', file=sys.stderr, flush=True)
+        elif term in seen_terms:
+            print(f'vocab.txt term [{term}] is duplicated', file=sys.stderr, flush=True)
+            duplicates.append((term, i))
+        else:
+            terms.append(term)
+            seen_terms.add(term)
+        # end if
+    # end for
+
+    output_file = output_file or vocab_file
+    temp_file = output_file + '.tmp'
+
+    with open(temp_file, mode='w', encoding='utf-8') as f:
+        f.writelines([x + '\n' for x in terms])
+    # end with
+
+    os.replace(temp_file, output_file)
+
+    return {
+        'lines': len(lines),
+        'terms': len(terms),
+        'duplicates': duplicates,
+        'gaps': gaps
+    }
+
+
+if __name__ == '__main__':
+    process_count = os.cpu_count()
+    partition_count = default_partition_count
+    work_folder = None
+    compression = None
+
+    while len(sys.argv) > 3 and sys.argv[1] in ['-p', '-k', '-w', '-z']:
+        match sys.argv[1]:
+            case '-p':
+                process_count = int(sys.argv[2])
+            case '-k':
+                partition_count = int(sys.argv[2])
+            case '-w':
+                work_folder = sys.argv[2]
+            case _:
+                compression = '.' + sys.argv[2] if sys.argv[2] != 'none' else ''
+        # end match
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 3:
+        print('Usage: python3 ro_dedup.py [-p <count>] [-k <hash partitions>] [-w <work folder>] ' +
+              '[-z gz|bz2|xz|none] <source folder with .txt sentence files> <output folder>',
+              file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    print_dedup_report(
+        dedup_corpus(list_corpus_files(sys.argv[1], extension='.txt'), sys.argv[2],
+                     process_count=process_count, partition_count=partition_count,
+                     work_folder=work_folder, compression=compression))
@@ -0,0 +1,326 @@
+# Differential equivalence harness of the 'reference' and 'fast' engines of the
+# RomanianNormalizer, RoTokenizer and RomanianPreTokenizer: it streams corpus lines
+# and generated adversarial strings (mixed diacritics, dashes and clitics, dotted
+# abbreviations, MWEs and exotic Unicode) through both engines and reports the first
+# divergences of each check. It also checks, for each engine, that normalize() (on a
+# NormalizedString) and normalize_str() give the same text; these parity divergences
+# are reported separately, as the engines share them (the \s and \b of re and of the
+# tokenizers regular expressions differ).
+# Exceptions are outcomes too: both engines have to raise the same exception type.
+# Run it with e.g.
+# python3 ro_differential.py -n 100000 -v model/vocab.txt corola
+# The exit code is 1 if the engines diverge.
+
+import os
+import sys
+import random
+from pathlib import Path
+from typing import Callable, Iterable
+from tokenizers import NormalizedString, PreTokenizedString
+from ro_corpusio import open_corpus, list_corpus_files
+from ro_normalizer import RomanianNormalizer
+from ro_pretokenizer import RomanianPreTokenizer
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+_data_folder = Path(__file__).parent / 'rodna' / 'data'
+_ro_words = [
+    'și', 'ţară', 'şcoală', 'sînt', 'Sîntem', 'sînteţi', 'SÎNT', 'sîntetic', 'când', 'cînd',
+    'început', 'neînțeles', 'reîntoarcere', 'preaînălțat', 'coîncidență', 'subînțeles',
+    'întîi', 'român', 'romîn', 'ROMÂNIA', 'ÎNTRE', 'NEÎNȚELES', 'înâltare', 'âncă', 'râu', 'rîu',
+    'mâine', 'hotărî', 'hotărâ', 'Țepeș', 'ŞTIINŢĂ', 'XIV', 'xiv', '1989', '3,14', '12.000'
+]
+_dashed_words = [
+    's-a', 'n-am', 'dă-mi-l', 'într-o', 'de-a', 'ia-l', 'să-mi', 'nu-ți', 'l-a', 'mi-e',
+    'ducă-se', 'Cluj-Napoca', 'e-mail', 'anti-', '-ul', 'x-ul', 'a-', '-', '--', '—', '-â', 'ne-â'
+]
+_exotic_chars = [
+    ' ', '​', '‍', '́', '̧', '﻿', '　', ' ', ' ',
+    '\r\n', '\r', '\n', '\t', '\x1c', '\x85', '😀', '漢字', 'ǅ', '²', 'Ⅻ', '‿', 'ﬁ', 'ß', 'ș́'
+]
+_separators = [' ', ' ', ' ', '', '  ', '\t', '\n', ', ', '. ', ' - ', ' ']
+
+
+def _read_data_lines(data_file: Path) -> list[str]:
+    with open(data_file, mode='r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+    # end with
+
+
+def _mix_diacritics(word: str, rnd: random.Random) -> str:
+    """Randomly uses the cedilla diacritics, 'î' instead of 'â' and upper case."""
+
+    chars = []
+
+    for c in word:
+        match c:
+            case 'ș' | 'ț' | 'Ș' | 'Ț' if rnd.random() < 0.5:
+                c = {'ș': 'ş', 'ț': 'ţ', 'Ș': 'Ş', 'Ț': 'Ţ'}[c]
+            case 'â' | 'Â' if rnd.random() < 0.5:
+                c = 'î' if c == 'â' else 'Î'
+        # end match
+
+        chars.append(c)
+    # end for
+
+    word = ''.join(chars)
+
+    match rnd.randrange(6):
+        case 0:
+            return word.upper()
+        case 1:
+            return word.capitalize()
+        case _:
+            return word
+    # end match
+
+
+def adversarial_strings(count: int, seed: int = 1234, corpus_words: list[str] | None = None) -> list[str]:
+    """Generates `count` strings of 1 to 12 random pieces: (corpus) words with mixed diacritics,
+    dashed words and clitics, abbreviations, MWEs and exotic characters, with random separators."""
+
+    rnd = random.Random(seed)
+    abbrs = _read_data_lines(_data_folder / 'abbrs.txt')
+    mwes = _read_data_lines(_data_folder / 'mwes.txt')
+    words = _ro_words + (corpus_words or [])
+    strings = []
+
+    for _ in range(count):
+        pieces = []
+
+        for _ in range(rnd.randint(1, 12)):
+            match rnd.randrange(6):
+                case 0 | 1:
+                    piece = _mix_diacritics(rnd.choice(words), rnd)
+                case 2:
+                    piece = _mix_diacritics(rnd.choice(_dashed_words), rnd)
+                case 3:
+                    piece = rnd.choice(abbrs)
+                    piece = piece.upper() if rnd.random() < 0.2 else piece
+                case 4:
+                    piece = _mix_diacritics(rnd.choice(mwes).replace('_', rnd.choice([' ', '  ', '\n'])), rnd)
+                case _:
+                    piece = rnd.choice(_exotic_chars)
+            # end match
+
+            pieces.append(piece)
+            pieces.append(rnd.choice(_separators))
+        # end for
+
+        text = ''.join(pieces)
+
+        if rnd.random() < 0.5:
+            text = text.strip()
+        # end if
+
+        strings.append(text)
+    # end for
+
+    return strings
+
+
+def corpus_lines(paths: list[str]) -> Iterable[str]:
+    """The non-empty lines of the .txt (optionally compressed) files, or of the ones in the folders."""
+
+    for path in paths:
+        if os.path.isdir(path):
+            input_files = sorted(list_corpus_files(path, extension='.txt'))
+        else:
+            input_files = [path]
+        # end if
+
+        for input_file in input_files:
+            with open_corpus(input_file, mode='r') as f:
+                for line in f:
+                    line = line.rstrip('\n')
+
+                    if line.strip():
+                        yield line
+                    # end if
+                # end for
+            # end with
+        # end for
+    # end for
+
+
+def _outcome(function: Callable, *args):
+    try:
+        return function(*args)
+    except Exception as e:
+        return ('error', type(e).__name__)
+    # end try
+
+
+def _normalize(normalizer: RomanianNormalizer, text: str) -> str:
+    normalized = NormalizedString(text)
+    normalizer.normalize(normalized)
+
+    return normalized.normalized
+
+
+def _pipeline(normalizer: RomanianNormalizer, pretokenizer: RomanianPreTokenizer, text: str) -> list:
+    """The pre-tokens of the normalized `text`, with their offsets in `text`."""
+
+    pretok = PreTokenizedString(text)
+    pretok.normalize(normalizer.normalize)
+    pretokenizer.pre_tokenize(pretok)
+
+    return [(x, y) for x, y, _ in pretok.get_splits(offset_referential='original', offset_type='char')]
+
+
+def _encode(tokenizer: RoBertWordPieceTokenizer, text: str) -> tuple:
+    encoding = tokenizer.encode(text)
+
+    return encoding.ids, encoding.tokens, encoding.offsets
+
+
+class DifferentialHarness(object):
+    """Runs each input through the 'reference' and 'fast' engines and
+    keeps count of the divergences, and the first ones, of each check."""
+
+    checks = [
+        'normalize_str', 'normalize', 'normalize_parity.reference', 'normalize_parity.fast',
+        'tokenize', 'pre_tokenize_str', 'pipeline', 'encode'
+    ]
+    # normalize() vs. normalize_str() of the same engine
+    parity_checks = ['normalize_parity.reference', 'normalize_parity.fast']
+
+    def __init__(self, vocab_file: str | None = None, wordforms_file: str | None = None,
+                 overlays: list[str] | None = None, max_divergences: int = 10) -> None:
+        """With a `vocab_file`, the encodings of the `RoBertWordPieceTokenizer` are compared too."""
+
+        self._max_divergences = max_divergences
+        self._normalizers = {x: RomanianNormalizer(engine=x) for x in ['reference', 'fast']}
+        self._pretokenizers = {x: RomanianPreTokenizer(wordforms_file=wordforms_file, overlays=overlays, engine=x)
+                               for x in ['reference', 'fast']}
+        # The lexicon is read once
+        self._pretokenizers['fast']._romanian_tokenizer.restore_lexicon(
+            self._pretokenizers['reference']._romanian_tokenizer.lexicon_snapshot())
+        self._tokenizers = {}
+
+        if vocab_file is not None:
+            for engine in ['reference', 'fast']:
+                self._tokenizers[engine] = RoBertWordPieceTokenizer.from_file(
+                    vocab=vocab_file, wordforms_file=wordforms_file, lexicon_overlays=overlays, engine=engine)
+                self._tokenizers[engine]._lexicon_pretokenizer._romanian_tokenizer.restore_lexicon(
+                    self._pretokenizers['reference']._romanian_tokenizer.lexicon_snapshot())
+            # end for
+        # end if
+
+        self.inputs = 0
+        self.results = {x: {'checked': 0, 'divergences': 0, 'first': []} for x in DifferentialHarness.checks}
+
+    def _compare(self, check: str, text: str, reference_result, fast_result,
+                 names: tuple[str, str] = ('reference', 'fast')) -> None:
+        result = self.results[check]
+        result['checked'] += 1
+
+        if reference_result != fast_result:
+            result['divergences'] += 1
+
+            if len(result['first']) < self._max_divergences:
+                result['first'].append({'input': text, names[0]: reference_result, names[1]: fast_result})
+            # end if
+        # end if
+
+    def _compare_engines(self, check: str, text: str, function: Callable) -> None:
+        self._compare(check, text, _outcome(function, 'reference', text), _outcome(function, 'fast', text))
+
+    def check(self, text: str) -> None:
+        self.inputs += 1
+        normalizers = self._normalizers
+        pretokenizers = self._pretokenizers
+
+        self._compare_engines('normalize_str', text, lambda e, x: normalizers[e].normalize_str(x))
+        self._compare_engines('normalize', text, lambda e, x: _normalize(normalizers[e], x))
+
+        for engine in ['reference', 'fast']:
+            self._compare(f'normalize_parity.{engine}', text, _outcome(_normalize, normalizers[engine], text),
+                          _outcome(normalizers[engine].normalize_str, text), names=('normalize', 'normalize_str'))
+        # end for
+
+        # The RoTokenizer and the pre-tokenizer are checked on the raw and on the normalized text
+        normalized_text = normalizers['reference'].normalize_str(text)
+
+        for x in ([text, normalized_text] if normalized_text != text else [text]):
+            self._compare_engines('tokenize', x, lambda e, y: pretokenizers[e]._romanian_tokenizer.tokenize(y))
+            self._compare_engines('pre_tokenize_str', x, lambda e, y: pretokenizers[e].pre_tokenize_str(y))
+        # end for
+
+        self._compare_engines('pipeline', text, lambda e, x: _pipeline(normalizers[e], pretokenizers[e], x))
+
+        if self._tokenizers:
+            self._compare_engines('encode', text, lambda e, x: _encode(self._tokenizers[e], x))
+        # end if
+
+    def run(self, texts: Iterable[str]) -> dict:
+        for text in texts:
+            self.check(text)
+        # end for
+
+        return self.results
+
+    @property
+    def divergences(self) -> int:
+        """The divergences between the engines, without the parity ones."""
+
+        return sum([y['divergences'] for x, y in self.results.items()
+                    if x not in DifferentialHarness.parity_checks])
+
+    @property
+    def parity_divergences(self) -> int:
+        return sum([self.results[x]['divergences'] for x in DifferentialHarness.parity_checks])
+
+    def print_report(self, file=sys.stdout) -> None:
+        print(f'Checked [{self.inputs}] inputs', file=file)
+
+        for check, result in self.results.items():
+            if result['checked'] == 0:
+                continue
+            # end if
+
+            print(f'{check:<28}{result["checked"]:>10} checked{result["divergences"]:>8} divergences' +
+                  (' (parity)' if check in DifferentialHarness.parity_checks else ''), file=file)
+
+            for divergence in result['first']:
+                for name, value in divergence.items():
+                    print(f'  {name + ":":<15}{value!r}', file=file)
+                # end for
+            # end for
+        # end for
+
+        print(f'Engine divergences: [{self.divergences}], ' +
+              f'parity divergences: [{self.parity_divergences}]', file=file)
+
+
+if __name__ == '__main__':
+    options = {'-n': 10000, '-s': 1234, '-m': 10, '-v': None}
+
+    while len(sys.argv) > 2 and sys.argv[1] in options:
+        match sys.argv[1]:
+            case '-v':
+                options['-v'] = sys.argv[2]
+            case _:
+                options[sys.argv[1]] = int(sys.argv[2])
+        # end match
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if any([x.startswith('-') for x in sys.argv[1:]]):
+        print('Usage: python3 ro_differential.py [-n <adversarial string count>] [-s <seed>] ' +
+              '[-m <max reported divergences per check>] [-v <vocab.txt>] ' +
+              '[<corpus .txt files or folders>...]', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    harness = DifferentialHarness(vocab_file=options['-v'], max_divergences=options['-m'])
+    harness.run(corpus_lines(sys.argv[1:]))
+    harness.run(adversarial_strings(options['-n'], seed=options['-s']))
+    harness.print_report()
+
+    # The parity divergences are only reported
+    if harness.divergences > 0:
+        exit(1)
+    # end if
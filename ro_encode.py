@@ -0,0 +1,307 @@
+# Bulk encoding of text lines (from files or stdin) to token ids with the RoBertWordPieceTokenizer,
+# in parallel worker processes, keeping the input order. Output formats:
+# - jsonl: one JSON list of ids per input line;
+# - npy: a 1-D uint32 .npy array with all the ids, and a <name>.offsets.npy int64 array with
+#   the start of each line's ids (line count + 1 values);
+# - u32: records of little-endian uint32 values, each one the id count followed by the ids,
+#   and, if written to a file, a <name>.idx uint64 array with the byte offset of each record.
+# Throughput is reported on stderr at the end.
+# This is the rwpt-encode command, e.g.
+# python3 ro_encode.py -p 8 -f u32 -o corola.u32 model/vocab.txt corola/*.txt
+
+import io
+import os
+import sys
+import json
+from collections import deque
+from multiprocessing import Pool
+from time import perf_counter
+from typing import IO, Iterable, Iterator, Optional
+import numpy as np
+from ro_corpusio import open_corpus
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+output_formats = ['jsonl', 'npy', 'u32']
+ids_dtype = np.dtype('<u4')
+_worker_tokenizer = None
+_worker_add_special_tokens = False
+
+
+def _init_worker(vocab_file: str, add_special_tokens: bool) -> None:
+    global _worker_tokenizer, _worker_add_special_tokens
+    _worker_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+    _worker_add_special_tokens = add_special_tokens
+
+
+def encode_lines(lines: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Worker function: returns the concatenated ids of `lines` and the id count of each line."""
+
+    line_ids = _worker_tokenizer.encode_batch_ids(lines, add_special_tokens=_worker_add_special_tokens)
+    lengths = np.asarray([len(x) for x in line_ids], dtype=np.int64)
+    ids = np.fromiter((i for x in line_ids for i in x), dtype=ids_dtype, count=int(lengths.sum()))
+
+    return ids, lengths
+
+
+class JsonlIdsWriter(object):
+    def __init__(self, output: IO[bytes]) -> None:
+        self._output = output
+
+    def write(self, ids: np.ndarray, lengths: np.ndarray) -> None:
+        lines = []
+        start = 0
+
+        for length in lengths.tolist():
+            lines.append(json.dumps(ids[start:start + length].tolist()))
+            start += length
+        # end for
+
+        if lines:
+            self._output.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        # end if
+
+    def close(self) -> None:
+        self._output.flush()
+
+
+class NpyIdsWriter(object):
+    """Streams the ids to a .npy file, whose header is written with a placeholder
+    shape and rewritten, with the same size, when the file is closed."""
+
+    header_size = 128
+
+    def __init__(self, output_file: str) -> None:
+        self._output_file = output_file
+        self._output = open(output_file, mode='wb')
+        self._offsets = [0]
+        self._output.write(self._header(0))
+
+    @staticmethod
+    def _header(id_count: int) -> bytes:
+        header = f"{{'descr': '{ids_dtype.str}', 'fortran_order': False, 'shape': ({id_count},), }}"
+        header_len = NpyIdsWriter.header_size - 10
+
+        return b'\x93NUMPY\x01\x00' + header_len.to_bytes(2, 'little') + \
+            (header.ljust(header_len - 1) + '\n').encode('latin-1')
+
+    def write(self, ids: np.ndarray, lengths: np.ndarray) -> None:
+        self._output.write(ids.tobytes())
+        self._offsets.extend((np.cumsum(lengths) + self._offsets[-1]).tolist())
+
+    def close(self) -> None:
+        self._output.seek(0)
+        self._output.write(self._header(self._offsets[-1]))
+        self._output.close()
+        np.save(offsets_file_name(self._output_file), np.asarray(self._offsets, dtype=np.int64))
+
+
+class U32IdsWriter(object):
+    def __init__(self, output: IO[bytes], index_file: Optional[str] = None) -> None:
+        self._output = output
+        self._index_file = index_file
+        self._offsets = [0]
+
+    def write(self, ids: np.ndarray, lengths: np.ndarray) -> None:
+        records = np.empty(len(ids) + len(lengths), dtype=ids_dtype)
+        # The position of each length prefix in records
+        prefix_positions = np.arange(len(lengths)) + np.cumsum(lengths) - lengths
+        is_prefix = np.zeros(len(records), dtype=bool)
+        is_prefix[prefix_positions] = True
+        records[is_prefix] = lengths
+        records[~is_prefix] = ids
+        self._output.write(records.tobytes())
+
+        if self._index_file is not None:
+            self._offsets.extend((np.cumsum(lengths + 1) * ids_dtype.itemsize + self._offsets[-1]).tolist())
+        # end if
+
+    def close(self) -> None:
+        self._output.flush()
+
+        if self._index_file is not None:
+            np.asarray(self._offsets, dtype='<u8').tofile(self._index_file)
+        # end if
+
+
+def offsets_file_name(npy_file: str) -> str:
+    if npy_file.endswith('.npy'):
+        npy_file = npy_file[:-len('.npy')]
+    # end if
+
+    return npy_file + '.offsets.npy'
+
+
+def iter_u32_records(u32_file: str) -> Iterator[np.ndarray]:
+    """Reads back the ids of each line from a `u32` output file."""
+
+    values = np.fromfile(u32_file, dtype=ids_dtype)
+    i = 0
+
+    while i < len(values):
+        length = int(values[i])
+        yield values[i + 1:i + 1 + length]
+        i += length + 1
+    # end while
+
+
+def iter_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[list[str]]:
+    chunk = []
+
+    for line in lines:
+        chunk.append(line.rstrip('\n'))
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+        # end if
+    # end for
+
+    if chunk:
+        yield chunk
+    # end if
+
+
+def encode_stream(lines: Iterable[str], vocab_file: str, writer,
+                  process_count: int = 1, chunk_size: int = 1000,
+                  add_special_tokens: bool = False) -> dict:
+    """Encodes `lines` in chunks of `chunk_size` lines, with `process_count` worker
+    processes (in this process, if `0`), and writes the ids in input order with `writer`.
+    Returns the line, character and id counts and the elapsed time."""
+
+    start = perf_counter()
+    stats = {'lines': 0, 'chars': 0, 'ids': 0}
+
+    def _write(ids: np.ndarray, lengths: np.ndarray) -> None:
+        writer.write(ids, lengths)
+        stats['lines'] += len(lengths)
+        stats['ids'] += len(ids)
+
+    def _counted_chunks() -> Iterator[list[str]]:
+        for chunk in iter_chunks(lines, chunk_size):
+            stats['chars'] += sum([len(x) for x in chunk])
+            yield chunk
+        # end for
+
+    if process_count <= 0:
+        _init_worker(vocab_file, add_special_tokens)
+
+        for chunk in _counted_chunks():
+            _write(*encode_lines(chunk))
+        # end for
+    else:
+        with Pool(processes=process_count, initializer=_init_worker,
+                  initargs=(vocab_file, add_special_tokens)) as pool:
+            # Bounded read-ahead: the input is only read as fast as it is encoded
+            pending = deque()
+
+            for chunk in _counted_chunks():
+                pending.append(pool.apply_async(encode_lines, (chunk,)))
+
+                if len(pending) >= 2 * process_count:
+                    _write(*pending.popleft().get())
+                # end if
+            # end for
+
+            while pending:
+                _write(*pending.popleft().get())
+            # end while
+        # end with
+    # end if
+
+    writer.close()
+    stats['seconds'] = perf_counter() - start
+
+    return stats
+
+
+def print_throughput(stats: dict) -> None:
+    seconds = max(stats['seconds'], 1e-9)
+
+    print(f'Encoded [{stats["lines"]}] lines, [{stats["chars"]}] characters, [{stats["ids"]}] ids ' +
+          f'in [{seconds:.3f}] seconds: [{stats["lines"] / seconds:.1f}] lines/s, ' +
+          f'[{stats["chars"] / seconds:.1f}] chars/s, [{stats["ids"] / seconds:.1f}] ids/s',
+          file=sys.stderr, flush=True)
+
+
+def _iter_input_lines(input_files: list[str]) -> Iterator[str]:
+    for input_file in input_files:
+        if input_file == '-':
+            yield from io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        else:
+            with open_corpus(input_file, mode='r') as f:
+                yield from f
+            # end with
+        # end if
+    # end for
+
+
+def main(argv: list[str]) -> int:
+    argv = list(argv)
+    process_count = os.cpu_count()
+    output_format = 'jsonl'
+    output_file = None
+    chunk_size = 1000
+    add_special_tokens = False
+
+    while len(argv) > 2 and argv[1] in ['-p', '-f', '-o', '-c', '-s']:
+        if argv[1] == '-s':
+            add_special_tokens = True
+            argv.pop(1)
+            continue
+        # end if
+
+        match argv[1]:
+            case '-p':
+                process_count = int(argv[2])
+            case '-f':
+                output_format = argv[2]
+            case '-o':
+                output_file = argv[2]
+            case _:
+                chunk_size = int(argv[2])
+        # end match
+
+        argv.pop(2)
+        argv.pop(1)
+    # end while
+
+    if len(argv) < 2 or output_format not in output_formats or \
+            (output_format == 'npy' and output_file is None):
+        print('Usage: rwpt-encode [-p <process count>] [-f jsonl|npy|u32] [-o <output file>] ' +
+              '[-c <lines per chunk>] [-s (add [CLS] and [SEP] to each line)] <vocab.txt> [<input file> ...]\n' +
+              'Reads stdin if no input file (or -) is given. Writes to stdout if no output file is given, ' +
+              'except for npy.', file=sys.stderr, flush=True)
+        return 1
+    # end if
+
+    vocab_file = argv[1]
+    input_files = argv[2:] or ['-']
+
+    if output_format == 'npy':
+        writer = NpyIdsWriter(output_file)
+    else:
+        output = open(output_file, mode='wb') if output_file is not None else sys.stdout.buffer
+
+        if output_format == 'jsonl':
+            writer = JsonlIdsWriter(output)
+        else:
+            writer = U32IdsWriter(output, index_file=output_file + '.idx' if output_file is not None else None)
+        # end if
+    # end if
+
+    stats = encode_stream(_iter_input_lines(input_files), vocab_file, writer,
+                          process_count=process_count, chunk_size=chunk_size,
+                          add_special_tokens=add_special_tokens)
+
+    if output_format != 'npy' and output_file is not None:
+        output.close()
+    # end if
+
+    print_throughput(stats)
+
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main(sys.argv))
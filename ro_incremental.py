@@ -0,0 +1,192 @@
+# Incremental encoding of a document that is edited, e.g. in a text editor:
+# after each edit, only a window of whitespace-delimited words around it is
+# normalized, pre-tokenized and encoded again, and the ids, tokens and offsets
+# of the document are patched with the result.
+# The window has enough context words on each side for the MWEs (and abbreviations)
+# of the RoTokenizer, and it is accepted only if its first and last tokens are the same
+# as the ones of the document, i.e. the window encoding is in sync with the rest of it.
+# Otherwise, the window is widened, up to the whole document.
+
+from time import perf_counter
+import numpy as np
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+class IncrementalEncoder(object):
+    """Keeps the encoding of a document, without special tokens, up to date with its edits."""
+
+    def __init__(self, tokenizer: RoBertWordPieceTokenizer, text: str = '',
+                 context_words: int | None = None) -> None:
+        """`context_words` is the number of words kept on each side of an edit, which defaults
+        to the maximum length of a RoTokenizer MWE, plus one (also after MWEs are added)."""
+
+        self._tokenizer = tokenizer
+        self._context_words = context_words
+        self._text = ''
+        self._ids = []
+        self._tokens = []
+        # Start and end character offsets in the document, one row for each token
+        self._offsets = np.zeros((0, 2), dtype=np.int64)
+        self.stats = {'edits': 0, 'window_chars': 0, 'widened': 0, 'full_encodes': 0, 'seconds': 0.}
+        self.reset(text)
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def ids(self) -> list[int]:
+        return self._ids
+
+    @property
+    def tokens(self) -> list[str]:
+        return self._tokens
+
+    @property
+    def offsets(self) -> list[tuple[int, int]]:
+        return [(x, y) for x, y in self._offsets.tolist()]
+
+    def reset(self, text: str) -> None:
+        """Encodes the whole `text`."""
+
+        self._text = text
+        self._ids, self._tokens, self._offsets = self._encode(text, 0)
+        self.stats['full_encodes'] += 1
+
+    def _encode(self, text: str, shift: int) -> tuple[list[int], list[str], np.ndarray]:
+        encoding = self._tokenizer.encode(text, add_special_tokens=False)
+        offsets = np.asarray(encoding.offsets, dtype=np.int64).reshape(-1, 2) + shift
+
+        return encoding.ids, encoding.tokens, offsets
+
+    @staticmethod
+    def _left_boundary(text: str, position: int, word_count: int) -> int:
+        """The start of the `word_count`-th word to the left of `position`,
+        counting the word that `position` is in."""
+
+        i = position
+
+        for _ in range(word_count):
+            while i > 0 and text[i - 1].isspace():
+                i -= 1
+            # end while
+
+            while i > 0 and not text[i - 1].isspace():
+                i -= 1
+            # end while
+        # end for
+
+        return i
+
+    @staticmethod
+    def _right_boundary(text: str, position: int, word_count: int) -> int:
+        i = position
+
+        for _ in range(word_count):
+            while i < len(text) and text[i].isspace():
+                i += 1
+            # end while
+
+            while i < len(text) and not text[i].isspace():
+                i += 1
+            # end while
+        # end for
+
+        return i
+
+    def _token_range(self, left: int, right: int) -> tuple[int, int]:
+        """The indexes of the first token starting at or after `left` and
+        of the first token starting at or after `right`."""
+
+        starts = self._offsets[:, 0]
+
+        return int(np.searchsorted(starts, left, side='left')), int(np.searchsorted(starts, right, side='left'))
+
+    def _in_sync(self, start: int, end: int, delta: int, left: int, right: int, first: int, last: int,
+                 ids: list[int], offsets: np.ndarray) -> bool:
+        """Checks that the window encoding starts and ends with the same tokens as the
+        document, outside of the edited [`start`, `end`) characters."""
+
+        # No document token crosses the window boundaries
+        if first > 0 and self._offsets[first - 1, 1] > left:
+            return False
+        # end if
+
+        if last > 0 and self._offsets[last - 1, 1] > right:
+            return False
+        # end if
+
+        if left > 0:
+            if first >= last or not ids or self._offsets[first, 1] > start or \
+                    ids[0] != self._ids[first] or (offsets[0] != self._offsets[first]).any():
+                return False
+            # end if
+        # end if
+
+        if right < len(self._text):
+            if first >= last or not ids or self._offsets[last - 1, 0] < end or \
+                    ids[-1] != self._ids[last - 1] or (offsets[-1] != self._offsets[last - 1] + delta).any():
+                return False
+            # end if
+        # end if
+
+        return True
+
+    def edit(self, start: int, end: int, replacement: str) -> tuple[int, int, int]:
+        """Replaces the [`start`, `end`) characters of the document with `replacement` and updates
+        the encoding. Returns the index of the first changed token, the number of removed tokens
+        and the number of inserted tokens, e.g. to patch a copy of the ids."""
+
+        if not 0 <= start <= end <= len(self._text):
+            raise ValueError(f'Edit [{start}, {end}) is out of the document range [0, {len(self._text)}]')
+        # end if
+
+        begin_time = perf_counter()
+        old_text = self._text
+        new_text = old_text[:start] + replacement + old_text[end:]
+        delta = len(replacement) - (end - start)
+        word_count = self._context_words
+        self.stats['edits'] += 1
+
+        if word_count is None:
+            word_count = self._tokenizer._lexicon_pretokenizer._romanian_tokenizer._maxmwelen + 1
+        # end if
+
+        while True:
+            left = IncrementalEncoder._left_boundary(old_text, start, word_count)
+            right = IncrementalEncoder._right_boundary(old_text, end, word_count)
+
+            if left == 0 and right == len(old_text):
+                token_count = len(self._ids)
+                self.reset(new_text)
+                self.stats['seconds'] += perf_counter() - begin_time
+
+                return 0, token_count, len(self._ids)
+            # end if
+
+            ids, tokens, offsets = self._encode(new_text[left:right + delta], left)
+            self.stats['window_chars'] += right + delta - left
+            first, last = self._token_range(left, right)
+
+            if self._in_sync(start, end, delta, left, right, first, last, ids, offsets):
+                break
+            # end if
+
+            word_count *= 2
+            self.stats['widened'] += 1
+        # end while
+
+        self._text = new_text
+        self._ids[first:last] = ids
+        self._tokens[first:last] = tokens
+        tail = self._offsets[last:] + delta
+        self._offsets = np.concatenate([self._offsets[:first], offsets, tail])
+        self.stats['seconds'] += perf_counter() - begin_time
+
+        return first, last - first, len(ids)
+
+    def insert(self, position: int, text: str) -> tuple[int, int, int]:
+        return self.edit(position, position, text)
+
+    def delete(self, start: int, end: int) -> tuple[int, int, int]:
+        return self.edit(start, end, '')
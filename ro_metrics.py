@@ -0,0 +1,166 @@
+# Opt-in instrumentation of the Romanian tokenization pipeline: cumulative timers
+# and call counts for each stage (normalizer, RoTokenizer scan, dashed words, ABBR/MWE
+# recognition, pre-tokenizer re-sync, whole encodes) and event counters
+# (out-of-sync pre-tokenizations, ABBR/MWE matches, dash splits, JUNK tokens).
+# It is disabled by default. Enable it with `metrics.enable()` or by setting the
+# RWPT_METRICS=1 environment variable. When disabled, the instrumented code only
+# tests the `metrics.enabled` attribute.
+# Counters are kept per process; with multiprocessing, collect and add the snapshots.
+# They are updated under a lock, since e.g. ro_service.py encodes from several threads.
+
+import os
+import sys
+import threading
+from time import perf_counter
+import rodna.tokenizer
+
+
+class StageMetrics(object):
+    """Cumulative timers and event counters of the tokenization stages."""
+
+    # The Python stages called by the Rust tokenizer during an encode
+    pipeline_stages = set(['normalizer', 'pre_tokenizer'])
+
+    def __init__(self) -> None:
+        self.enabled = os.environ.get('RWPT_METRICS', '0') not in ['', '0']
+        # Always log the first `log_first` occurrences of an event,
+        # then only every `log_every`-th occurrence
+        self.log_first = 10
+        self.log_every = 1000
+        self._stages = {}
+        self._counters = {}
+        # The pipeline stage times are per thread, such that an encode
+        # only subtracts the ones of its own normalizer and pre-tokenizer calls
+        self._thread_times = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages = {}
+            self._counters = {}
+            self._thread_times = threading.local()
+        # end with
+
+    @property
+    def pipeline_seconds(self) -> float:
+        """The time of the Python pipeline stages called in the current thread."""
+
+        return getattr(self._thread_times, 'pipeline_seconds', 0.)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Adds one call of `seconds` to the `stage` timer."""
+
+        if stage in StageMetrics.pipeline_stages:
+            self._thread_times.pipeline_seconds = self.pipeline_seconds + seconds
+        # end if
+
+        with self._lock:
+            if stage not in self._stages:
+                self._stages[stage] = [0, 0.]
+            # end if
+
+            timer = self._stages[stage]
+            timer[0] += 1
+            timer[1] += seconds
+        # end with
+
+    def increment(self, counter: str, value: int = 1) -> int:
+        """Adds `value` to the `counter` and returns its new value."""
+
+        with self._lock:
+            count = self._counters.get(counter, 0) + value
+            self._counters[counter] = count
+        # end with
+
+        return count
+
+    def count_event(self, counter: str, message: str) -> None:
+        """Counts a rare event, e.g. `out_of_sync`, even if metrics are disabled,
+        and logs a sample of the occurrences to stderr."""
+
+        count = self.increment(counter)
+
+        if count <= self.log_first or count % self.log_every == 0:
+            print(f'{message} [occurrence {count} of {counter}]', file=sys.stderr, flush=True)
+        # end if
+
+    def snapshot(self) -> dict:
+        """A copy of the current values, as `{'stages': {stage: {'calls': int, 'seconds': float}},
+        'counters': {counter: int}}`."""
+
+        with self._lock:
+            return {
+                'stages': {stage: {'calls': timer[0], 'seconds': timer[1]}
+                           for stage, timer in sorted(self._stages.items())},
+                'counters': dict(sorted(self._counters.items()))
+            }
+        # end with
+
+    def prometheus_text(self, prefix: str = 'rwpt') -> str:
+        """The current values in the Prometheus text exposition format."""
+
+        snapshot = self.snapshot()
+        lines = [
+            f'# HELP {prefix}_stage_seconds_total Cumulative time spent in each tokenization stage.',
+            f'# TYPE {prefix}_stage_seconds_total counter'
+        ]
+
+        for stage, values in snapshot['stages'].items():
+            lines.append(f'{prefix}_stage_seconds_total{{stage="{stage}"}} {values["seconds"]:.9f}')
+        # end for
+
+        lines.append(f'# HELP {prefix}_stage_calls_total Number of calls of each tokenization stage.')
+        lines.append(f'# TYPE {prefix}_stage_calls_total counter')
+
+        for stage, values in snapshot['stages'].items():
+            lines.append(f'{prefix}_stage_calls_total{{stage="{stage}"}} {values["calls"]}')
+        # end for
+
+        lines.append(f'# HELP {prefix}_events_total Number of tokenization events of each kind.')
+        lines.append(f'# TYPE {prefix}_events_total counter')
+
+        for counter, value in snapshot['counters'].items():
+            lines.append(f'{prefix}_events_total{{event="{counter}"}} {value}')
+        # end for
+
+        return '\n'.join(lines) + '\n'
+
+
+# The metrics of this process, also the ones of the RoTokenizer stages
+metrics = StageMetrics()
+rodna.tokenizer.set_metrics(metrics)
+
+
+if __name__ == '__main__':
+    from ro_wordpiece import RoBertWordPieceTokenizer
+    # The instrumented modules use the metrics of the imported
+    # ro_metrics module, not the ones of this __main__ module
+    from ro_metrics import metrics
+
+    if len(sys.argv) != 3:
+        print('Usage: python3 ro_metrics.py <vocab.txt> <sentences .txt file>', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    ro_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=sys.argv[1])
+
+    with open(sys.argv[2], mode='r', encoding='utf-8') as f:
+        input_texts = [line.strip() for line in f]
+    # end with
+
+    metrics.enable()
+    start = perf_counter()
+
+    for text in input_texts:
+        ro_tokenizer.encode(text)
+    # end for
+
+    print(f'Encoded [{len(input_texts)}] lines in [{perf_counter() - start:.3f}] seconds',
+          file=sys.stderr, flush=True)
+    print(metrics.prometheus_text(), end='')
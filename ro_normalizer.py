@@ -1,5 +1,12 @@
 import re
+from pathlib import Path
+from itertools import groupby, islice
+from time import perf_counter
+from typing import Iterable
 from tokenizers import NormalizedString, Regex
+from ro_metrics import metrics
+from ro_corpusio import open_corpus, CorpusWriter
+from rodna.tokenizer import ro_engines
 
 
 # Prefixes from paper:
@@ -20,14 +27,50 @@ ro_morpho_prefixes = [
 ]
 
 
+def _prefix_lookbehind_pattern(prefixes: list[str], letter: str) -> re.Pattern:
+    """Matches the `letter` after one of the `prefixes` at the start of a word, i.e.
+    the `letter` of `\\b(?:prefix1|prefix2|...)letter`. A look-behind has a fixed width,
+    so there is one for each prefix length."""
+
+    lookbehinds = []
+
+    for _, same_length in groupby(sorted(prefixes, key=len), key=len):
+        lookbehinds.append(f'(?<=\\b(?:{"|".join(same_length)}){letter})')
+    # end for
+
+    return re.compile(letter + '(?:' + '|'.join(lookbehinds) + ')')
+
+
 class RomanianNormalizer(object):
     """Takes a Romanian text and performs normalizations such as:
     - use of proper diacritics for 'ș' and 'ț'
     - enforce up-to-date Romanian Academy writing norms"""
 
-    def __init__(self) -> None:
-        """Nothing to init here."""
-        pass
+    # Joins the lines of a block in normalize_batch()
+    _line_separator = '\x00'
+    # The 'fast' engine tables. The patterns start with the letter they replace, such that
+    # `re` skips to its occurrences, which matters on the large blocks of normalize_batch().
+    _i_to_a_table = str.maketrans('îÎ', 'âÂ')
+    _fi_pattern = re.compile(r'înt(?<=\b[sS]înt)(em|eți)?\b')
+    _i_at_boundary_pattern = re.compile(r'â(?:(?!\w)|(?<!\wâ))')
+    _i_uc_at_boundary_pattern = re.compile(r'Â(?:(?!\w)|(?<!\wÂ))')
+    # After step 6, 'â' is never after a '-', so the '-â' prefix rules never match.
+    # At most one prefix can match at a word start, since no prefix contains 'â'.
+    _prefix_pattern = _prefix_lookbehind_pattern(ro_morpho_prefixes, 'â')
+    _prefix_uc_pattern = _prefix_lookbehind_pattern([x.upper() for x in ro_morpho_prefixes], 'Â')
+
+    def __init__(self, engine: str = 'reference') -> None:
+        """`engine` is one of `ro_engines`."""
+
+        if engine not in ro_engines:
+            raise ValueError(f'Unknown engine [{engine}], expected one of {ro_engines}')
+        # end if
+
+        self._engine = engine
+
+    @property
+    def engine(self) -> str:
+        return self._engine
 
     def _replace_diacs(self, char: str) -> str:
         match char:
@@ -44,6 +87,22 @@ class RomanianNormalizer(object):
         # end match
 
     def normalize(self, normalized: NormalizedString) -> None:
+        if metrics.enabled:
+            start = perf_counter()
+            self._normalize_dispatch(normalized)
+            metrics.add_time('normalizer', perf_counter() - start)
+        else:
+            self._normalize_dispatch(normalized)
+        # end if
+
+    def _normalize_dispatch(self, normalized: NormalizedString) -> None:
+        if self._engine == 'fast':
+            self._fast_normalize(normalized)
+        else:
+            self._normalize(normalized)
+        # end if
+
+    def _normalize(self, normalized: NormalizedString) -> None:
         # 1. Remove spaces left and right
         normalized.strip()
         # 2. Use standard Romanian diacritics
@@ -76,6 +135,91 @@ class RomanianNormalizer(object):
         # end for
 
     def normalize_str(self, sequence: str) -> str:
+        if metrics.enabled:
+            start = perf_counter()
+            sequence = self._fast_normalize_str(sequence) if self._engine == 'fast' \
+                else self._normalize_str(sequence)
+            metrics.add_time('normalizer', perf_counter() - start)
+
+            return sequence
+        # end if
+
+        if self._engine == 'fast':
+            return self._fast_normalize_str(sequence)
+        # end if
+
+        return self._normalize_str(sequence)
+
+    def _normalize_block(self, lines: list[str]) -> list[str]:
+        """Normalizes the stripped `lines`, which do not contain `_line_separator`, with one
+        `normalize_str()` call. The separator is kept by the strip and is neither a space
+        (so no `\\s+` run spans two lines) nor a word character (so `\\b` matches at the
+        start and the end of each line, as at the ends of a string)."""
+
+        if not lines:
+            return []
+        # end if
+
+        return self.normalize_str(RomanianNormalizer._line_separator.join(lines)).split(
+            RomanianNormalizer._line_separator)
+
+    def normalize_batch(self, lines: Iterable[str], block_chars: int = 1 << 16) -> list[str]:
+        """Returns the same as `[self.normalize_str(x) for x in lines]`, in order, but normalizes
+        blocks of about `block_chars` characters of lines at once, which is faster for short lines."""
+
+        normalized_lines = []
+        block = []
+        block_size = 0
+
+        for line in lines:
+            line = line.strip()
+
+            if RomanianNormalizer._line_separator in line:
+                normalized_lines.extend(self._normalize_block(block))
+                normalized_lines.append(self.normalize_str(line))
+                block = []
+                block_size = 0
+                continue
+            # end if
+
+            block.append(line)
+            block_size += len(line) + 1
+
+            if block_size >= block_chars:
+                normalized_lines.extend(self._normalize_block(block))
+                block = []
+                block_size = 0
+            # end if
+        # end for
+
+        normalized_lines.extend(self._normalize_block(block))
+
+        return normalized_lines
+
+    def normalize_file(self, input_file: str | Path, output_file: str | Path, block_lines: int = 1000) -> int:
+        """Normalizes each line of the (compressed) `input_file` into the `output_file`,
+        `block_lines` lines at a time, with `normalize_batch()`. Returns the number of lines."""
+
+        line_count = 0
+
+        with CorpusWriter(output_file) as ff:
+            with open_corpus(input_file, mode='r') as f:
+                while True:
+                    lines = list(islice(f, block_lines))
+
+                    if not lines:
+                        break
+                    # end if
+
+                    ff.write_lines(self.normalize_batch(lines))
+                    line_count += len(lines)
+                # end while
+            # end with
+        # end with
+
+        return line_count
+
+    def _normalize_str(self, sequence: str) -> str:
         # 1. Remove spaces left and right
         sequence = sequence.strip()
         # 2. Use standard Romanian diacritics
@@ -111,3 +255,90 @@ class RomanianNormalizer(object):
         # end for
 
         return sequence
+
+    def _fast_normalize(self, normalized: NormalizedString) -> None:
+        """The same steps as `_normalize()`, with the `tokenizers` regular expressions
+        (their \\s and \\b differ from the ones of `re`), but only the rules that can
+        match the text are applied. Checked against `_normalize()` by `ro_differential.py`."""
+
+        # Steps 1 to 3
+        normalized.strip()
+        normalized.map(func=self._replace_diacs)
+        normalized.replace(pattern=Regex(r'\s+'), content=' ')
+        text = normalized.normalized
+
+        if 'î' not in text and 'Î' not in text and 'â' not in text and 'Â' not in text:
+            # Steps 4 to 7 only change words with 'î' or 'â'
+            return
+        # end if
+
+        # 4. Enforce correct forms for 'a fi'
+        if 'sînt' in text:
+            normalized.replace(pattern=Regex(r'\bsînt\b'), content='sunt')
+            normalized.replace(pattern=Regex(r'\bsîntem\b'), content='suntem')
+            normalized.replace(pattern=Regex(r'\bsînteți\b'), content='sunteți')
+        # end if
+
+        if 'Sînt' in text:
+            normalized.replace(pattern=Regex(r'\bSînt\b'), content='Sunt')
+            normalized.replace(pattern=Regex(r'\bSîntem\b'), content='Suntem')
+            normalized.replace(pattern=Regex(r'\bSînteți\b'), content='Sunteți')
+        # end if
+
+        # 5. and 6. Each 'â' of the text is an 'â' or an 'î' of this one
+        text = text.translate(RomanianNormalizer._i_to_a_table)
+
+        if 'â' in text:
+            normalized.replace(pattern='î', content='â')
+            normalized.replace(pattern=Regex(r'â\b'), content='î')
+            normalized.replace(pattern=Regex(r'\bâ'), content='î')
+        # end if
+
+        if 'Â' in text:
+            normalized.replace(pattern='Î', content='Â')
+            normalized.replace(pattern=Regex(r'Â\b'), content='Î')
+            normalized.replace(pattern=Regex(r'\bÂ'), content='Î')
+        # end if
+
+        # 7. The replacements only turn 'â' into 'î', so a prefix rule
+        # can only match if its (translated) pattern is in the text
+        for pref in ro_morpho_prefixes:
+            if pref.translate(RomanianNormalizer._i_to_a_table) + 'â' in text:
+                normalized.replace(pattern=Regex(f'\\b{pref}â'), content=f'{pref}î')
+            # end if
+
+            pref_uc = pref.upper()
+
+            if pref_uc.translate(RomanianNormalizer._i_to_a_table) + 'Â' in text:
+                normalized.replace(pattern=Regex(f'\\b{pref_uc}Â'), content=f'{pref_uc}Î')
+            # end if
+        # end for
+
+    def _fast_normalize_str(self, sequence: str) -> str:
+        """The same steps as `_normalize_str()`, with merged regular expressions."""
+
+        sequence = sequence.replace('ş', 'ș').replace('Ş', 'Ș').replace('ţ', 'ț').replace('Ţ', 'Ț')
+        # str.split() and the \s of re split at the same spaces, and the result is stripped
+        sequence = ' '.join(sequence.split())
+
+        if 'î' not in sequence and 'Î' not in sequence and 'â' not in sequence and 'Â' not in sequence:
+            return sequence
+        # end if
+
+        if 'înt' in sequence:
+            sequence = RomanianNormalizer._fi_pattern.sub(r'unt\1', sequence)
+        # end if
+
+        sequence = sequence.replace('î', 'â').replace('Î', 'Â')
+
+        if 'â' in sequence:
+            sequence = RomanianNormalizer._i_at_boundary_pattern.sub('î', sequence)
+            sequence = RomanianNormalizer._prefix_pattern.sub('î', sequence)
+        # end if
+
+        if 'Â' in sequence:
+            sequence = RomanianNormalizer._i_uc_at_boundary_pattern.sub('Î', sequence)
+            sequence = RomanianNormalizer._prefix_uc_pattern.sub('Î', sequence)
+        # end if
+
+        return sequence
@@ -0,0 +1,184 @@
+# Packs tokenized sentences into fixed-length blocks for BERT pretraining,
+# such that almost no compute is spent on [PAD] tokens:
+# [CLS] s1 [SEP] s2 [SEP] s3 ... with exactly `block_size` ids per block.
+# Sentences that do not fit at the end of a block continue in the next one.
+
+import os
+import sys
+from typing import Iterable, Iterator, Optional, Union
+import numpy as np
+from ro_shards import ShardedTokenDataset, ids_dtype
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+class SequencePacker(object):
+    """Greedily concatenates consecutive sequences of ids, separated by `[SEP]`,
+    into blocks of exactly `block_size` ids, each one starting with `[CLS]`.
+    At the end of a document, `doc_boundary` decides what happens:
+    - `'cross'`: the next document continues in the same block;
+    - `'pad'`: the current block is filled with `[PAD]`, the next document starts a new block;
+    - `'drop'`: the incomplete current block is dropped, the next document starts a new block.
+    The last incomplete block is padded, unless `drop_last` is `True`."""
+
+    doc_boundary_modes = ['cross', 'pad', 'drop']
+
+    def __init__(self, block_size: int, cls_id: int, sep_id: int, pad_id: int,
+                 doc_boundary: str = 'cross', drop_last: bool = False) -> None:
+        if block_size < 2:
+            raise ValueError(f'block_size has to be at least 2, not [{block_size}]')
+        # end if
+
+        if doc_boundary not in SequencePacker.doc_boundary_modes:
+            raise ValueError(f'Unknown document boundary mode [{doc_boundary}]')
+        # end if
+
+        self.block_size = block_size
+        self.cls_id = cls_id
+        self.sep_id = sep_id
+        self.pad_id = pad_id
+        self.doc_boundary = doc_boundary
+        self.drop_last = drop_last
+        self.block_count = 0
+        self.pad_count = 0
+
+    @staticmethod
+    def from_tokenizer(tokenizer: RoBertWordPieceTokenizer, block_size: int, **kwargs) -> 'SequencePacker':
+        """Takes the `[CLS]`, `[SEP]` and `[PAD]` ids from the vocabulary
+        of a `RoBertWordPieceTokenizer`."""
+
+        special_ids = {}
+
+        for token_name in ['cls_token', 'sep_token', 'pad_token']:
+            token = str(tokenizer._parameters[token_name])
+            token_id = tokenizer.token_to_id(token)
+
+            if token_id is None:
+                raise TypeError(f'{token_name} not found in the vocabulary')
+            # end if
+
+            special_ids[token_name] = token_id
+        # end for
+
+        return SequencePacker(block_size=block_size,
+                              cls_id=special_ids['cls_token'],
+                              sep_id=special_ids['sep_token'],
+                              pad_id=special_ids['pad_token'], **kwargs)
+
+    @property
+    def utilization(self) -> float:
+        """The fraction of non-[PAD] ids in the blocks packed so far."""
+
+        if self.block_count == 0:
+            return 1.
+        # end if
+
+        return 1. - self.pad_count / (self.block_count * self.block_size)
+
+    def _make_block(self, content: np.ndarray, fill: int) -> np.ndarray:
+        block = np.empty(self.block_size, dtype=ids_dtype)
+        block[0] = self.cls_id
+        block[1:fill + 1] = content[:fill]
+
+        if fill < self.block_size - 1:
+            block[fill + 1:] = self.pad_id
+            self.pad_count += self.block_size - 1 - fill
+        # end if
+
+        self.block_count += 1
+
+        return block
+
+    def pack(self, sequences: Iterable[Union[np.ndarray, list[int]]],
+             document_starts: Optional[Iterable[int]] = None) -> Iterator[np.ndarray]:
+        """Yields the packed blocks of `sequences`. `document_starts` are the
+        indices of the sequences that start a new document."""
+
+        content_size = self.block_size - 1
+        content = np.empty(content_size, dtype=ids_dtype)
+        sep = np.asarray([self.sep_id], dtype=ids_dtype)
+        fill = 0
+        doc_starts = set(document_starts) if document_starts is not None else set()
+
+        for i, seq in enumerate(sequences):
+            if i in doc_starts and fill > 0 and self.doc_boundary != 'cross':
+                if self.doc_boundary == 'pad':
+                    yield self._make_block(content, fill)
+                # end if
+
+                fill = 0
+            # end if
+
+            for part in (np.asarray(seq, dtype=ids_dtype), sep):
+                # Do not start a block with [SEP]
+                if fill == 0 and part is sep:
+                    continue
+                # end if
+
+                pos = 0
+
+                while pos < len(part):
+                    n = min(content_size - fill, len(part) - pos)
+                    content[fill:fill + n] = part[pos:pos + n]
+                    fill += n
+                    pos += n
+
+                    if fill == content_size:
+                        yield self._make_block(content, fill)
+                        fill = 0
+                    # end if
+                # end while
+            # end for
+        # end for
+
+        if fill > 0 and not self.drop_last:
+            yield self._make_block(content, fill)
+        # end if
+
+
+def pack_dataset(dataset: ShardedTokenDataset, output_file: str, packer: SequencePacker,
+                 batch_blocks: int = 1024) -> np.ndarray:
+    """Packs all the sequences of `dataset` and streams the blocks to `output_file`, as raw
+    little-endian uint32 values. Returns the blocks as a read-only `(block count, block size)` memmap."""
+
+    batch = []
+
+    with open(output_file, mode='wb') as f:
+        for block in packer.pack((dataset[i] for i in range(len(dataset))),
+                                 document_starts=dataset.document_starts.tolist()):
+            batch.append(block)
+
+            if len(batch) >= batch_blocks:
+                f.write(np.stack(batch).tobytes())
+                batch = []
+            # end if
+        # end for
+
+        if batch:
+            f.write(np.stack(batch).tobytes())
+        # end if
+    # end with
+
+    return open_packed_blocks(output_file, block_size=packer.block_size)
+
+
+def open_packed_blocks(packed_file: str, block_size: int) -> np.ndarray:
+    if os.path.getsize(packed_file) == 0:
+        # Empty files cannot be memory mapped
+        return np.empty((0, block_size), dtype=ids_dtype)
+    # end if
+
+    return np.memmap(packed_file, dtype=ids_dtype, mode='r').reshape(-1, block_size)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 5:
+        print('Usage: python3 ro_packing.py <vocab.txt> <shards folder (from ro_shards.py)> ' +
+              '<block size> <output .bin file>', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    ro_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=sys.argv[1])
+    seq_packer = SequencePacker.from_tokenizer(ro_tokenizer, block_size=int(sys.argv[3]))
+    blocks = pack_dataset(ShardedTokenDataset(sys.argv[2]), sys.argv[4], seq_packer)
+    print(f'Packed [{blocks.shape[0]}] blocks of [{blocks.shape[1]}] ids, ' +
+          f'utilization [{seq_packer.utilization:.2%}]', file=sys.stderr, flush=True)
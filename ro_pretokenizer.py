@@ -1,12 +1,28 @@
-import sys
+from time import perf_counter
 from tokenizers import PreTokenizedString
 from tokenizers import NormalizedString
+from tokenizers import normalizers, pre_tokenizers
 from rodna.tokenizer import RoTokenizer
+from ro_normalizer import ro_engines
+from ro_metrics import metrics
 
 
 class RomanianPreTokenizer(object):
-    def __init__(self) -> None:
-        self._romanian_tokenizer = RoTokenizer()
+    def __init__(self, wordforms_file: str | None = None, overlays: list[str] | None = None,
+                 engine: str = 'reference') -> None:
+        """With `engine='fast'`, both the `RoTokenizer` and the offsets
+        synchronization with its tokens use the 'fast' engine."""
+
+        if engine not in ro_engines:
+            raise ValueError(f'Unknown engine [{engine}], expected one of {ro_engines}')
+        # end if
+
+        self._romanian_tokenizer = RoTokenizer(wordforms_file=wordforms_file, overlays=overlays, engine=engine)
+        self._engine = engine
+
+    @property
+    def engine(self) -> str:
+        return self._engine
 
     @property
     def maxwordlen(self) -> int:
@@ -14,6 +30,12 @@ class RomanianPreTokenizer(object):
         return self._romanian_tokenizer._maxwordlen
 
     def _romanian_split(self, index: int, normstr: NormalizedString) -> list[NormalizedString]:
+        timing = metrics.enabled
+
+        if timing:
+            start = perf_counter()
+        # end if
+
         norm_string = normstr.normalized
         result = []
 
@@ -24,6 +46,11 @@ class RomanianPreTokenizer(object):
 
         ro_tokens = self._romanian_tokenizer.tokenize(
             input_string=norm_string)
+
+        if timing:
+            resync_start = perf_counter()
+        # end if
+
         loff = 0
         roff = 0
         crt_token = ro_tokens.pop(0)
@@ -35,8 +62,9 @@ class RomanianPreTokenizer(object):
                         (crt_token[i] == '_' and norm_string[roff] == ' '):
                     roff += 1
                 else:
-                    print(f'Current [{crt_token}] token out of sync (i = {i}, roff = {roff}), in normalized string [{norm_string}]',
-                          file=sys.stderr, flush=True)
+                    metrics.count_event('out_of_sync',
+                                        f'Current [{crt_token}] token out of sync (i = {i}, roff = {roff}), ' +
+                                        f'in normalized string [{norm_string}]')
                     out_of_sync = True
                     break
                 # end if
@@ -67,12 +95,119 @@ class RomanianPreTokenizer(object):
             crt_token = ro_tokens.pop(0)
         # end while
 
+        if timing:
+            now = perf_counter()
+            metrics.add_time('pre_tokenizer.resync', now - resync_start)
+            metrics.add_time('pre_tokenizer', now - start)
+        # end if
+
+        return result
+
+    def _fast_spans(self, sequence: str, ro_tokens: list[str]) -> list[tuple[int, int]]:
+        """The (start, end) offsets of the `ro_tokens` in `sequence`, as the loops of `_romanian_split()`
+        and `pre_tokenize_str()` find them, but comparing whole tokens instead of characters, and without
+        popping the tokens from the front of the list. Only the out of sync tokens are compared character
+        by character, to find where they go out of sync."""
+
+        spans = []
+        loff = 0
+        roff = 0
+        k = 0
+
+        while True:
+            crt_token = ro_tokens[k]
+            k += 1
+            roff = loff + len(crt_token)
+            segment = sequence[loff:roff]
+            out_of_sync = False
+
+            # The RoTokenizer only changes the spaces of MWEs into '_'
+            if segment != crt_token and \
+                    (len(segment) != len(crt_token) or segment.replace(' ', '_') != crt_token):
+                roff = loff
+
+                for i in range(len(crt_token)):
+                    if crt_token[i] == sequence[roff] or \
+                            (crt_token[i] == '_' and sequence[roff] == ' '):
+                        roff += 1
+                    else:
+                        metrics.count_event('out_of_sync',
+                                            f'Current [{crt_token}] token out of sync (i = {i}, roff = {roff}), ' +
+                                            f'in normalized string [{sequence}]')
+                        out_of_sync = True
+                        break
+                    # end if
+                # end for
+            # end if
+
+            spans.append((loff, roff))
+
+            if roff == len(sequence):
+                break
+            elif out_of_sync:
+                if roff < len(sequence):
+                    spans.append((roff, len(sequence)))
+                # end if
+
+                break
+            # end if
+
+            if sequence[roff] == ' ':
+                roff += 1
+            # end if
+
+            loff = roff
+        # end while
+
+        return spans
+
+    def _fast_romanian_split(self, index: int, normstr: NormalizedString) -> list[NormalizedString]:
+        timing = metrics.enabled
+
+        if timing:
+            start = perf_counter()
+        # end if
+
+        norm_string = normstr.normalized
+
+        if not norm_string:
+            return [norm_string]
+        # end if
+
+        ro_tokens = self._romanian_tokenizer.tokenize(input_string=norm_string)
+
+        if timing:
+            resync_start = perf_counter()
+        # end if
+
+        result = [normstr.slice(range=x) for x in self._fast_spans(norm_string, ro_tokens)]
+
+        if timing:
+            now = perf_counter()
+            metrics.add_time('pre_tokenizer.resync', now - resync_start)
+            metrics.add_time('pre_tokenizer', now - start)
+        # end if
+
         return result
 
     def pre_tokenize(self, pretok: PreTokenizedString):
-        pretok.split(func=self._romanian_split)
+        if self._engine == 'fast':
+            pretok.split(func=self._fast_romanian_split)
+        else:
+            pretok.split(func=self._romanian_split)
+        # end if
 
     def pre_tokenize_str(self, sequence: str) -> list[tuple[str, tuple[int, int]]]:
+        if self._engine == 'fast':
+            return self._fast_pre_tokenize_str(sequence)
+        # end if
+
+        timing = metrics.enabled
+
+        if timing:
+            start = perf_counter()
+        # end if
+
         result = []
 
         if not sequence:
@@ -82,6 +217,11 @@ class RomanianPreTokenizer(object):
 
         ro_tokens = self._romanian_tokenizer.tokenize(
             input_string=sequence)
+
+        if timing:
+            resync_start = perf_counter()
+        # end if
+
         loff = 0
         roff = 0
         crt_token = ro_tokens.pop(0)
@@ -93,8 +233,9 @@ class RomanianPreTokenizer(object):
                         (crt_token[i] == '_' and sequence[roff] == ' '):
                     roff += 1
                 else:
-                    print(f'Current [{crt_token}] token out of sync (i = {i}, roff = {roff}), in normalized string [{sequence}]',
-                          file=sys.stderr, flush=True)
+                    metrics.count_event('out_of_sync',
+                                        f'Current [{crt_token}] token out of sync (i = {i}, roff = {roff}), ' +
+                                        f'in normalized string [{sequence}]')
                     out_of_sync = True
                     break
                 # end if
@@ -125,6 +266,39 @@ class RomanianPreTokenizer(object):
             crt_token = ro_tokens.pop(0)
         # end while
 
+        if timing:
+            now = perf_counter()
+            metrics.add_time('pre_tokenizer.resync', now - resync_start)
+            metrics.add_time('pre_tokenizer', now - start)
+        # end if
+
+        return result
+
+    def _fast_pre_tokenize_str(self, sequence: str) -> list[tuple[str, tuple[int, int]]]:
+        timing = metrics.enabled
+
+        if timing:
+            start = perf_counter()
+        # end if
+
+        if not sequence:
+            return [(sequence, (0, 0))]
+        # end if
+
+        ro_tokens = self._romanian_tokenizer.tokenize(input_string=sequence)
+
+        if timing:
+            resync_start = perf_counter()
+        # end if
+
+        result = [(sequence[x:y], (x, y)) for x, y in self._fast_spans(sequence, ro_tokens)]
+
+        if timing:
+            now = perf_counter()
+            metrics.add_time('pre_tokenizer.resync', now - resync_start)
+            metrics.add_time('pre_tokenizer', now - start)
+        # end if
+
         return result
 
 
@@ -146,3 +320,16 @@ class TrainingPreTokenizer(object):
 
     def pre_tokenize(self, pretok: PreTokenizedString):
         pretok.split(func=self._train_split)
+
+    @staticmethod
+    def native_normalizer() -> normalizers.Normalizer:
+        """The built-in equivalent of the `strip()` done in `_train_split()`."""
+        return normalizers.Strip(left=True, right=True)
+
+    @staticmethod
+    def native_pre_tokenizer() -> pre_tokenizers.PreTokenizer:
+        """The built-in equivalent of `_train_split()`. Used together with
+        `native_normalizer()`, it produces the same splits, without calling
+        back into Python, so that the Rust trainer can use all cores."""
+        return pre_tokenizers.Split(pattern=TrainingPreTokenizer.delimiter,
+                                    behavior='removed')
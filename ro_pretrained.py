@@ -0,0 +1,80 @@
+# The RoBertWordPieceTokenizer for the transformers library. It is in its own
+# module, such that `import ro_wordpiece` does not import transformers.
+# `from ro_wordpiece import RoBertPreTrainedTokenizer` still works, and imports this module.
+
+import os
+from typing import Dict, Optional
+from transformers import PreTrainedTokenizer
+from ro_wordpiece import RoBertWordPieceTokenizer, pretrained_config_file
+
+
+class RoBertPreTrainedTokenizer(PreTrainedTokenizer):
+    """Use this class with the `transformers` library.
+
+    The following should be enforced:
+    - the `RoBertWordPieceTokenizer`, which is the underlying tokenizer,
+    is case sensitive, so the use of `do_lower_case` is not tested 
+    - `save_pretrained` writes the `RoBertWordPieceTokenizer.save_pretrained()` artifact,
+    which `from_pretrained` loads from the same (local) folder
+    - this tokenizer cannot be pushed to the HuggingFace hub."""
+
+    vocab_files_names = {
+        'RoBertWordPieceTokenizer': os.path.join(os.path.dirname(__file__), 'model', 'vocab.txt')
+    }
+
+    def __init__(self, *init_inputs, **kwargs):
+        if 'name_or_path' in kwargs and \
+                os.path.isfile(os.path.join(kwargs['name_or_path'], pretrained_config_file)):
+            # When called from RoBertPreTrainedTokenizer.from_pretrained(<save_pretrained() folder>)
+            self._ro_wordpiece_tokenizer = \
+                RoBertWordPieceTokenizer.from_pretrained(directory=kwargs['name_or_path'])
+        elif 'name_or_path' in kwargs:
+            # When called from RoBertPreTrainedTokenizer.from_pretrained(vocab.txt)
+            self._ro_wordpiece_tokenizer = \
+                RoBertWordPieceTokenizer.from_file(
+                    vocab=kwargs['name_or_path'])
+        else:
+            self._ro_wordpiece_tokenizer = RoBertWordPieceTokenizer.from_file(
+                vocab=RoBertPreTrainedTokenizer.vocab_files_names['RoBertWordPieceTokenizer'])
+        
+        # The tokenizer_config.json of save_pretrained() also has the special tokens
+        for name in ['unk_token', 'sep_token', 'pad_token', 'cls_token', 'mask_token']:
+            kwargs.setdefault(name, self._ro_wordpiece_tokenizer._parameters[name])
+        # end for
+
+        super().__init__(**kwargs)
+
+    @property
+    def vocab_size(self) -> int:
+        """
+        `int`: Size of the base vocabulary (without externally added new tokens).
+        """
+        return self._ro_wordpiece_tokenizer.get_vocab_size(with_added_tokens=True)
+    
+    def get_vocab(self) -> Dict[str, int]:
+        return self._ro_wordpiece_tokenizer.get_vocab(with_added_tokens=True)
+
+    def _tokenize(self, text, **kwargs):
+        return self._ro_wordpiece_tokenizer.encode(sequence=text,
+                                                   is_pretokenized=False,
+                                                   add_special_tokens=False).tokens
+
+    def _convert_token_to_id(self, token):
+        return self._ro_wordpiece_tokenizer.token_to_id(token=token)
+    
+    def _convert_id_to_token(self, index: int) -> str:
+        return self._ro_wordpiece_tokenizer.id_to_token(id=index)
+
+    def save_vocabulary(self, save_directory: str, filename_prefix: Optional[str] = None) -> tuple[str]:
+        """Called by `save_pretrained`. The prefix is not used, as the
+        artifact files have fixed names."""
+
+        return tuple(self._ro_wordpiece_tokenizer.save_pretrained(directory=save_directory))
+
+    def save_pretrained(self, save_directory: str, *args, **kwargs) -> tuple[str]:
+        """The files that `PreTrainedTokenizer.save_pretrained()` wrote. It also lists an
+        `added_tokens.json`, even if it did not write one."""
+
+        saved_files = super().save_pretrained(save_directory, *args, **kwargs)
+
+        return tuple([x for x in saved_files if os.path.isfile(x)])
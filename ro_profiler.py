@@ -0,0 +1,239 @@
+# A low-overhead, stdlib-only sampling profiler for the preprocessing and training jobs
+# (the --profile option of corola.py, ro_traindata.py and ro_wordpiece.py).
+# A background thread records the Python stack of the main thread (by default, or of all
+# the other threads) every `interval` seconds, so the profiled code runs unchanged, unlike
+# with cProfile, whose per-call overhead distorts the per-character loops of the RoTokenizer.
+# Only the main thread is sampled by default, since the helper threads (e.g. the ones of a
+# multiprocessing.Pool or of tqdm) mostly wait and would crowd out the real work.
+# Each (worker) process writes a profile-<pid>.collapsed file to the profile folder, in the
+# collapsed stacks format of flamegraph.pl and speedscope ('frame;frame;frame <count>').
+# At the end, the files are merged into profile.collapsed and a top functions summary,
+# profile_top.txt. The scripts remove the profiles of earlier runs from the folder when
+# they start. Merge them again, e.g. after a crash, with
+# python3 ro_profiler.py <profile folder>
+
+import os
+import sys
+import threading
+from pathlib import Path
+from collections import Counter
+from multiprocessing.util import Finalize
+
+
+merged_profile_file = 'profile.collapsed'
+top_functions_file = 'profile_top.txt'
+
+
+class SamplingProfiler(object):
+    """Samples the Python stack of the main thread of the process or,
+    with `all_threads=True`, the ones of all the threads, except its own."""
+
+    def __init__(self, interval: float = 0.005, all_threads: bool = False) -> None:
+        self._interval = interval
+        self._all_threads = all_threads
+        self._samples = Counter()
+        self._labels = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def samples(self) -> Counter:
+        """The number of samples of each stack, as a tuple of frame labels, from the outermost frame."""
+        return self._samples
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+
+        if label is None:
+            label = f'{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})'
+            # ';' separates the frames and ' ' the count, in the collapsed format
+            label = label.replace(';', ',')
+            self._labels[code] = label
+        # end if
+
+        return label
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        main_id = threading.main_thread().ident
+
+        while not self._stop_event.wait(self._interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (not self._all_threads and thread_id != main_id):
+                    continue
+                # end if
+
+                stack = []
+
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                # end while
+
+                stack.reverse()
+                self._samples[tuple(stack)] += 1
+            # end for
+        # end while
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._sample, name='SamplingProfiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        # end if
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def collapsed_lines(self) -> list[str]:
+        return [';'.join(stack) + f' {count}' for stack, count in sorted(self._samples.items())]
+
+    def save(self, collapsed_file: str | Path) -> None:
+        with open(collapsed_file, mode='w', encoding='utf-8') as f:
+            f.write(''.join([x + '\n' for x in self.collapsed_lines()]))
+        # end with
+
+
+def process_profile_file(profile_folder: str | Path) -> str:
+    """The collapsed stacks file of the current process."""
+    return os.path.join(profile_folder, f'profile-{os.getpid()}.collapsed')
+
+
+def clear_profiles(profile_folder: str | Path) -> int:
+    """Makes the `profile_folder` and removes the profiles of an earlier run from it, such that
+    `merge_profiles()` does not mix them in. Returns the number of removed files."""
+
+    os.makedirs(profile_folder, exist_ok=True)
+    old_files = list(Path(profile_folder).glob('profile-*.collapsed')) + \
+        [Path(profile_folder) / x for x in [merged_profile_file, top_functions_file]]
+    removed = 0
+
+    for old_file in old_files:
+        if old_file.exists():
+            old_file.unlink()
+            removed += 1
+        # end if
+    # end for
+
+    return removed
+
+
+def _stop_and_save(profiler: SamplingProfiler, profile_folder: str | Path) -> None:
+    profiler.stop()
+    profiler.save(process_profile_file(profile_folder))
+
+
+def start_process_profiler(profile_folder: str | Path, interval: float = 0.005) -> SamplingProfiler:
+    """Profiles the current process until it exits normally, e.g. as the `initializer` of a
+    `multiprocessing.Pool`, whose workers have to be stopped with `close()` and `join()`
+    (not `terminate()`) for the profiles to be saved."""
+
+    os.makedirs(profile_folder, exist_ok=True)
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    Finalize(None, _stop_and_save, args=(profiler, profile_folder), exitpriority=100)
+
+    return profiler
+
+
+def run_profiled(profile_folder: str | Path, function, *args):
+    """Calls `function(*args)` under a profiler, e.g. as the `target` of a `multiprocessing.Process`."""
+
+    os.makedirs(profile_folder, exist_ok=True)
+    profiler = SamplingProfiler()
+
+    try:
+        with profiler:
+            return function(*args)
+        # end with
+    finally:
+        profiler.save(process_profile_file(profile_folder))
+    # end try
+
+
+def read_collapsed(collapsed_file: str | Path) -> Counter:
+    stacks = Counter()
+
+    with open(collapsed_file, mode='r', encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+
+            if stack:
+                stacks[stack] += int(count)
+            # end if
+        # end for
+    # end with
+
+    return stacks
+
+
+def top_functions(stacks: Counter, count: int = 30) -> list[tuple[str, int, int]]:
+    """The `count` functions with the most samples, as (function, self samples, total samples).
+    The total samples of a function include its callees, once per stack (e.g. for recursion)."""
+
+    self_samples = Counter()
+    total_samples = Counter()
+
+    for stack, samples in stacks.items():
+        frames = stack.split(';')
+        self_samples[frames[-1]] += samples
+
+        for frame in set(frames):
+            total_samples[frame] += samples
+        # end for
+    # end for
+
+    return [(x, self_samples[x], total_samples[x]) for x in
+            sorted(total_samples, key=lambda x: (-self_samples[x], -total_samples[x], x))[:count]]
+
+
+def merge_profiles(profile_folder: str | Path, count: int = 30) -> str:
+    """Merges the per-process profiles of `profile_folder` into `profile.collapsed`,
+    writes the top `count` functions to `profile_top.txt` and returns them, as text."""
+
+    profile_files = sorted([x for x in Path(profile_folder).glob('profile-*.collapsed')])
+    stacks = Counter()
+
+    for profile_file in profile_files:
+        stacks.update(read_collapsed(profile_file))
+    # end for
+
+    with open(Path(profile_folder) / merged_profile_file, mode='w', encoding='utf-8') as f:
+        f.write(''.join([f'{stack} {samples}\n' for stack, samples in sorted(stacks.items())]))
+    # end with
+
+    sample_count = sum(stacks.values())
+    percent = 100 / max(sample_count, 1)
+    lines = [f'[{sample_count}] samples from [{len(profile_files)}] processes',
+             f'{"self %":>8}{"total %":>9}  function']
+
+    for function, self_samples, total_samples in top_functions(stacks, count=count):
+        lines.append(f'{self_samples * percent:8.2f}{total_samples * percent:9.2f}  {function}')
+    # end for
+
+    summary = ''.join([x + '\n' for x in lines])
+
+    with open(Path(profile_folder) / top_functions_file, mode='w', encoding='utf-8') as f:
+        f.write(summary)
+    # end with
+
+    return summary
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: python3 ro_profiler.py <profile folder with profile-<pid>.collapsed files>',
+              file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    print(merge_profiles(sys.argv[1]), end='')
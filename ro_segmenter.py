@@ -0,0 +1,106 @@
+# A fast, streaming sentence segmenter for raw Romanian text, e.g. with paragraph-long
+# or file-long lines, that splits after '.', '!', '?' or '…' (and closing quotes or
+# brackets), followed by spaces and by a character that is not a lowercase letter.
+# It does not split after the abbreviations of the RoTokenizer lexicon (rodna/data/abbrs.txt,
+# e.g. 'nr.' or 'S.U.A.', and the ones added at runtime) or after initials, e.g. 'I. L. Caragiale'.
+# Sentences longer than `max_sentence_chars` are cut at the last space before the limit,
+# such that each line of the output is bounded.
+
+import re
+from typing import Iterable, Iterator
+from rodna.tokenizer import RoTokenizer
+
+
+class RomanianSentenceSegmenter(object):
+    """Splits lines of text in sentences, using the abbreviations of a `RoTokenizer`."""
+
+    _boundary_pattern = re.compile(r'[.!?…]+[\'"”»)\]]*\s+')
+    _last_word_pattern = re.compile(r'\S+$')
+    _opening_chars = '([{\'"„“«'
+    # How far back the word before a '.' is searched for
+    _abbr_window = 64
+    # Abbreviations that can also end a sentence
+    sentence_final_abbrs = set(['ș.a.', 'ș.a.m.d.', 'ș.cl.', 'etc.'])
+
+    def __init__(self, ro_tokenizer: RoTokenizer | None = None, max_sentence_chars: int = 1000) -> None:
+        """`ro_tokenizer` gives the abbreviations, e.g. the one of a `RomanianPreTokenizer`,
+        such that the lexicon is only read once. By default, a new one is made."""
+
+        if max_sentence_chars <= 0:
+            raise ValueError(f'max_sentence_chars must be positive, got [{max_sentence_chars}]')
+        # end if
+
+        self._ro_tokenizer = ro_tokenizer if ro_tokenizer is not None else RoTokenizer()
+        self._max_sentence_chars = max_sentence_chars
+
+    def _is_abbreviation(self, text: str, start: int, period: int) -> bool:
+        """Checks if the word that ends with the '.' at `period` is an abbreviation or an initial."""
+
+        match = RomanianSentenceSegmenter._last_word_pattern.search(
+            text, max(start, period - RomanianSentenceSegmenter._abbr_window), period + 1)
+
+        if match is None:
+            return False
+        # end if
+
+        word = match.group(0).lstrip(RomanianSentenceSegmenter._opening_chars)
+
+        if len(word) == 2 and word[0].isupper():
+            # An initial
+            return True
+        # end if
+
+        return self._ro_tokenizer.is_abbr(word) and word.lower() not in RomanianSentenceSegmenter.sentence_final_abbrs
+
+    def _bound(self, sentence: str) -> Iterator[str]:
+        """Cuts the `sentence` in parts of at most `max_sentence_chars`, at spaces, if possible."""
+
+        max_chars = self._max_sentence_chars
+
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars + 1)
+
+            if cut <= 0:
+                cut = max_chars
+            # end if
+
+            yield sentence[:cut].strip()
+            sentence = sentence[cut:].strip()
+        # end while
+
+        if sentence:
+            yield sentence
+        # end if
+
+    def segment(self, text: str) -> list[str]:
+        """The sentences of `text`, stripped, without the empty ones."""
+
+        sentences = []
+        start = 0
+
+        for boundary in RomanianSentenceSegmenter._boundary_pattern.finditer(text):
+            end = boundary.end()
+
+            if end == len(text) or text[end].islower():
+                continue
+            # end if
+
+            if text[boundary.start()] == '.' and boundary.group(0).rstrip() == '.' and \
+                    self._is_abbreviation(text, start, boundary.start()):
+                continue
+            # end if
+
+            sentences.extend(self._bound(text[start:end].strip()))
+            start = end
+        # end for
+
+        sentences.extend(self._bound(text[start:].strip()))
+
+        return sentences
+
+    def segment_lines(self, lines: Iterable[str]) -> Iterator[str]:
+        """Streams the sentences of the `lines`. A sentence does not span lines."""
+
+        for line in lines:
+            yield from self.segment(line)
+        # end for
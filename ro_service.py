@@ -0,0 +1,408 @@
+# An asyncio tokenization service: many small, concurrent encode requests are
+# collected in micro-batches (up to `max_batch_size` texts or `max_delay_ms` milliseconds)
+# and encoded with `encode_batch()` in background worker processes, such that the
+# Python normalizer and pre-tokenizer do not block the event loop.
+# Also has a minimal HTTP/1.1 server on top of it, for TCP or Unix sockets:
+# POST /encode with {"text": "..."} or {"texts": ["...", ...]}, GET /health and GET /stats.
+
+import sys
+import json
+import asyncio
+from functools import partial
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+_worker_tokenizer = None
+_http_reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                 413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+def _init_worker(vocab_file: str) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+
+
+def encode_texts(tokenizer: RoBertWordPieceTokenizer, texts: list[str],
+                 add_special_tokens: bool = True) -> list[dict]:
+    """Encodes `texts` as a batch and returns the picklable
+    `{'ids': ..., 'tokens': ..., 'offsets': ...}` of each one."""
+
+    return [{'ids': x.ids, 'tokens': x.tokens, 'offsets': x.offsets}
+            for x in tokenizer.encode_batch(texts, add_special_tokens=add_special_tokens)]
+
+
+def _worker_encode_texts(texts: list[str], add_special_tokens: bool) -> list[dict]:
+    return encode_texts(_worker_tokenizer, texts, add_special_tokens=add_special_tokens)
+
+
+class AsyncRoTokenizer(object):
+    """Collects the texts of concurrent `encode()` calls in batches of at most `max_batch_size`
+    texts, waiting at most `max_delay_ms` after the first one, and encodes the batches in
+    `process_count` worker processes (or in a worker thread of this process, if `process_count=0`).
+    At most `max_queue_size` texts wait to be batched; when the queue is full, `encode()`
+    waits for room or, with `wait=False`, raises `asyncio.QueueFull`. With `wait=False`,
+    `encode_batch()` queues all its texts or, if they do not all fit, none of them."""
+
+    def __init__(self, vocab_file: str,
+                 max_batch_size: int = 64,
+                 max_delay_ms: float = 5.,
+                 max_queue_size: int = 4096,
+                 process_count: int = 1,
+                 add_special_tokens: bool = True) -> None:
+        self._vocab_file = vocab_file
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay_ms / 1000.
+        self._max_queue_size = max_queue_size
+        self._process_count = process_count
+        self._add_special_tokens = add_special_tokens
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[Executor] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._batch_tasks = set()
+        self.batch_count = 0
+        self.item_count = 0
+
+    async def start(self) -> None:
+        if self._collector is not None:
+            return
+        # end if
+
+        if self._process_count > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self._process_count,
+                                                 initializer=_init_worker,
+                                                 initargs=(self._vocab_file,))
+            encode_function = partial(_worker_encode_texts, add_special_tokens=self._add_special_tokens)
+        else:
+            tokenizer = RoBertWordPieceTokenizer.from_file(vocab=self._vocab_file)
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            encode_function = partial(encode_texts, tokenizer, add_special_tokens=self._add_special_tokens)
+        # end if
+
+        self._queue = asyncio.Queue(maxsize=self._max_queue_size)
+        # Keep all workers busy, but do not collect more batches than they can encode
+        self._in_flight = asyncio.Semaphore(max(1, self._process_count))
+        self._collector = asyncio.create_task(self._collect_batches(encode_function))
+
+    async def close(self) -> None:
+        """Encodes the texts already queued, then stops the workers."""
+
+        if self._collector is None:
+            return
+        # end if
+
+        await self._queue.join()
+        self._collector.cancel()
+
+        try:
+            await self._collector
+        except asyncio.CancelledError:
+            pass
+        # end try
+
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+        # end if
+
+        self._executor.shutdown(wait=True)
+        self._collector = None
+
+    async def __aenter__(self) -> 'AsyncRoTokenizer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @property
+    def max_queue_size(self) -> int:
+        return self._max_queue_size
+
+    @property
+    def queue_size(self) -> int:
+        """The number of texts waiting to be batched."""
+
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def encode(self, text: str, wait: bool = True) -> dict:
+        """Returns the `{'ids': ..., 'tokens': ..., 'offsets': ...}` of `text`."""
+
+        if self._collector is None:
+            raise RuntimeError('AsyncRoTokenizer is not started')
+        # end if
+
+        if wait:
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((text, future))
+        else:
+            future = self._put_nowait(text)
+        # end if
+
+        return await future
+
+    async def encode_batch(self, texts: list[str], wait: bool = True) -> list[dict]:
+        """Encodes `texts`, which may be batched together with the texts of other requests."""
+
+        if wait:
+            return list(await asyncio.gather(*[self.encode(x) for x in texts]))
+        # end if
+
+        if self._collector is None:
+            raise RuntimeError('AsyncRoTokenizer is not started')
+        # end if
+
+        # Nothing else runs between the check and the puts, so the texts
+        # of a rejected batch are never encoded
+        if 0 < self._max_queue_size < len(texts) + self._queue.qsize():
+            raise asyncio.QueueFull
+        # end if
+
+        futures = [self._put_nowait(x) for x in texts]
+
+        return list(await asyncio.gather(*futures))
+
+    def _put_nowait(self, text: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+
+        return future
+
+    async def _collect_batches(self, encode_function) -> None:
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await self._in_flight.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._max_delay
+
+            while len(batch) < self._max_batch_size:
+                timeout = deadline - loop.time()
+
+                if timeout <= 0:
+                    break
+                # end if
+
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+                # end try
+            # end while
+
+            task = asyncio.create_task(self._encode_batch(encode_function, batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+        # end while
+
+    async def _encode_batch(self, encode_function, batch: list[tuple[str, asyncio.Future]]) -> None:
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, encode_function, [x[0] for x in batch])
+        except Exception as ex:
+            results = [ex] * len(batch)
+        finally:
+            self._in_flight.release()
+        # end try
+
+        for (_, future), result in zip(batch, results):
+            # The request may have been cancelled meanwhile
+            if not future.done():
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+                # end if
+            # end if
+
+            self._queue.task_done()
+        # end for
+
+        self.batch_count += 1
+        self.item_count += len(batch)
+
+
+class TokenizerServer(object):
+    """A minimal HTTP/1.1 server for an `AsyncRoTokenizer`, with keep-alive connections.
+    If the tokenizer queue is full, the requests are rejected with `503`, and the ones
+    with more texts than the queue can hold with `413`."""
+
+    def __init__(self, tokenizer: AsyncRoTokenizer, max_body_size: int = 16 * 1024 * 1024) -> None:
+        self._tokenizer = tokenizer
+        self._max_body_size = max_body_size
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0, unix_path: Optional[str] = None) -> None:
+        """Listens on `unix_path`, if given, or else on `host`:`port` (`0` picks a free port)."""
+
+        if unix_path is not None:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host=host, port=port)
+        # end if
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def _handle_request(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        elif path == '/stats':
+            return 200, {'queue_size': self._tokenizer.queue_size,
+                         'batch_count': self._tokenizer.batch_count,
+                         'item_count': self._tokenizer.item_count}
+        elif path != '/encode':
+            return 404, {'error': f'Unknown path [{path}]'}
+        elif method != 'POST':
+            return 405, {'error': 'Use POST'}
+        # end if
+
+        try:
+            request = json.loads(body)
+
+            if 'texts' in request:
+                texts = request['texts']
+            else:
+                texts = [request['text']]
+            # end if
+
+            if not isinstance(texts, list) or not all([isinstance(x, str) for x in texts]):
+                raise TypeError('Texts have to be strings')
+            # end if
+        except (ValueError, KeyError, TypeError) as ex:
+            return 400, {'error': f'Bad request: {ex}'}
+        # end try
+
+        # A queue size of 0 is unbounded, as for asyncio.Queue
+        if 0 < self._tokenizer.max_queue_size < len(texts):
+            return 413, {'error': f'More than [{self._tokenizer.max_queue_size}] texts'}
+        # end if
+
+        try:
+            encodings = await self._tokenizer.encode_batch(texts, wait=False)
+        except asyncio.QueueFull:
+            return 503, {'error': 'Tokenizer queue is full'}
+        except Exception as ex:
+            # E.g. BrokenProcessPool, if a worker process died
+            return 500, {'error': f'Encoding failed: {ex!r}'}
+        # end try
+
+        if 'texts' in request:
+            return 200, {'encodings': encodings}
+        else:
+            return 200, encodings[0]
+        # end if
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+
+                if not request_line:
+                    break
+                # end if
+
+                parts = request_line.decode('latin-1').split()
+                headers = {}
+
+                while True:
+                    line = await reader.readline()
+
+                    if line in [b'\r\n', b'\n', b'']:
+                        break
+                    # end if
+
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                # end while
+
+                try:
+                    content_length = int(headers.get('content-length', '0'))
+                except ValueError:
+                    content_length = -1
+                # end try
+
+                body_read = False
+
+                if len(parts) != 3:
+                    status, response = 400, {'error': 'Bad request line'}
+                elif content_length < 0:
+                    status, response = 400, {'error': 'Bad Content-Length'}
+                elif content_length > self._max_body_size:
+                    status, response = 413, {'error': 'Request body is too large'}
+                else:
+                    body = await reader.readexactly(content_length) if content_length > 0 else b''
+                    body_read = True
+                    status, response = await self._handle_request(parts[0], parts[1], body)
+                # end if
+
+                # The body of a request with a bad or too large Content-Length is not read
+                keep_alive = body_read and headers.get('connection', '').lower() != 'close' and \
+                    parts[2] == 'HTTP/1.1'
+                payload = json.dumps(response, ensure_ascii=False).encode('utf-8')
+                writer.write((f'HTTP/1.1 {status} {_http_reasons[status]}\r\n' +
+                              'Content-Type: application/json; charset=utf-8\r\n' +
+                              f'Content-Length: {len(payload)}\r\n' +
+                              f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n').encode('latin-1'))
+                writer.write(payload)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+                # end if
+            # end while
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+        # end try
+
+
+async def serve(vocab_file: str, port: int, unix_path: Optional[str] = None, **kwargs) -> None:
+    async with AsyncRoTokenizer(vocab_file, **kwargs) as tokenizer:
+        server = TokenizerServer(tokenizer)
+        await server.start(port=port, unix_path=unix_path)
+        print(f'Listening on [{unix_path or f"127.0.0.1:{server.port}"}]', file=sys.stderr, flush=True)
+        await server.serve_forever()
+    # end with
+
+
+if __name__ == '__main__':
+    service_options = {}
+    unix_socket_path = None
+
+    while len(sys.argv) > 3 and sys.argv[1] in ['-p', '-b', '-d', '-q', '-u']:
+        match sys.argv[1]:
+            case '-p':
+                service_options['process_count'] = int(sys.argv[2])
+            case '-b':
+                service_options['max_batch_size'] = int(sys.argv[2])
+            case '-d':
+                service_options['max_delay_ms'] = float(sys.argv[2])
+            case '-q':
+                service_options['max_queue_size'] = int(sys.argv[2])
+            case _:
+                unix_socket_path = sys.argv[2]
+        # end match
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 3:
+        print('Usage: python3 ro_service.py [-p <process count>] [-b <max batch size>] ' +
+              '[-d <max batch delay in ms>] [-q <max queue size>] [-u <Unix socket path>] ' +
+              '<vocab.txt> <port>', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    asyncio.run(serve(sys.argv[1], port=int(sys.argv[2]), unix_path=unix_socket_path, **service_options))
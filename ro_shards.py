@@ -0,0 +1,410 @@
+# Encodes sentence files (e.g. the output of corola.py) to token ids with the
+# RoBertWordPieceTokenizer, once, and stores them in memory-mappable shards,
+# for MLM pretraining. Each input file becomes one shard in the output folder:
+# - <shard>.ids: the token ids, as little-endian uint32 values;
+# - <shard>.idx.npy: int64 offsets of the sentences in <shard>.ids (sentence count + 1 values);
+# - <shard>.docs.npy: int64 indices of the first sentence of each document
+#   (documents are separated by empty lines in the input files);
+# - manifest.json: the list of finished shards, with their SHA-256 checksums.
+
+import os
+import sys
+import json
+import hashlib
+from pathlib import Path
+from multiprocessing import Pool
+from typing import Iterator
+import numpy as np
+from tqdm import tqdm
+from ro_corpusio import open_corpus, list_corpus_files, compression_suffix
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+shards_format_version = 1
+manifest_file_name = 'manifest.json'
+ids_dtype = np.dtype('<u4')
+offsets_dtype = np.dtype('<i8')
+_worker_tokenizer = None
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+
+    with open(path, mode='rb') as f:
+        while True:
+            block = f.read(1024 * 1024)
+
+            if not block:
+                break
+            # end if
+
+            sha.update(block)
+        # end while
+    # end with
+
+    return sha.hexdigest()
+
+
+def shard_name(input_file: str) -> str:
+    """The file name without the compression extension, such that the shards
+    do not change if the input files are compressed again."""
+
+    name = Path(input_file).name
+    suffix = compression_suffix(name)
+
+    if suffix:
+        name = name[:-len(suffix)]
+    # end if
+
+    return name
+
+
+def _init_worker(vocab_file: str) -> None:
+    global _worker_tokenizer
+    _worker_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+
+
+def _iter_batches(input_file: str, batch_size: int) -> Iterator[list[str]]:
+    """Yields batches of lines. An empty line is yielded as `None`,
+    since it marks the start of a new document."""
+
+    batch = []
+
+    with open_corpus(input_file, mode='r') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+
+            if not line.strip():
+                line = None
+            # end if
+
+            batch.append(line)
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+            # end if
+        # end for
+    # end with
+
+    if batch:
+        yield batch
+    # end if
+
+
+def encode_file(input_file: str, output_folder: str,
+                add_special_tokens: bool = False, batch_size: int = 1000) -> dict:
+    """Worker function: encodes `input_file` into a shard and
+    returns the manifest entry of that shard."""
+
+    name = shard_name(input_file)
+    ids_file = os.path.join(output_folder, name + '.ids')
+    idx_file = os.path.join(output_folder, name + '.idx.npy')
+    docs_file = os.path.join(output_folder, name + '.docs.npy')
+    offsets = [0]
+    doc_starts = [0]
+
+    # Write under temporary names, so that an interrupted run leaves no complete-looking shard
+    with open(ids_file + '.tmp', mode='wb') as f:
+        for batch in _iter_batches(input_file=input_file, batch_size=batch_size):
+            sentences = [x for x in batch if x is not None]
+            sentence_ids = _worker_tokenizer.encode_batch_ids(
+                sentences, add_special_tokens=add_special_tokens) if sentences else []
+            i = 0
+
+            for line in batch:
+                if line is None:
+                    # Only start a new document if the current one is not empty
+                    if doc_starts[-1] < len(offsets) - 1:
+                        doc_starts.append(len(offsets) - 1)
+                    # end if
+
+                    continue
+                # end if
+
+                ids = np.asarray(sentence_ids[i], dtype=ids_dtype)
+                f.write(ids.tobytes())
+                offsets.append(offsets[-1] + len(ids))
+                i += 1
+            # end for
+        # end for
+    # end with
+
+    if doc_starts[-1] == len(offsets) - 1:
+        # The last document is empty
+        doc_starts.pop()
+    # end if
+
+    np.save(idx_file + '.tmp.npy', np.asarray(offsets, dtype=offsets_dtype))
+    np.save(docs_file + '.tmp.npy', np.asarray(doc_starts, dtype=offsets_dtype))
+    os.replace(ids_file + '.tmp', ids_file)
+    os.replace(idx_file + '.tmp.npy', idx_file)
+    os.replace(docs_file + '.tmp.npy', docs_file)
+
+    return {
+        'name': name,
+        'source': os.path.basename(input_file),
+        'sentences': len(offsets) - 1,
+        'documents': len(doc_starts),
+        'tokens': offsets[-1],
+        'sha256': {
+            'ids': file_sha256(ids_file),
+            'idx': file_sha256(idx_file),
+            'docs': file_sha256(docs_file)
+        }
+    }
+
+
+def _encode_file_star(args: tuple) -> dict:
+    return encode_file(*args)
+
+
+def read_manifest(output_folder: str) -> dict:
+    manifest_file = os.path.join(output_folder, manifest_file_name)
+
+    with open(manifest_file, mode='r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    # end with
+
+    if manifest['version'] != shards_format_version:
+        raise RuntimeError(f'Unsupported shards format version [{manifest["version"]}]')
+    # end if
+
+    return manifest
+
+
+def write_manifest(output_folder: str, manifest: dict) -> None:
+    manifest_file = os.path.join(output_folder, manifest_file_name)
+
+    with open(manifest_file + '.tmp', mode='w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
+    # end with
+
+    os.replace(manifest_file + '.tmp', manifest_file)
+
+
+def verify_shard(output_folder: str, shard: dict) -> bool:
+    """Tests if the files of the `shard` exist and have the checksums in the manifest."""
+
+    for key, suffix in [('ids', '.ids'), ('idx', '.idx.npy'), ('docs', '.docs.npy')]:
+        shard_file = os.path.join(output_folder, shard['name'] + suffix)
+
+        if not os.path.exists(shard_file) or file_sha256(shard_file) != shard['sha256'][key]:
+            return False
+        # end if
+    # end for
+
+    return True
+
+
+def encode_corpus(input_files: list[str], vocab_file: str, output_folder: str,
+                  process_count: int = 1, add_special_tokens: bool = False) -> dict:
+    """Encodes the `input_files` into shards, in `output_folder`, with `process_count` workers.
+    Shards already in the manifest, with valid checksums, are not encoded again,
+    so an interrupted run can be resumed by running it again."""
+
+    shard_files = {}
+
+    for input_file in input_files:
+        name = shard_name(input_file)
+
+        if name in shard_files:
+            raise ValueError(f'Input files [{shard_files[name]}] and [{input_file}] ' +
+                             f'have the same shard name [{name}]')
+        # end if
+
+        shard_files[name] = input_file
+    # end for
+
+    vocab_sha256 = file_sha256(vocab_file)
+    manifest = {
+        'version': shards_format_version,
+        'vocab_sha256': vocab_sha256,
+        'add_special_tokens': add_special_tokens,
+        # Missing in the manifests of the runs that did not add them, despite add_special_tokens
+        'special_tokens': ['[CLS]', '[SEP]'] if add_special_tokens else [],
+        'dtype': ids_dtype.str,
+        'shards': []
+    }
+
+    if os.path.exists(os.path.join(output_folder, manifest_file_name)):
+        old_manifest = read_manifest(output_folder)
+
+        if old_manifest['vocab_sha256'] == vocab_sha256 and \
+                old_manifest['add_special_tokens'] == add_special_tokens and \
+                old_manifest.get('special_tokens', []) == manifest['special_tokens']:
+            for shard in old_manifest['shards']:
+                if verify_shard(output_folder, shard):
+                    manifest['shards'].append(shard)
+                else:
+                    print(f'Shard [{shard["name"]}] is corrupt and it will be encoded again',
+                          file=sys.stderr, flush=True)
+                # end if
+            # end for
+        else:
+            print('Vocabulary or settings changed, encoding everything again',
+                  file=sys.stderr, flush=True)
+        # end if
+    # end if
+
+    shard_order = dict([(shard_name(x), i) for i, x in enumerate(input_files)])
+    done_shards = set([x['name'] for x in manifest['shards']])
+    todo_files = [x for x in input_files if shard_name(x) not in done_shards]
+
+    if len(todo_files) < len(input_files):
+        print(f'Resuming: [{len(input_files) - len(todo_files)}] shards already encoded',
+              file=sys.stderr, flush=True)
+    # end if
+
+    os.makedirs(output_folder, exist_ok=True)
+    write_manifest(output_folder, manifest)
+
+    with Pool(processes=process_count, initializer=_init_worker, initargs=(vocab_file,)) as pool:
+        for shard in tqdm(pool.imap_unordered(
+                _encode_file_star, [(x, output_folder, add_special_tokens) for x in todo_files]),
+                total=len(todo_files), desc='Shards'):
+            manifest['shards'].append(shard)
+            # Keep the order of the input files, for reproducibility
+            manifest['shards'].sort(key=lambda x: shard_order.get(x['name'], len(shard_order)))
+            write_manifest(output_folder, manifest)
+        # end for
+    # end with
+
+    return manifest
+
+
+class ShardedTokenDataset(object):
+    """Zero-copy, random access to the sequences in a folder of shards written by `encode_corpus()`.
+    It implements `__len__()` and `__getitem__()`, so it can be used as a PyTorch map-style dataset.
+    Only the folder name is pickled, so it can be sent to `DataLoader` workers."""
+
+    def __init__(self, shards_folder: str, verify: bool = False) -> None:
+        self._shards_folder = shards_folder
+        self._manifest = read_manifest(shards_folder)
+
+        if verify:
+            for shard in self._manifest['shards']:
+                if not verify_shard(shards_folder, shard):
+                    raise RuntimeError(f'Shard [{shard["name"]}] has a wrong checksum')
+                # end if
+            # end for
+        # end if
+
+        self._open()
+
+    def _open(self) -> None:
+        self._ids = []
+        self._offsets = []
+        self._doc_starts = []
+        sentence_counts = [0]
+
+        for shard in self._manifest['shards']:
+            base_file = os.path.join(self._shards_folder, shard['name'])
+
+            if shard['tokens'] > 0:
+                self._ids.append(np.memmap(base_file + '.ids', dtype=ids_dtype, mode='r'))
+            else:
+                # Empty files cannot be memory mapped
+                self._ids.append(np.empty(0, dtype=ids_dtype))
+            # end if
+
+            self._offsets.append(np.load(base_file + '.idx.npy', mmap_mode='r'))
+            self._doc_starts.append(np.load(base_file + '.docs.npy') + sentence_counts[-1])
+            sentence_counts.append(sentence_counts[-1] + shard['sentences'])
+        # end for
+
+        self._sentence_counts = np.asarray(sentence_counts, dtype=offsets_dtype)
+
+        if self._doc_starts:
+            self._doc_starts = np.concatenate(self._doc_starts)
+        else:
+            self._doc_starts = np.empty(0, dtype=offsets_dtype)
+        # end if
+
+    def __getstate__(self) -> dict:
+        return {'shards_folder': self._shards_folder, 'manifest': self._manifest}
+
+    def __setstate__(self, state: dict) -> None:
+        self._shards_folder = state['shards_folder']
+        self._manifest = state['manifest']
+        self._open()
+
+    def __len__(self) -> int:
+        return int(self._sentence_counts[-1])
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        if index < 0:
+            index += len(self)
+        # end if
+
+        if index < 0 or index >= len(self):
+            raise IndexError(f'Sequence index [{index}] out of range')
+        # end if
+
+        shard_index = int(np.searchsorted(self._sentence_counts, index, side='right')) - 1
+
+        return shard_index, index - int(self._sentence_counts[shard_index])
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """Returns the token ids of sequence `index`, as a read-only view in the shard file."""
+
+        shard_index, local_index = self._locate(index)
+        offsets = self._offsets[shard_index]
+
+        return self._ids[shard_index][offsets[local_index]:offsets[local_index + 1]]
+
+    def sequence_length(self, index: int) -> int:
+        shard_index, local_index = self._locate(index)
+        offsets = self._offsets[shard_index]
+
+        return int(offsets[local_index + 1] - offsets[local_index])
+
+    def sequence_lengths(self) -> np.ndarray:
+        """The lengths of all sequences, without reading the token ids."""
+
+        if not self._offsets:
+            return np.empty(0, dtype=offsets_dtype)
+        # end if
+
+        return np.concatenate([np.diff(x) for x in self._offsets])
+
+    @property
+    def document_starts(self) -> np.ndarray:
+        """The index of the first sequence of each document."""
+        return self._doc_starts
+
+    @property
+    def token_count(self) -> int:
+        return sum([x['tokens'] for x in self._manifest['shards']])
+
+
+if __name__ == '__main__':
+    process_count = os.cpu_count()
+    add_special = False
+
+    while len(sys.argv) > 4 and sys.argv[1] in ['-p', '-s']:
+        if sys.argv[1] == '-s':
+            add_special = True
+            sys.argv.pop(1)
+            continue
+        # end if
+
+        process_count = int(sys.argv[2])
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 4:
+        print('Usage: python3 ro_shards.py [-p <count>] [-s] <vocab.txt> ' +
+              '<folder with .txt sentence files> <output shards folder>', file=sys.stderr, flush=True)
+        print('       (-s adds [CLS] and [SEP] to each sentence)', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    result = encode_corpus(
+        input_files=list_corpus_files(sys.argv[2], extension='.txt'),
+        vocab_file=sys.argv[1], output_folder=sys.argv[3],
+        process_count=process_count, add_special_tokens=add_special)
+    print(f'Encoded [{sum([x["sentences"] for x in result["shards"]])}] sentences, ' +
+          f'[{sum([x["tokens"] for x in result["shards"]])}] tokens, in [{len(result["shards"])}] shards',
+          file=sys.stderr, flush=True)
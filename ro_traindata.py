@@ -1,15 +1,21 @@
 # This script takes the output of the corola.py script and
-# prepares the sentences for the RoBertWordPieceTokenizer training
+# prepares the sentences for the RoBertWordPieceTokenizer training.
+# With -s, the input is raw text (e.g. paragraph-long lines), which is first split
+# in sentences of at most the given number of characters, one per output line.
+# With --profile, each worker process is profiled with the ro_profiler.py sampling profiler.
 
-import os
 import sys
 from pathlib import Path
 from time import sleep
+from itertools import islice
 from tqdm import tqdm
 import unicodedata
 from multiprocessing import Process
 from ro_normalizer import RomanianNormalizer
 from ro_pretokenizer import RomanianPreTokenizer
+from ro_segmenter import RomanianSentenceSegmenter
+from ro_corpusio import open_corpus, list_corpus_files, change_compression, CorpusWriter
+from ro_profiler import run_profiled, merge_profiles, clear_profiles
 
 
 _allowed_unicode_cats = set([
@@ -20,110 +26,168 @@ _allowed_unicode_cats = set([
 ])
 
 
+class _AllowedCharsTable(dict):
+    """A `str.translate()` table that deletes the characters whose Unicode category
+    is not in `_allowed_unicode_cats`. It is grown lazily, so that
+    `unicodedata.category()` is called only once for each code point."""
+
+    def __missing__(self, codepoint: int) -> int | None:
+        if unicodedata.category(chr(codepoint)) in _allowed_unicode_cats:
+            self[codepoint] = codepoint
+        else:
+            self[codepoint] = None
+        # end if
+
+        return self[codepoint]
+
+
+_allowed_chars_table = _AllowedCharsTable()
+_token_delimiter = '_tk_'
+# The input lines are normalized in blocks of this many lines
+_normalize_block_lines = 1000
+
+
 def filter_weird_tokens(tokens: list[str]) -> list[str]:
     result = []
-    
-    for token in tokens:
-        crt_token = []
-
-        for chr in token:
-            ctg = unicodedata.category(chr)
 
-            if ctg in _allowed_unicode_cats:
-                crt_token.append(chr)
-            # end if
-        # end for
+    for token in tokens:
+        token = token.translate(_allowed_chars_table)
 
-        if crt_token:
-            result.append(''.join(crt_token))
+        if token:
+            result.append(token)
         # end if
     # end for
 
     return result
 
 
-def process_file(input_file: str, output_folder: str) -> None:
+def filter_weird_line(tokens: list[str]) -> str:
+    """Returns the same thing as `'_tk_'.join(filter_weird_tokens(tokens))`,
+    but filters the whole joined line at once."""
+
+    line = _token_delimiter.join(tokens).translate(_allowed_chars_table)
+
+    # The characters of the delimiter are allowed, so the result is
+    # identical to the token by token filtering, unless some tokens became empty.
+    if not line or \
+            line.startswith(_token_delimiter) or \
+            line.endswith(_token_delimiter) or \
+            _token_delimiter + _token_delimiter in line:
+        return _token_delimiter.join(filter_weird_tokens(tokens=tokens))
+    # end if
+
+    return line
+
+
+def process_file(input_file: str, output_folder: str, compression: str | None = None,
+                 max_sentence_chars: int = 0) -> None:
+    """The output file has the same name as the `input_file`. Its compression is
+    the one of the `input_file`, or the one given by `compression`, e.g. `.gz`.
+    If `max_sentence_chars > 0`, the (normalized) lines are first split in sentences
+    of at most `max_sentence_chars` characters, and each one is written on its own line;
+    the empty lines are kept."""
+
     input_file_name = Path(input_file).name
     
     print(f'Starting process [{input_file_name}]', file=sys.stderr, flush=True)
     
-    output_file = Path(output_folder) / input_file_name
+    output_file = change_compression(Path(output_folder) / input_file_name, suffix=compression)
     ro_normal = RomanianNormalizer()
     ro_pretok = RomanianPreTokenizer()
+    ro_segmenter = None
+
+    if max_sentence_chars > 0:
+        ro_segmenter = RomanianSentenceSegmenter(ro_pretok._romanian_tokenizer,
+                                                 max_sentence_chars=max_sentence_chars)
+    # end if
     
-    with open(output_file, mode='w', encoding='utf8') as ff:
-        with open(input_file, mode='r', encoding='utf-8') as f:
-            for sentence in f:
-                sentence = ro_normal.normalize_str(sentence)
-                tokens = ro_pretok.pre_tokenize_str(sentence)
-                only_tokens = [x[0] for x in tokens]
-                filtered_tokens = filter_weird_tokens(tokens=only_tokens)
-                print('_tk_'.join(filtered_tokens), file=ff)
-            # end for
+    with CorpusWriter(output_file) as ff:
+        with open_corpus(input_file, mode='r') as f:
+            while True:
+                lines = list(islice(f, _normalize_block_lines))
+
+                if not lines:
+                    break
+                # end if
+
+                for line in ro_normal.normalize_batch(lines):
+                    if ro_segmenter is not None:
+                        # An empty line, e.g. a paragraph break, is kept as it is without -s
+                        sentences = ro_segmenter.segment(line) or [line]
+                    else:
+                        sentences = [line]
+                    # end if
+
+                    for sentence in sentences:
+                        tokens = ro_pretok.pre_tokenize_str(sentence)
+                        only_tokens = [x[0] for x in tokens]
+                        ff.write_line(filter_weird_line(tokens=only_tokens))
+                    # end for
+                # end for
+            # end while
         # end with
     # end with
 
     print(f'Finished process [{input_file_name}]', file=sys.stderr, flush=True)
 
 
-if __name__ == '__main__':
-    if len(sys.argv) > 5 or len(sys.argv) < 3:
-        print('Usage: python3 ro_traindata.py [-p <count>] <source folder with .txt sentence files> <output folder>',
-              file=sys.stderr, flush=True)
-        exit(1)
-    # end if
+def start_process(txt_file: str, output_folder: str, compression: str | None = None,
+                  max_sentence_chars: int = 0, profile_folder: str | None = None) -> Process:
+    """Starts a `process_file()` worker process, under the sampling profiler if `profile_folder` is given."""
 
-    if sys.argv[1] == '-p':
-        process_count = int(sys.argv[2])
-        sys.argv.pop(2)
-        sys.argv.pop(1)
+    args = (txt_file, output_folder, compression, max_sentence_chars)
+
+    if profile_folder is not None:
+        pr = Process(name=Path(txt_file).name, target=run_profiled, args=(profile_folder, process_file) + args)
     else:
-        process_count = 6
+        pr = Process(name=Path(txt_file).name, target=process_file, args=args)
     # end if
 
-    print(f'Running with [{process_count}] processes', file=sys.stderr, flush=True)
+    pr.start()
+
+    return pr
+
+
+def process_files(txt_files: list[str], output_folder: str, process_count: int = 6,
+                  compression: str | None = None, max_sentence_chars: int = 0,
+                  profile_folder: str | None = None) -> None:
+    """Runs `process_file()` on each of the `txt_files`, with at most `process_count` worker processes."""
 
-    source_folder = sys.argv[1]
-    target_folder = sys.argv[2]
     process_queue: list[Process] = []
 
-    for txt in tqdm(os.listdir(source_folder), desc='Processes'):
-        if txt.endswith('.txt'):
-            txt_file = os.path.join(source_folder, txt)
-            
-            if len(process_queue) < process_count:
-                pr = Process(name=txt, target=process_file, args=(txt_file, target_folder))
-                process_queue.append(pr)
-                pr.start()
-            else:
-                all_alive = True
-
-                while all_alive:
-                    i = 0
-
-                    while i < len(process_queue):
-                        pr = process_queue[i]
-
-                        if not pr.is_alive():
-                            # Make room for new process in the queue
-                            all_alive = False
-                            process_queue.pop(i)
-                            
-                            # Start a new process
-                            pr = Process(name=txt, target=process_file, args=(txt_file, target_folder))
-                            process_queue.append(pr)
-                            pr.start()
-
-                            # And bail out (take next file)
-                            break
-                        # end if
-
-                        i += 1
-                    # end while
+    for txt_file in tqdm(txt_files, desc='Processes'):
+        if len(process_queue) < process_count:
+            process_queue.append(start_process(txt_file, output_folder, compression,
+                                               max_sentence_chars, profile_folder))
+        else:
+            all_alive = True
 
-                    sleep(3)
+            while all_alive:
+                i = 0
+
+                while i < len(process_queue):
+                    pr = process_queue[i]
+
+                    if not pr.is_alive():
+                        # Make room for new process in the queue
+                        all_alive = False
+                        process_queue.pop(i)
+
+                        # Start a new process
+                        process_queue.append(start_process(txt_file, output_folder, compression,
+                                                           max_sentence_chars, profile_folder))
+
+                        # And bail out (take next file)
+                        break
+                    # end if
+
+                    i += 1
                 # end while
-            # end if
+
+                if all_alive:
+                    sleep(3)
+                # end if
+            # end while
         # end if
     # end for
 
@@ -131,3 +195,52 @@ if __name__ == '__main__':
     for pr in process_queue:
         pr.join()
     # end for
+
+
+if __name__ == '__main__':
+    process_count = 6
+    compression = None
+    max_sentence_chars = 0
+    profile_folder = None
+
+    while len(sys.argv) > 3 and sys.argv[1] in ['-p', '-z', '-s', '--profile']:
+        if sys.argv[1] == '-p':
+            process_count = int(sys.argv[2])
+        elif sys.argv[1] == '-s':
+            max_sentence_chars = int(sys.argv[2])
+        elif sys.argv[1] == '--profile':
+            profile_folder = sys.argv[2]
+        elif sys.argv[2] not in ['gz', 'bz2', 'xz', 'none']:
+            # Left in sys.argv, such that the usage is printed
+            break
+        else:
+            compression = '.' + sys.argv[2] if sys.argv[2] != 'none' else ''
+        # end if
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 3:
+        print('Usage: python3 ro_traindata.py [-p <count>] [-z gz|bz2|xz|none] [-s <max sentence chars>] ' +
+              '[--profile <profile output folder>] ' +
+              '<source folder with .txt sentence (or, with -s, raw text) files> <output folder>',
+              file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    print(f'Running with [{process_count}] processes', file=sys.stderr, flush=True)
+
+    source_folder = sys.argv[1]
+    target_folder = sys.argv[2]
+
+    if profile_folder is not None:
+        clear_profiles(profile_folder)
+    # end if
+
+    process_files(list_corpus_files(source_folder, extension='.txt'), target_folder, process_count,
+                  compression, max_sentence_chars, profile_folder)
+
+    if profile_folder is not None:
+        print(merge_profiles(profile_folder), file=sys.stderr, end='', flush=True)
+    # end if
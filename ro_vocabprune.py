@@ -0,0 +1,209 @@
+# Counts how often each vocabulary entry is used when encoding a corpus sample
+# and prunes vocab.txt to a target size. The special tokens and all single characters
+# (with and without the '##' prefix) are always kept, so any text can still be encoded.
+# The kept entries keep their relative order and an old -> new id remap is written,
+# such that existing embedding matrices can be sliced instead of retrained:
+# new_embeddings = old_embeddings[np.load('kept_ids.npy')]
+
+import os
+import sys
+from multiprocessing import Pool
+import numpy as np
+from tqdm import tqdm
+from ro_corpusio import open_corpus, list_corpus_files
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+default_special_tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+_worker_tokenizer = None
+_worker_vocab_size = 0
+
+
+def read_vocab(vocab_file: str) -> list[str]:
+    with open(vocab_file, mode='r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+    # end with
+
+
+def _init_worker(vocab_file: str) -> None:
+    global _worker_tokenizer, _worker_vocab_size
+    _worker_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=vocab_file)
+    # Ids are line numbers in vocab.txt, and these may have gaps
+    _worker_vocab_size = len(read_vocab(vocab_file))
+
+
+def count_file_usage(input_file: str, max_lines: int = 0, batch_size: int = 1000) -> np.ndarray:
+    """Worker function: counts the vocabulary ids used to encode
+    the first `max_lines` lines of `input_file` (all lines, if `0`)."""
+
+    counts = np.zeros(_worker_vocab_size, dtype=np.int64)
+    batch = []
+
+    def _count_batch():
+        ids = []
+
+        for encoding in _worker_tokenizer.encode_batch(batch, add_special_tokens=False):
+            ids.extend(encoding.ids)
+        # end for
+
+        counts[:] += np.bincount(np.asarray(ids, dtype=np.int64), minlength=_worker_vocab_size)
+
+    with open_corpus(input_file, mode='r') as f:
+        for i, line in enumerate(f):
+            if max_lines > 0 and i >= max_lines:
+                break
+            # end if
+
+            batch.append(line)
+
+            if len(batch) >= batch_size:
+                _count_batch()
+                batch = []
+            # end if
+        # end for
+    # end with
+
+    if batch:
+        _count_batch()
+    # end if
+
+    return counts
+
+
+def _count_file_usage_star(args: tuple) -> np.ndarray:
+    return count_file_usage(*args)
+
+
+def count_vocab_usage(input_files: list[str], vocab_file: str,
+                      process_count: int = 1, max_lines: int = 0) -> np.ndarray:
+    """Encodes (a sample of) the `input_files` in parallel and returns
+    the usage count of each vocabulary id."""
+
+    counts = np.zeros(len(read_vocab(vocab_file)), dtype=np.int64)
+
+    with Pool(processes=process_count, initializer=_init_worker, initargs=(vocab_file,)) as pool:
+        for file_counts in tqdm(pool.imap_unordered(_count_file_usage_star,
+                                                    [(x, max_lines) for x in input_files]),
+                                total=len(input_files), desc='Counting'):
+            counts += file_counts
+        # end for
+    # end with
+
+    return counts
+
+
+def coverage_curve(counts: np.ndarray, vocab_sizes: list[int]) -> list[tuple[int, float]]:
+    """For each vocabulary size, the fraction of the encoded ids that would
+    be covered by keeping only the most frequent entries."""
+
+    total = int(counts.sum())
+    cumulative = np.cumsum(np.sort(counts)[::-1])
+    result = []
+
+    for size in vocab_sizes:
+        size = min(size, len(counts))
+        covered = int(cumulative[size - 1]) if size > 0 else 0
+        result.append((size, covered / total if total > 0 else 1.))
+    # end for
+
+    return result
+
+
+def select_kept_ids(vocab: list[str], counts: np.ndarray, target_size: int,
+                    special_tokens: list[str] = default_special_tokens,
+                    wordpieces_prefix: str = "##") -> np.ndarray:
+    """Returns the ids to keep, in increasing order: the special tokens, the single characters
+    and then the most used entries, until `target_size` entries are selected.
+    Raises `ValueError` if the special tokens and single characters alone exceed `target_size`."""
+
+    mandatory = np.zeros(len(vocab), dtype=bool)
+    special_tokens = set(special_tokens)
+
+    for i, term in enumerate(vocab):
+        if term in special_tokens or len(term) == 1 or \
+                (term.startswith(wordpieces_prefix) and len(term) == len(wordpieces_prefix) + 1):
+            mandatory[i] = True
+        # end if
+    # end for
+
+    if int(mandatory.sum()) > target_size:
+        raise ValueError(f'The [{int(mandatory.sum())}] special tokens and single characters ' +
+                         f'do not fit in the target size [{target_size}]')
+    # end if
+
+    kept = mandatory.copy()
+    free_slots = target_size - int(mandatory.sum())
+
+    if free_slots > 0:
+        # Most used first; for equal counts, lower (i.e. earlier learned) ids first
+        candidates = np.flatnonzero(~mandatory)
+        order = np.lexsort((candidates, -counts[candidates]))
+        kept[candidates[order[:free_slots]]] = True
+    # end if
+
+    return np.flatnonzero(kept)
+
+
+def write_pruned_vocab(vocab: list[str], kept_ids: np.ndarray, output_folder: str) -> None:
+    """Writes the pruned `vocab.txt` and the id remap files in `output_folder`:
+    `kept_ids.npy` (new id -> old id) and `remap.npy` (old id -> new id, or `-1` if pruned)."""
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    with open(os.path.join(output_folder, 'vocab.txt'), mode='w', encoding='utf-8') as f:
+        f.writelines([vocab[i] + '\n' for i in kept_ids])
+    # end with
+
+    remap = np.full(len(vocab), -1, dtype=np.int64)
+    remap[kept_ids] = np.arange(len(kept_ids), dtype=np.int64)
+    np.save(os.path.join(output_folder, 'kept_ids.npy'), kept_ids.astype(np.int64))
+    np.save(os.path.join(output_folder, 'remap.npy'), remap)
+
+
+def print_usage_report(counts: np.ndarray, target_size: int) -> None:
+    sizes = sorted(set([x for x in [1000, 5000, 10000, 30000, 50000, 100000,
+                                    200000, 300000, 500000, target_size] if x <= len(counts)]))
+
+    print(f'Vocabulary size: {len(counts)}')
+    print(f'Encoded ids: {int(counts.sum())}')
+    print(f'Unused entries: {int((counts == 0).sum())}')
+
+    for size, coverage in coverage_curve(counts, sizes):
+        print(f'Top {size} entries cover {coverage:.4%} of the encoded ids')
+    # end for
+
+
+if __name__ == '__main__':
+    process_count = os.cpu_count()
+    max_file_lines = 0
+
+    while len(sys.argv) > 5 and sys.argv[1] in ['-p', '-n']:
+        if sys.argv[1] == '-p':
+            process_count = int(sys.argv[2])
+        else:
+            max_file_lines = int(sys.argv[2])
+        # end if
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 5:
+        print('Usage: python3 ro_vocabprune.py [-p <count>] [-n <max lines per file>] ' +
+              '<vocab.txt> <folder with .txt sentence files> <target vocab size> <output folder>',
+              file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    vocab_txt = sys.argv[1]
+    target_vocab_size = int(sys.argv[3])
+    usage_counts = count_vocab_usage(
+        input_files=list_corpus_files(sys.argv[2], extension='.txt'),
+        vocab_file=vocab_txt, process_count=process_count, max_lines=max_file_lines)
+    print_usage_report(usage_counts, target_vocab_size)
+
+    vocab_terms = read_vocab(vocab_txt)
+    kept_vocab_ids = select_kept_ids(vocab_terms, usage_counts, target_vocab_size)
+    write_pruned_vocab(vocab_terms, kept_vocab_ids, sys.argv[4])
+    np.save(os.path.join(sys.argv[4], 'usage_counts.npy'), usage_counts)
+    print(f'Wrote [{len(kept_vocab_ids)}] entries to [{os.path.join(sys.argv[4], "vocab.txt")}]')
@@ -0,0 +1,307 @@
+# Trains the RoBertWordPieceTokenizer vocabulary on increasingly larger random samples
+# of the training files (the output of ro_traindata.py), instead of on all of them,
+# and stops when the vocabulary converges, i.e. when, between two consecutive sample sizes:
+# - the overlap (Jaccard index) of the two vocabularies is at least `min_overlap`, and
+# - the fertility (word pieces per word) on a held-out sample changes by at most `max_drift`.
+# The samples are nested and reproducible for a given seed: the lines are drawn once,
+# with a reservoir sample of all the files or a stratified one (a reservoir sample of
+# each file, proportional to its line count), and each sample is a prefix of them.
+# Writes the vocab.txt of the last trained sample and a vocab_sample.json report.
+# Run it with e.g.
+# python3 ro_vocabsample.py -m stratified -n 100000 corola-train model
+
+import os
+import sys
+import json
+import math
+import random
+import tempfile
+from itertools import islice
+from time import perf_counter
+from ro_corpusio import open_corpus, list_corpus_files
+from ro_dedup import clean_vocab_file
+from ro_wordpiece import RoBertWordPieceTokenizer
+
+
+sample_methods = ['reservoir', 'stratified']
+_token_delimiter = '_tk_'
+
+
+def _random_open(rnd: random.Random) -> float:
+    """A random number in (0, 1)."""
+
+    u = rnd.random()
+
+    while u == 0.:
+        u = rnd.random()
+    # end while
+
+    return u
+
+
+def reservoir_sample(lines, sample_size: int, rnd: random.Random) -> list[str]:
+    """Draws `sample_size` of the `lines` uniformly at random, in one pass, with the
+    Algorithm L of Li (1994), which only draws random numbers for the kept lines.
+    The sample is shuffled, such that each of its prefixes is a random sample too."""
+
+    sample = []
+
+    if sample_size <= 0:
+        return sample
+    # end if
+
+    lines = iter(lines)
+
+    for line in lines:
+        sample.append(line)
+
+        if len(sample) == sample_size:
+            break
+        # end if
+    # end for
+
+    w = math.exp(math.log(_random_open(rnd)) / sample_size)
+
+    while True:
+        # The number of lines to skip before the next replacement
+        skip = math.floor(math.log(_random_open(rnd)) / math.log(1 - w))
+        line = next(islice(lines, skip, None), None)
+
+        if line is None:
+            break
+        # end if
+
+        sample[rnd.randrange(sample_size)] = line
+        w *= math.exp(math.log(_random_open(rnd)) / sample_size)
+    # end while
+
+    rnd.shuffle(sample)
+
+    return sample
+
+
+def _iter_file_lines(input_file: str):
+    with open_corpus(input_file, mode='r') as f:
+        for line in f:
+            line = line.strip()
+
+            if line:
+                yield line
+            # end if
+        # end for
+    # end with
+
+
+def _iter_lines(input_files: list[str]):
+    for input_file in input_files:
+        yield from _iter_file_lines(input_file)
+    # end for
+
+
+def count_lines(input_file: str) -> int:
+    return sum([1 for _ in _iter_file_lines(input_file)])
+
+
+def draw_sample(input_files: list[str], sample_size: int, method: str = 'reservoir', seed: int = 1234) -> list[str]:
+    """Draws a reproducible random sample of `sample_size` non-empty lines of the `input_files`,
+    in random order. With `method='stratified'`, each file contributes lines in proportion to
+    its line count, which needs one more pass to count them."""
+
+    rnd = random.Random(seed)
+    input_files = sorted(input_files)
+
+    if method == 'reservoir':
+        return reservoir_sample(_iter_lines(input_files), sample_size, rnd)
+    elif method != 'stratified':
+        raise ValueError(f'Unknown sample method [{method}], expected one of {sample_methods}')
+    # end if
+
+    line_counts = [count_lines(x) for x in input_files]
+    total_lines = sum(line_counts)
+    file_samples = []
+
+    for input_file, line_count in zip(input_files, line_counts):
+        file_size = round(sample_size * line_count / total_lines) if total_lines > 0 else 0
+        file_samples.append(reservoir_sample(_iter_file_lines(input_file), file_size, rnd))
+    # end for
+
+    # Interleave the files, such that each prefix is stratified too
+    sample = []
+    positions = []
+
+    for i, file_sample in enumerate(file_samples):
+        positions.extend([((j + rnd.random()) / len(file_sample), i, j) for j in range(len(file_sample))])
+    # end for
+
+    for _, i, j in sorted(positions):
+        sample.append(file_samples[i][j])
+    # end for
+
+    return sample
+
+
+def vocab_overlap(vocab_a: set[str], vocab_b: set[str]) -> float:
+    """The Jaccard index of two vocabularies."""
+
+    if not vocab_a and not vocab_b:
+        return 1.
+    # end if
+
+    return len(vocab_a & vocab_b) / len(vocab_a | vocab_b)
+
+
+def fertility(tokenizer: RoBertWordPieceTokenizer, lines: list[str]) -> float:
+    """The average number of word pieces per (pre-tokenized) word of the `lines`."""
+
+    word_count = sum([len([x for x in line.split(_token_delimiter) if x]) for line in lines])
+    piece_count = sum([len(x.ids) for x in tokenizer.encode_batch(lines, add_special_tokens=False)])
+
+    return piece_count / word_count if word_count > 0 else 0.
+
+
+def sample_sizes(start_size: int, max_size: int, growth: float = 2.) -> list[int]:
+    sizes = []
+    size = start_size
+
+    while size < max_size:
+        sizes.append(size)
+        size = int(size * growth)
+    # end while
+
+    sizes.append(max_size)
+
+    return sizes
+
+
+def train_on_sample(lines: list[str], vocab_size: int, min_frequency: int,
+                    work_folder: str) -> RoBertWordPieceTokenizer:
+    sample_file = os.path.join(work_folder, 'sample.txt')
+
+    with open(sample_file, mode='w', encoding='utf-8') as f:
+        f.write(''.join([x + '\n' for x in lines]))
+    # end with
+
+    tokenizer = RoBertWordPieceTokenizer(train_mode=True)
+    tokenizer.train(files=[sample_file], vocab_size=vocab_size,
+                    min_frequency=min_frequency, show_progress=False)
+    os.remove(sample_file)
+
+    return tokenizer
+
+
+def _format(value: float | None) -> str:
+    return f'{value:.4f}' if value is not None else '-'
+
+
+def train_until_converged(input_files: list[str], vocab_size: int = 150000, min_frequency: int = 2,
+                          start_size: int = 100000, max_size: int = 3200000, growth: float = 2.,
+                          eval_size: int = 10000, min_overlap: float = 0.95, max_drift: float = 0.01,
+                          method: str = 'reservoir', seed: int = 1234) -> tuple[RoBertWordPieceTokenizer, dict]:
+    """Trains on nested samples of `start_size`, `start_size * growth`, ... lines, up to `max_size`
+    lines (or all the lines, if there are fewer), and stops at the first sample size whose vocabulary
+    is within `min_overlap` and `max_drift` of the one of the previous size. `eval_size` more lines
+    are drawn to measure the fertility. Returns the last trained tokenizer and a report with the
+    overlap and fertility at each step and the chosen sample size (`None`, if not converged)."""
+
+    start = perf_counter()
+    drawn = draw_sample(input_files, max_size + eval_size, method=method, seed=seed)
+    # If there are fewer lines, at most a tenth of them are held out
+    eval_size = min(eval_size, len(drawn) // 10) if len(drawn) < max_size + eval_size else eval_size
+    eval_lines = drawn[len(drawn) - eval_size:]
+    train_lines = drawn[:len(drawn) - eval_size]
+
+    if not train_lines:
+        raise ValueError(f'No training lines in {input_files}')
+    # end if
+
+    report = {'method': method, 'seed': seed, 'lines': len(train_lines), 'eval_lines': len(eval_lines),
+              'sample_seconds': perf_counter() - start, 'steps': [], 'chosen_size': None}
+    previous_vocab = None
+    previous_fertility = None
+    tokenizer = None
+
+    print(f'Drew [{len(drawn)}] lines in [{report["sample_seconds"]:.1f}] seconds', file=sys.stderr, flush=True)
+
+    with tempfile.TemporaryDirectory() as work_folder:
+        for size in sample_sizes(min(start_size, len(train_lines)), len(train_lines), growth):
+            start = perf_counter()
+            tokenizer = train_on_sample(train_lines[:size], vocab_size, min_frequency, work_folder)
+            vocab = set(tokenizer.get_vocab(with_added_tokens=False))
+            step = {'size': size, 'vocab_size': len(vocab),
+                    'fertility': fertility(tokenizer, eval_lines) if eval_lines else None,
+                    'train_seconds': perf_counter() - start, 'overlap': None, 'fertility_drift': None}
+
+            if previous_vocab is not None:
+                step['overlap'] = vocab_overlap(previous_vocab, vocab)
+
+                if previous_fertility:
+                    step['fertility_drift'] = abs(step['fertility'] - previous_fertility) / previous_fertility
+                # end if
+            # end if
+
+            report['steps'].append(step)
+            print(f'Sample [{size}] lines: vocabulary [{len(vocab)}], overlap [{_format(step["overlap"])}], ' +
+                  f'fertility [{_format(step["fertility"])}], drift [{_format(step["fertility_drift"])}], ' +
+                  f'in [{step["train_seconds"]:.1f}] seconds', file=sys.stderr, flush=True)
+
+            if step['overlap'] is not None and step['overlap'] >= min_overlap and \
+                    (step['fertility_drift'] is None or step['fertility_drift'] <= max_drift):
+                report['chosen_size'] = size
+                break
+            # end if
+
+            previous_vocab = vocab
+            previous_fertility = step['fertility']
+        # end for
+    # end with
+
+    return tokenizer, report
+
+
+if __name__ == '__main__':
+    options = {'-s': 1234, '-m': 'reservoir', '-v': 150000, '-f': 2,
+               '-n': 100000, '-x': 3200000, '-t': 0.95, '-d': 0.01}
+
+    while len(sys.argv) > 3 and sys.argv[1] in options:
+        match sys.argv[1]:
+            case '-m':
+                options['-m'] = sys.argv[2]
+            case '-t' | '-d':
+                options[sys.argv[1]] = float(sys.argv[2])
+            case _:
+                options[sys.argv[1]] = int(sys.argv[2])
+        # end match
+
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
+
+    if len(sys.argv) != 3 or options['-m'] not in sample_methods:
+        print('Usage: python3 ro_vocabsample.py [-s <seed>] [-m reservoir|stratified] [-v <vocab size>] ' +
+              '[-f <min frequency>] [-n <start sample lines>] [-x <max sample lines>] ' +
+              '[-t <min vocab overlap>] [-d <max fertility drift>] ' +
+              '<folder with .txt training files> <output folder>', file=sys.stderr, flush=True)
+        exit(1)
+    # end if
+
+    trained_tokenizer, sample_report = train_until_converged(
+        list_corpus_files(sys.argv[1], extension='.txt'),
+        vocab_size=options['-v'], min_frequency=options['-f'],
+        start_size=options['-n'], max_size=options['-x'],
+        min_overlap=options['-t'], max_drift=options['-d'],
+        method=options['-m'], seed=options['-s'])
+    os.makedirs(sys.argv[2], exist_ok=True)
+    trained_tokenizer.save_model(directory=sys.argv[2])
+    clean_vocab_file(os.path.join(sys.argv[2], 'vocab.txt'))
+
+    with open(os.path.join(sys.argv[2], 'vocab_sample.json'), mode='w', encoding='utf-8') as f:
+        json.dump(sample_report, f, indent=2)
+    # end with
+
+    if sample_report['chosen_size'] is not None:
+        print(f'Vocabulary converged with a sample of [{sample_report["chosen_size"]}] lines',
+              file=sys.stderr, flush=True)
+    else:
+        print(f'Vocabulary did not converge, up to [{sample_report["lines"]}] lines',
+              file=sys.stderr, flush=True)
+    # end if
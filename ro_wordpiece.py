@@ -3,6 +3,9 @@
 
 import sys
 import os
+import gc
+import json
+from time import perf_counter
 from typing import Dict, List, Optional, Union
 from tokenizers import AddedToken, Tokenizer, decoders, trainers
 from tokenizers.models import WordPiece
@@ -11,8 +14,17 @@ from tokenizers.pre_tokenizers import PreTokenizer
 from ro_normalizer import RomanianNormalizer
 from ro_pretokenizer import RomanianPreTokenizer, TrainingPreTokenizer
 from ro_decoder import RomanianDecoder
+from ro_metrics import metrics
 from tokenizers.implementations import BaseTokenizer
-from transformers import PreTrainedTokenizer
+
+
+# The artifact folder of RoBertWordPieceTokenizer.save_pretrained()
+pretrained_format_version = 2
+pretrained_config_file = 'rwpt_config.json'
+# Not tokenizer.json: it has no vocabulary, so it is not a standalone tokenizers file
+pretrained_tokenizer_file = 'rwpt_pipeline.json'
+pretrained_vocab_file = 'vocab.json'
+pretrained_lexicon_file = 'lexicon.json'
 
 
 class RoBertWordPieceTokenizer(BaseTokenizer):
@@ -27,23 +39,38 @@ class RoBertWordPieceTokenizer(BaseTokenizer):
         pad_token: Union[str, AddedToken] = "[PAD]",
         mask_token: Union[str, AddedToken] = "[MASK]",
         wordpieces_prefix: str = "##",
-        train_mode: bool = False
+        train_mode: bool = False,
+        native_train: bool = True,
+        wordforms_file: Optional[str] = None,
+        lexicon_overlays: Optional[List[str]] = None,
+        engine: str = "reference"
     ):
+        """With `train_mode=True`, the tokenizer expects `_tk_`-delimited,
+        pre-tokenized lines. If `native_train` is also `True` (default), the
+        splitting is done with built-in `tokenizers` components, so that training
+        is not serialized through the Python `TrainingPreTokenizer`.
+        `wordforms_file` is the lexicon of the `RoTokenizer` and `lexicon_overlays`
+        are folders with extra word forms, MWEs and abbreviations for it.
+        `engine` is the one of the normalizer and pre-tokenizer, 'reference' or 'fast'
+        (same output, checked with `ro_differential.py`)."""
+
         if train_mode:
             ro_pretokenizer = TrainingPreTokenizer()
-            max_token_len = RomanianPreTokenizer().maxwordlen
+            # Only used for the maximum word length
+            lexicon_pretokenizer = RomanianPreTokenizer(wordforms_file=wordforms_file,
+                                                        overlays=lexicon_overlays, engine=engine)
         else:
-            ro_pretokenizer = RomanianPreTokenizer()
-            max_token_len = ro_pretokenizer.maxwordlen
+            ro_pretokenizer = RomanianPreTokenizer(wordforms_file=wordforms_file,
+                                                   overlays=lexicon_overlays, engine=engine)
+            lexicon_pretokenizer = ro_pretokenizer
         # end if
 
+        # max_input_chars_per_word is set from the lexicon, which is
+        # only loaded before the first encoding or training
         if vocab is not None:
-            tokenizer = Tokenizer(WordPiece(vocab,
-                                            unk_token=str(unk_token),
-                                            max_input_chars_per_word=max_token_len))
+            tokenizer = Tokenizer(WordPiece(vocab, unk_token=str(unk_token)))
         else:
-            tokenizer = Tokenizer(WordPiece(unk_token=str(unk_token),
-                                            max_input_chars_per_word=max_token_len))
+            tokenizer = Tokenizer(WordPiece(unk_token=str(unk_token)))
         # end if
 
         # Let the tokenizer know about special tokens if they are part of the vocab
@@ -68,11 +95,15 @@ class RoBertWordPieceTokenizer(BaseTokenizer):
         # end if
 
         if not train_mode:
-            tokenizer.normalizer = Normalizer.custom(RomanianNormalizer())
+            tokenizer.normalizer = Normalizer.custom(RomanianNormalizer(engine=engine))
+            tokenizer.pre_tokenizer = PreTokenizer.custom(ro_pretokenizer)
+        elif native_train:
+            tokenizer.normalizer = TrainingPreTokenizer.native_normalizer()
+            tokenizer.pre_tokenizer = TrainingPreTokenizer.native_pre_tokenizer()
+        else:
+            tokenizer.pre_tokenizer = PreTokenizer.custom(ro_pretokenizer)
         # end if
 
-        tokenizer.pre_tokenizer = PreTokenizer.custom(ro_pretokenizer)
-
         if vocab is not None:
             sep_token_id = tokenizer.token_to_id(str(sep_token))
 
@@ -108,11 +139,291 @@ class RoBertWordPieceTokenizer(BaseTokenizer):
         }
 
         super().__init__(tokenizer, parameters)
+        self._lexicon_pretokenizer = lexicon_pretokenizer
+        # The lexicon version that max_input_chars_per_word was set for
+        self._synced_lexicon_version = None
+        # What is needed to pickle this tokenizer
+        self._vocab_file = vocab if isinstance(vocab, str) else None
+        self._pretrained_folder = None
+        # The lexicon version right after from_pretrained()
+        self._pretrained_lexicon_version = None
+        self._init_kwargs = {
+            "unk_token": str(unk_token),
+            "sep_token": str(sep_token),
+            "cls_token": str(cls_token),
+            "pad_token": str(pad_token),
+            "mask_token": str(mask_token),
+            "wordpieces_prefix": wordpieces_prefix,
+            "train_mode": train_mode,
+            "native_train": native_train,
+            "wordforms_file": wordforms_file,
+            "lexicon_overlays": lexicon_overlays,
+            "engine": engine
+        }
+
+    def __getstate__(self) -> dict:
+        """The custom normalizer and pre-tokenizer cannot be pickled, so the tokenizer is pickled as
+        the path of its `save_pretrained()` folder, if it was loaded from one and no terms were added
+        to its lexicon since, or else as the path of its vocabulary (or the vocabulary itself, if it was not read from a file),
+        its constructor arguments and, if it is loaded, a snapshot of the lexicon."""
+
+        lexicon_tokenizer = self._lexicon_pretokenizer._romanian_tokenizer
+
+        if self._pretrained_folder is not None and \
+                self._pretrained_lexicon_version == lexicon_tokenizer.lexicon_version:
+            return {"pretrained_folder": self._pretrained_folder}
+        # end if
+
+        return {
+            "pretrained_folder": None,
+            "vocab_file": self._vocab_file,
+            "vocab": self.get_vocab(with_added_tokens=False) if self._vocab_file is None else None,
+            "init_kwargs": self._init_kwargs,
+            "lexicon": lexicon_tokenizer.lexicon_snapshot() if lexicon_tokenizer.lexicon_loaded else None
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        if state["pretrained_folder"] is not None:
+            self.__dict__.update(RoBertWordPieceTokenizer.from_pretrained(state["pretrained_folder"]).__dict__)
+            return
+        # end if
+
+        if state["vocab_file"] is not None:
+            vocab = WordPiece.read_file(state["vocab_file"])
+        else:
+            vocab = state["vocab"] or None
+        # end if
+
+        self.__init__(vocab, **state["init_kwargs"])
+        self._vocab_file = state["vocab_file"]
+
+        if state["lexicon"] is not None:
+            self._lexicon_pretokenizer._romanian_tokenizer.restore_lexicon(state["lexicon"])
+        # end if
+
+    def prepare_for_fork(self) -> None:
+        """Call this in the parent process, before forking the workers (e.g. the ones of a
+        PyTorch `DataLoader` or of a `multiprocessing.Pool` with the `fork` start method).
+        It loads the lexicon and moves all the existing objects to the permanent generation
+        of the garbage collector (`gc.freeze()`), such that the collections done in the workers
+        do not write to, and thus copy, the memory pages of the lexicon."""
+
+        self._sync_max_input_chars()
+        gc.collect()
+        gc.freeze()
+
+    def add_wordforms(self, wordforms: List[str]) -> int:
+        """Adds word forms to the lexicon of the `RoTokenizer`. Returns the number of new terms."""
+        return self._lexicon_pretokenizer._romanian_tokenizer.add_wordforms(wordforms)
+
+    def add_mwes(self, mwes: List[str]) -> int:
+        """Adds multi-word expressions (e.g. `în principiu`) to the lexicon of the `RoTokenizer`."""
+        return self._lexicon_pretokenizer._romanian_tokenizer.add_mwes(mwes)
+
+    def add_abbreviations(self, abbrs: List[str]) -> int:
+        """Adds abbreviations (e.g. `alin.`) to the lexicon of the `RoTokenizer`."""
+        return self._lexicon_pretokenizer._romanian_tokenizer.add_abbreviations(abbrs)
+
+    def _sync_max_input_chars(self) -> None:
+        """Loads the lexicon, if needed, and lets the WordPiece model
+        split words as long as the longest word/MWE/ABBR of the lexicon."""
+
+        self._tokenizer.model.max_input_chars_per_word = self._lexicon_pretokenizer.maxwordlen
+        self._synced_lexicon_version = self._lexicon_pretokenizer._romanian_tokenizer.lexicon_version
 
     @staticmethod
     def from_file(vocab: str, **kwargs):
-        vocab = WordPiece.read_file(vocab)
-        return RoBertWordPieceTokenizer(vocab, **kwargs)
+        vocab_file = vocab
+        vocab = WordPiece.read_file(vocab_file)
+        tokenizer = RoBertWordPieceTokenizer(vocab, **kwargs)
+        tokenizer._vocab_file = os.path.abspath(vocab_file)
+
+        return tokenizer
+
+    def _custom_components(self) -> list[str]:
+        """The Python components of the pipeline, which `tokenizers` cannot serialize."""
+
+        if not self._init_kwargs["train_mode"]:
+            return ["normalizer", "pre_tokenizer"]
+        elif not self._init_kwargs["native_train"]:
+            return ["pre_tokenizer"]
+        else:
+            return []
+        # end if
+
+    def save_pretrained(self, directory: str) -> list[str]:
+        """Saves the complete tokenizer as a versioned artifact folder, with:
+        - `rwpt_pipeline.json`: the native `tokenizers` pipeline (special tokens, decoder, etc.),
+        without the custom Romanian normalizer and pre-tokenizer, which cannot be serialized,
+        and without the WordPiece vocabulary;
+        - `vocab.json`: the WordPiece vocabulary, as a list of tokens in id order, with `null`
+        for the unused ids, which loads much faster than a `tokenizers` WordPiece vocabulary;
+        - `lexicon.json`: the Romanian lexicon, such that the word forms file is not needed;
+        - `rwpt_config.json`: the format version and the constructor arguments.
+        Load it back with `RoBertWordPieceTokenizer.from_pretrained()`. Returns the saved files."""
+
+        self._sync_max_input_chars()
+        model = self._tokenizer.model
+        vocab = self.get_vocab(with_added_tokens=False)
+        # The ids of the vocab.txt files with duplicate terms have gaps
+        tokens = [None] * (max(vocab.values()) + 1 if vocab else 0)
+
+        for token, token_id in vocab.items():
+            tokens[token_id] = token
+        # end for
+
+        os.makedirs(directory, exist_ok=True)
+        config_file = os.path.join(directory, pretrained_config_file)
+        tokenizer_file = os.path.join(directory, pretrained_tokenizer_file)
+        vocab_file = os.path.join(directory, pretrained_vocab_file)
+        lexicon_file = os.path.join(directory, pretrained_lexicon_file)
+        normalizer = self._tokenizer.normalizer
+        pre_tokenizer = self._tokenizer.pre_tokenizer
+
+        try:
+            for name in self._custom_components():
+                setattr(self._tokenizer, name, None)
+            # end for
+
+            self._tokenizer.model = WordPiece(unk_token=model.unk_token,
+                                              continuing_subword_prefix=model.continuing_subword_prefix,
+                                              max_input_chars_per_word=model.max_input_chars_per_word)
+            self._tokenizer.save(tokenizer_file)
+        finally:
+            self._tokenizer.model = model
+            self._tokenizer.normalizer = normalizer
+            self._tokenizer.pre_tokenizer = pre_tokenizer
+        # end try
+
+        with open(vocab_file, mode='w', encoding='utf-8') as f:
+            json.dump(tokens, f, ensure_ascii=False)
+        # end with
+
+        self._lexicon_pretokenizer._romanian_tokenizer.save_lexicon(lexicon_file)
+        init_kwargs = dict(self._init_kwargs)
+        # The lexicon is saved, the files it came from are not needed
+        init_kwargs["wordforms_file"] = None
+        init_kwargs["lexicon_overlays"] = None
+
+        with open(config_file, mode='w', encoding='utf-8') as f:
+            json.dump({
+                "format_version": pretrained_format_version,
+                "tokenizer_class": self.__class__.__name__,
+                "normalizer": RomanianNormalizer.__name__,
+                "pre_tokenizer": self._lexicon_pretokenizer.__class__.__name__,
+                "init_kwargs": init_kwargs
+            }, f, indent=2)
+        # end with
+
+        return [config_file, tokenizer_file, vocab_file, lexicon_file]
+
+    @staticmethod
+    def from_pretrained(directory: str):
+        """Loads a tokenizer saved with `save_pretrained()`."""
+
+        with open(os.path.join(directory, pretrained_config_file), mode='r', encoding='utf-8') as f:
+            config = json.load(f)
+        # end with
+
+        if config.get("format_version") != pretrained_format_version:
+            raise ValueError(f'Unsupported format version [{config.get("format_version")}] in [{directory}], ' +
+                             f'expected [{pretrained_format_version}]')
+        # end if
+
+        with open(os.path.join(directory, pretrained_vocab_file), mode='r', encoding='utf-8') as f:
+            tokens = json.load(f)
+        # end with
+
+        vocab = dict(zip(tokens, range(len(tokens))))
+        # The unused ids
+        vocab.pop(None, None)
+
+        # Without a vocabulary, the constructor only builds the custom components
+        tokenizer = RoBertWordPieceTokenizer(**config["init_kwargs"])
+        native_tokenizer = Tokenizer.from_file(os.path.join(directory, pretrained_tokenizer_file))
+        model = native_tokenizer.model
+        native_tokenizer.model = WordPiece(vocab, unk_token=model.unk_token,
+                                           continuing_subword_prefix=model.continuing_subword_prefix,
+                                           max_input_chars_per_word=model.max_input_chars_per_word)
+
+        for name in tokenizer._custom_components():
+            setattr(native_tokenizer, name, getattr(tokenizer._tokenizer, name))
+        # end for
+
+        tokenizer._tokenizer = native_tokenizer
+        tokenizer._lexicon_pretokenizer._romanian_tokenizer.restore_lexicon_file(
+            os.path.join(directory, pretrained_lexicon_file))
+        # max_input_chars_per_word was saved in the pipeline file
+        tokenizer._synced_lexicon_version = tokenizer._lexicon_pretokenizer._romanian_tokenizer.lexicon_version
+        tokenizer._pretrained_folder = os.path.abspath(directory)
+        tokenizer._pretrained_lexicon_version = tokenizer._synced_lexicon_version
+
+        return tokenizer
+
+    def encode(self, sequence, pair=None, is_pretokenized: bool = False, add_special_tokens: bool = True):
+        """With metrics enabled, the time of the WordPiece model (and of the rest of the Rust
+        pipeline) is recorded as the `wordpiece_model` stage: the encode time without the
+        time spent in the Python normalizer and pre-tokenizer."""
+
+        if self._synced_lexicon_version != self._lexicon_pretokenizer._romanian_tokenizer._lexicon_version:
+            self._sync_max_input_chars()
+        # end if
+
+        if not metrics.enabled:
+            return super().encode(sequence, pair=pair, is_pretokenized=is_pretokenized,
+                                  add_special_tokens=add_special_tokens)
+        # end if
+
+        pipeline_seconds = metrics.pipeline_seconds
+        start = perf_counter()
+        result = super().encode(sequence, pair=pair, is_pretokenized=is_pretokenized,
+                                add_special_tokens=add_special_tokens)
+        encode_seconds = perf_counter() - start
+        metrics.add_time('encode', encode_seconds)
+        metrics.add_time('wordpiece_model',
+                         max(0., encode_seconds - (metrics.pipeline_seconds - pipeline_seconds)))
+
+        return result
+
+    def encode_batch(self, inputs, is_pretokenized: bool = False, add_special_tokens: bool = True):
+        if self._synced_lexicon_version != self._lexicon_pretokenizer._romanian_tokenizer._lexicon_version:
+            self._sync_max_input_chars()
+        # end if
+
+        if not metrics.enabled:
+            return super().encode_batch(inputs, is_pretokenized=is_pretokenized,
+                                        add_special_tokens=add_special_tokens)
+        # end if
+
+        start = perf_counter()
+        result = super().encode_batch(inputs, is_pretokenized=is_pretokenized,
+                                      add_special_tokens=add_special_tokens)
+        metrics.add_time('encode_batch', perf_counter() - start)
+
+        return result
+
+    @property
+    def cls_token_id(self) -> Optional[int]:
+        return self.token_to_id(self._init_kwargs["cls_token"])
+
+    @property
+    def sep_token_id(self) -> Optional[int]:
+        return self.token_to_id(self._init_kwargs["sep_token"])
+
+    def encode_batch_ids(self, inputs: List[str], add_special_tokens: bool = False) -> List[List[int]]:
+        """The token ids of each of the `inputs`. With `add_special_tokens=True`, they start with
+        `cls_token_id` and end with `sep_token_id`. This tokenizer has no post-processor, so
+        `encode_batch(..., add_special_tokens=True)` does not add them."""
+
+        ids = [x.ids for x in self.encode_batch(inputs, add_special_tokens=False)]
+
+        if add_special_tokens:
+            cls_ids = [self.cls_token_id]
+            sep_ids = [self.sep_token_id]
+            ids = [cls_ids + x + sep_ids for x in ids]
+        # end if
+
+        return ids
 
     def train(
         self,
@@ -147,65 +458,39 @@ class RoBertWordPieceTokenizer(BaseTokenizer):
             files = [files]
         # end if
 
+        self._sync_max_input_chars()
         self._tokenizer.train(files, trainer=trainer)
+        # Sync again, in case the trainer replaced the model
+        self._synced_lexicon_version = None
 
 
-class RoBertPreTrainedTokenizer(PreTrainedTokenizer):
-    """Use this class with the `transformers` library.
+def __getattr__(name: str):
+    # transformers takes long to import, so only import it when
+    # the RoBertPreTrainedTokenizer is first needed
+    if name == 'RoBertPreTrainedTokenizer':
+        from ro_pretrained import RoBertPreTrainedTokenizer
+        return RoBertPreTrainedTokenizer
+    # end if
 
-    The following should be enforced:
-    - the `RoBertWordPieceTokenizer`, which is the underlying tokenizer,
-    is case sensitive, so the use of `do_lower_case` is not tested 
-    - `save_pretrained` does not work with custom/Python tokenizers
-    - this tokenizer cannot be pushed to the HuggingFace hub."""
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
-    vocab_files_names = {
-        'RoBertWordPieceTokenizer': os.path.join(os.path.dirname(__file__), 'model', 'vocab.txt')
-    }
 
-    def __init__(self, *init_inputs, **kwargs):
-        if 'name_or_path' in kwargs:
-            # When called from RoBertPreTrainedTokenizer.from_pretrained(vocab.txt)
-            self._ro_wordpiece_tokenizer = \
-                RoBertWordPieceTokenizer.from_file(
-                    vocab=kwargs['name_or_path'])
-        else:
-            self._ro_wordpiece_tokenizer = RoBertWordPieceTokenizer.from_file(
-                vocab=RoBertPreTrainedTokenizer.vocab_files_names['RoBertWordPieceTokenizer'])
-        
-        super().__init__(
-            unk_token=self._ro_wordpiece_tokenizer._parameters['unk_token'],
-            sep_token=self._ro_wordpiece_tokenizer._parameters['sep_token'],
-            pad_token=self._ro_wordpiece_tokenizer._parameters['pad_token'],
-            cls_token=self._ro_wordpiece_tokenizer._parameters['cls_token'],
-            mask_token=self._ro_wordpiece_tokenizer._parameters['mask_token'],
-            **kwargs)
+if __name__ == '__main__':
+    # Only needed here, ro_dedup imports numpy and tqdm
+    from ro_dedup import clean_vocab_file
+    from ro_profiler import SamplingProfiler, process_profile_file, merge_profiles, clear_profiles
 
-    @property
-    def vocab_size(self) -> int:
-        """
-        `int`: Size of the base vocabulary (without externally added new tokens).
-        """
-        return self._ro_wordpiece_tokenizer.get_vocab_size(with_added_tokens=True)
-    
-    def get_vocab(self) -> Dict[str, int]:
-        return self._ro_wordpiece_tokenizer.get_vocab(with_added_tokens=True)
-
-    def _tokenize(self, text, **kwargs):
-        return self._ro_wordpiece_tokenizer.encode(sequence=text,
-                                                   is_pretokenized=False,
-                                                   add_special_tokens=False).tokens
-
-    def _convert_token_to_id(self, token):
-        return self._ro_wordpiece_tokenizer.token_to_id(token=token)
-    
-    def _convert_id_to_token(self, index: int) -> str:
-        return self._ro_wordpiece_tokenizer.id_to_token(id=index)
+    profile_folder = None
 
+    while len(sys.argv) > 3 and sys.argv[1] in ['--profile']:
+        profile_folder = sys.argv[2]
+        sys.argv.pop(2)
+        sys.argv.pop(1)
+    # end while
 
-if __name__ == '__main__':
     if len(sys.argv) != 2:
-        print('Usage: python3 ro_wordpiece.py <folder with .txt files>', file=sys.stderr, flush=True)
+        print('Usage: python3 ro_wordpiece.py [--profile <profile output folder>] <folder with .txt files>',
+              file=sys.stderr, flush=True)
         exit(1)
     # end if
 
@@ -222,30 +507,26 @@ if __name__ == '__main__':
         # end if
     # end for
 
+    if profile_folder is not None:
+        # The native trainer runs in Rust threads, without Python stacks,
+        # so only the Python parts of the training are broken down
+        clear_profiles(profile_folder)
+        profiler = SamplingProfiler()
+        profiler.start()
+    # end if
+
     tokenizer = RoBertWordPieceTokenizer(train_mode=True)
     # After inspecting the CoRoLa vocabulary, these are the best values.
     tokenizer.train(files=corola_files, vocab_size=500_000, min_frequency=5)
     tokenizer.save_model(directory='model')
 
     # Bug: save_model() saves some duplicate tokens...
-    vocab_file_in = os.path.join('model', 'vocab.txt')
-    vocab_file_out = os.path.join('model', 'vocab2.txt')
-    vocab_terms = set()
-
-    with open(vocab_file_out, mode='w', encoding='utf-8') as f:
-        with open(vocab_file_in, mode='r', encoding='utf-8') as ff:
-            for line in ff:
-                term = line.strip()
-
-                if term not in vocab_terms:
-                    print(term, file=f, end='\n')
-                    vocab_terms.add(term)
-                else:
-                    print(f'vocab.txt term [{term}] is duplicated', file=sys.stderr, flush=True)
-                # end if
-            # end for
-        # end with
-    # end with
-
-    os.remove(path=vocab_file_in)
-    os.rename(src=vocab_file_out, dst=vocab_file_in)
+    vocab_report = clean_vocab_file(os.path.join('model', 'vocab.txt'))
+    print(f'vocab.txt: removed [{len(vocab_report["duplicates"])}] duplicate terms, ' +
+          f'fixed [{len(vocab_report["gaps"])}] id gaps', file=sys.stderr, flush=True)
+
+    if profile_folder is not None:
+        profiler.stop()
+        profiler.save(process_profile_file(profile_folder))
+        print(merge_profiles(profile_folder), file=sys.stderr, end='', flush=True)
+    # end if
@@ -1,9 +1,63 @@
+import os
 import sys
 import re
+import json
+import threading
 from pathlib import Path
+from typing import Iterable
+from itertools import groupby
+from time import perf_counter
 import unicodedata as uc
 
 
+# 'reference' is the rule by rule implementation, 'fast' computes the same output with fewer passes
+ro_engines = ['reference', 'fast']
+
+
+class _NoMetrics(object):
+    """The metrics of the RoTokenizer stages, when none are set with `set_metrics()`."""
+
+    enabled = False
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        pass
+
+    def increment(self, counter: str, value: int = 1) -> None:
+        pass
+
+
+# Any object with an `enabled` attribute and the `add_time()` and `increment()` methods,
+# e.g. the `ro_metrics.metrics`, which sets itself when ro_metrics is imported.
+metrics = _NoMetrics()
+
+
+def set_metrics(stage_metrics) -> None:
+    """Records the RoTokenizer stage times and events in `stage_metrics`, or nowhere, if `None`."""
+
+    global metrics
+    metrics = stage_metrics if stage_metrics is not None else _NoMetrics()
+
+
+class _CharSetIndexes(dict):
+    """The index of the first `RoTokenizer._unicode_char_sets` set that each character
+    (or its Unicode category) is in, computed on first lookup."""
+
+    def __missing__(self, c: str) -> int:
+        c_cat = uc.category(c)
+        si = len(RoTokenizer._unicode_char_sets) - 1
+
+        for i in range(si):
+            if c in RoTokenizer._unicode_char_sets[i] or c_cat in RoTokenizer._unicode_char_sets[i]:
+                si = i
+                break
+            # end if
+        # end for
+
+        self[c] = si
+
+        return si
+
+
 class RoTokenizer(object):
     """This class will tokenize Romanian texts from input strings.
     The tokenization algorithm is deterministic and rule-based.
@@ -63,114 +117,397 @@ class RoTokenizer(object):
         set()
     ]
 
-    def __init__(self):
-        self._maxwordlen = 25
-        self._lexicon = self._read_romanian_wordforms()
-        self._maxmwelen = 2
-        self._mwefirstword = self._read_romanian_mwes(lexicon=self._lexicon)
-        self._maxabbrlen = 2
-        self._abbrfirstword = self._read_romanian_abbrs(lexicon=self._lexicon)
-        print(f'Maximum length of a word is [{self._maxwordlen}]', file=sys.stderr, flush=True)
+    # Overridden by the RWPT_WORDFORMS environment variable, e.g. with a smaller lexicon
+    default_wordforms_file = Path(__file__).parent / 'data' / 'wordforms.txt'
+    # Set when the lexicon is loaded, on first use
+    _lexicon_attributes = set([
+        "_maxwordlen", "_lookup", "_maxmwelen", "_maxabbrlen"])
+    # The flags of a term in the lexicon lookup, see `term_flags()`
+    lex_flag = 1
+    mwe_first_flag = 2
+    abbr_first_flag = 4
+    # The same flags, for the lowercase form of a term
+    lower_flags_shift = 3
+    # Either the term or its lowercase form has the flag
+    _lex_flags = lex_flag | lex_flag << lower_flags_shift
+    _mwe_first_flags = mwe_first_flag | mwe_first_flag << lower_flags_shift
+    _abbr_first_flags = abbr_first_flag | abbr_first_flag << lower_flags_shift
+    # The sets of terms of the saved lexicon .json files, for each flag
+    _saved_term_sets = {"lexicon": lex_flag, "mwefirstword": mwe_first_flag, "abbrfirstword": abbr_first_flag}
+    _load_lock = threading.Lock()
+    # Used by the 'fast' engine
+    _char_set_indexes = _CharSetIndexes()
+    # The tag cache is emptied when it gets larger than this
+    tag_cache_size = 1 << 18
+
+    def __init__(self, wordforms_file: str | None = None, overlays: list[str] | None = None,
+                 engine: str = 'reference'):
+        """`wordforms_file` is the lexicon of Romanian word forms, one per line. By default,
+        it is `$RWPT_WORDFORMS`, if set, or else `data/wordforms.txt`.
+        `overlays` are folders with extra (e.g. domain) `wordforms.txt`, `mwes.txt` and/or
+        `abbrs.txt` files, read after the default ones. By default, they are the
+        `$RWPT_LEXICON_OVERLAYS` folders, separated by `os.pathsep`, if set.
+        The lexicon is read on first use, or by calling `load_lexicon()`.
+        With `engine='fast'`, the characters are classified with a cached table and the
+        tags of the words are cached (for the current lexicon version)."""
+
+        if engine not in ro_engines:
+            raise ValueError(f'Unknown engine [{engine}], expected one of {ro_engines}')
+        # end if
 
-    def _read_romanian_wordforms(self) -> set[str]:
-        wordforms_file = Path(__file__).parent / 'data' / 'wordforms.txt'
-        wordforms = set()
-        
-        print(f'Reading wordforms file [{wordforms_file}]', file=sys.stderr, flush=True)
+        if wordforms_file is None:
+            wordforms_file = os.environ.get('RWPT_WORDFORMS', RoTokenizer.default_wordforms_file)
+        # end if
 
-        with open(wordforms_file, mode='r', encoding='utf-8') as f:
-            for line in f:
-                word = line.strip()
-                wordforms.add(word)
+        if overlays is None:
+            overlays = [x for x in os.environ.get('RWPT_LEXICON_OVERLAYS', '').split(os.pathsep) if x]
+        # end if
 
-                if len(word) > self._maxwordlen:
-                    self._maxwordlen = len(word)
-                # end if
+        self._wordforms_file = wordforms_file
+        self._overlays = list(overlays)
+        # Incremented each time the lexicon changes, such that
+        # the values that depend on it can be updated
+        self._lexicon_version = 0
+        self._engine = engine
+        self._tag_cache = {}
+        self._tag_cache_version = 0
+
+    def __getattr__(self, name: str):
+        # Only called if the attribute is not set, i.e. before the lexicon is loaded
+        if name in RoTokenizer._lexicon_attributes:
+            self.load_lexicon()
+            return self.__dict__[name]
+        # end if
+
+        raise AttributeError(f"'RoTokenizer' object has no attribute '{name}'")
+
+    @property
+    def lexicon_loaded(self) -> bool:
+        return '_lookup' in self.__dict__
+
+    @property
+    def lexicon_version(self) -> int:
+        return self._lexicon_version
+
+    @property
+    def engine(self) -> str:
+        return self._engine
+
+    def load_lexicon(self) -> None:
+        """Reads the word forms, MWEs and abbreviations files, if not already read."""
+
+        with RoTokenizer._load_lock:
+            if self.lexicon_loaded:
+                return
+            # end if
+
+            # Read into a blank instance, such that other threads
+            # never see a partially loaded lexicon
+            loaded = RoTokenizer.__new__(RoTokenizer)
+            loaded._maxwordlen = 25
+            loaded._lookup = {}
+            loaded._read_romanian_wordforms(self._wordforms_file)
+            loaded._maxmwelen = 2
+            loaded._read_romanian_mwes()
+            loaded._maxabbrlen = 2
+            loaded._read_romanian_abbrs()
+
+            for overlay_folder in self._overlays:
+                loaded._read_overlay(overlay_folder)
             # end for
+
+            self.__dict__.update({x: loaded.__dict__[x] for x in RoTokenizer._lexicon_attributes})
+            self._lexicon_version += 1
         # end with
 
-        return wordforms
+        print(f'Maximum length of a word is [{self._maxwordlen}]', file=sys.stderr, flush=True)
 
-    def _read_romanian_mwes(self, lexicon: set[str]) -> set[str]:
-        """Reads in the Romanian Multi-Word Expressions file."""
+    def lexicon_snapshot(self) -> dict:
+        """The loaded lexicon, to be restored with `restore_lexicon()`, e.g. in another process."""
 
-        mwes_file = Path(__file__).parent / 'data' / 'mwes.txt'
-        mwefirstword = set()
-        
-        print(f'Reading MWEs file [{mwes_file}]', file=sys.stderr, flush=True)
+        self.load_lexicon()
+        return {x: self.__dict__[x] for x in RoTokenizer._lexicon_attributes}
 
-        with open(mwes_file, mode='r', encoding='utf-8') as f:
-            for line in f:
-                mwe = line.strip()
-                parts = mwe.split('_')
+    def restore_lexicon(self, snapshot: dict) -> None:
+        with RoTokenizer._load_lock:
+            self.__dict__.update(snapshot)
+            self._lexicon_version += 1
+        # end with
 
-                if len(parts) > self._maxmwelen:
-                    self._maxmwelen = len(parts)
-                # end if
+    def save_lexicon(self, json_file: str | Path) -> None:
+        """Writes the loaded lexicon (word forms, MWEs and abbreviations together)
+        to a .json file, to be read back with `restore_lexicon_file()`."""
 
-                mwefirstword.add(parts[0])
-                lexicon.add(mwe)
+        snapshot = self.lexicon_snapshot()
+        saved = {x.lstrip('_'): y for x, y in snapshot.items() if x != '_lookup'}
 
-                if len(mwe) > self._maxwordlen:
-                    self._maxwordlen = len(mwe)
-                # end if
+        for x, flag in RoTokenizer._saved_term_sets.items():
+            saved[x] = sorted(self._terms_with_flag(flag))
+        # end for
+
+        with open(json_file, mode='w', encoding='utf-8') as f:
+            json.dump(dict(sorted(saved.items())), f, ensure_ascii=False)
+        # end with
+
+    def restore_lexicon_file(self, json_file: str | Path) -> None:
+        with open(json_file, mode='r', encoding='utf-8') as f:
+            saved = json.load(f)
+        # end with
+
+        restored = RoTokenizer.__new__(RoTokenizer)
+        restored._lookup = {}
+
+        for x, flag in RoTokenizer._saved_term_sets.items():
+            for term in saved[x]:
+                restored._add_term(term, flag)
             # end for
+        # end for
+
+        snapshot = {x: saved[x.lstrip('_')] for x in RoTokenizer._lexicon_attributes if x != '_lookup'}
+        snapshot['_lookup'] = restored._lookup
+        self.restore_lexicon(snapshot)
+
+    def _add_term(self, term: str, flag: int) -> bool:
+        """Sets the `flag` of `term` in the lexicon lookup. Returns `True` if it was not set.
+        The lookup is keyed by the lowercase form of the terms. Its values are the flags of the
+        lowercase form or, if the lexicon has other forms with the same lowercase form, the tuple
+        of the flags of the lowercase form and of a dictionary with the flags of the other forms."""
+
+        lookup = self._lookup
+        lower = term.lower()
+
+        if lower == term:
+            # Keep the same string, not an equal copy
+            entry = lookup.get(term, 0)
+
+            if type(entry) is int:
+                lookup[term] = entry | flag
+                return not entry & flag
+            # end if
+
+            lookup[term] = (entry[0] | flag, entry[1])
+
+            return not entry[0] & flag
+        # end if
+
+        entry = lookup.get(lower, 0)
+
+        if type(entry) is int:
+            lookup[lower] = (entry, {term: flag})
+            return True
+        # end if
+
+        form_flags = entry[1].get(term, 0)
+        entry[1][term] = form_flags | flag
+
+        return not form_flags & flag
+
+    def _terms_with_flag(self, flag: int) -> set[str]:
+        terms = set()
+
+        for lower, entry in self._lookup.items():
+            if type(entry) is int:
+                if entry & flag:
+                    terms.add(lower)
+                # end if
+            else:
+                if entry[0] & flag:
+                    terms.add(lower)
+                # end if
+
+                terms.update([x for x, y in entry[1].items() if y & flag])
+            # end if
+        # end for
+
+        return terms
+
+    def term_flags(self, word: str) -> int:
+        """The lexicon flags of `word` (`lex_flag`, `mwe_first_flag` and `abbr_first_flag`) and,
+        shifted left by `lower_flags_shift`, the ones of its lowercase form, with a single lookup."""
+
+        lower = word.lower()
+        entry = self._lookup.get(lower)
+
+        if entry is None:
+            return 0
+        elif type(entry) is int:
+            return entry << RoTokenizer.lower_flags_shift | (entry if word == lower else 0)
+        # end if
+
+        return entry[0] << RoTokenizer.lower_flags_shift | (entry[0] if word == lower else entry[1].get(word, 0))
+
+    def _read_romanian_wordforms(self, wordforms_file: str | Path) -> int:
+        print(f'Reading wordforms file [{wordforms_file}]', file=sys.stderr, flush=True)
+
+        with open(wordforms_file, mode='r', encoding='utf-8') as f:
+            return self._index_wordforms(line.strip() for line in f)
         # end with
 
-        return mwefirstword
+    def _read_romanian_mwes(self, mwes_file: str | Path | None = None) -> int:
+        """Reads in the Romanian Multi-Word Expressions file."""
+
+        if mwes_file is None:
+            mwes_file = Path(__file__).parent / 'data' / 'mwes.txt'
+        # end if
+
+        print(f'Reading MWEs file [{mwes_file}]', file=sys.stderr, flush=True)
+
+        with open(mwes_file, mode='r', encoding='utf-8') as f:
+            return self._index_mwes(line.strip() for line in f)
+        # end with
 
-    def _read_romanian_abbrs(self, lexicon: set[str]) -> set[str]:
+    def _read_romanian_abbrs(self, abbrs_file: str | Path | None = None) -> int:
         """Reads in the Romanian abbreviations file."""
 
-        abbrs_file = Path(__file__).parent / 'data' / 'abbrs.txt'
-        abbrfirstword = set()
-        
+        if abbrs_file is None:
+            abbrs_file = Path(__file__).parent / 'data' / 'abbrs.txt'
+        # end if
+
         print(f'Reading ABBRs file [{abbrs_file}]', file=sys.stderr, flush=True)
 
         with open(abbrs_file, mode='r', encoding='utf-8') as f:
-            for line in f:
-                abbr = line.strip()
-                parts = abbr.split('.')
+            return self._index_abbrs(line.strip() for line in f)
+        # end with
 
-                if len(parts) > self._maxabbrlen:
-                    self._maxabbrlen = len(parts)
-                # end if
+    def _read_overlay(self, overlay_folder: str | Path) -> None:
+        """Reads the `wordforms.txt`, `mwes.txt` and `abbrs.txt` files
+        of an overlay folder, the ones that exist."""
 
-                abbrfirstword.add(parts[0])
-                lexicon.add(abbr)
+        overlay_folder = Path(overlay_folder)
 
-                if len(abbr) > self._maxwordlen:
-                    self._maxwordlen = len(abbr)
-                # end if
-            # end for
+        if not overlay_folder.is_dir():
+            raise FileNotFoundError(f'Lexicon overlay folder [{overlay_folder}] does not exist')
+        # end if
+
+        if (overlay_folder / 'wordforms.txt').exists():
+            self._read_romanian_wordforms(overlay_folder / 'wordforms.txt')
+        # end if
+
+        if (overlay_folder / 'mwes.txt').exists():
+            self._read_romanian_mwes(overlay_folder / 'mwes.txt')
+        # end if
+
+        if (overlay_folder / 'abbrs.txt').exists():
+            self._read_romanian_abbrs(overlay_folder / 'abbrs.txt')
+        # end if
+
+    def _index_wordforms(self, wordforms: Iterable[str]) -> int:
+        """Adds `wordforms` to the lexicon and updates the maximum word length.
+        Returns the number of new terms."""
+
+        term_count = 0
+        maxwordlen = self._maxwordlen
+
+        for word in wordforms:
+            term_count += self._add_term(word, RoTokenizer.lex_flag)
+
+            if len(word) > maxwordlen:
+                maxwordlen = len(word)
+            # end if
+        # end for
+
+        self._maxwordlen = maxwordlen
+
+        return term_count
+
+    def _index_mwes(self, mwes: Iterable[str]) -> int:
+        """Adds `_`-joined `mwes` to the lexicon and their first words to
+        the MWE first words. Returns the number of new terms."""
+
+        term_count = 0
+
+        for mwe in mwes:
+            parts = mwe.split('_')
+
+            if len(parts) > self._maxmwelen:
+                self._maxmwelen = len(parts)
+            # end if
+
+            self._add_term(parts[0], RoTokenizer.mwe_first_flag)
+            term_count += self._add_term(mwe, RoTokenizer.lex_flag)
+
+            if len(mwe) > self._maxwordlen:
+                self._maxwordlen = len(mwe)
+            # end if
+        # end for
+
+        return term_count
+
+    def _index_abbrs(self, abbrs: Iterable[str]) -> int:
+        """Adds `abbrs` to the lexicon and their first parts to
+        the abbreviation first words. Returns the number of new terms."""
+
+        term_count = 0
+
+        for abbr in abbrs:
+            parts = abbr.split('.')
+
+            if len(parts) > self._maxabbrlen:
+                self._maxabbrlen = len(parts)
+            # end if
+
+            self._add_term(parts[0], RoTokenizer.abbr_first_flag)
+            term_count += self._add_term(abbr, RoTokenizer.lex_flag)
+
+            if len(abbr) > self._maxwordlen:
+                self._maxwordlen = len(abbr)
+            # end if
+        # end for
+
+        return term_count
+
+    def _add_terms(self, index_method: str, terms: Iterable[str]) -> int:
+        self.load_lexicon()
+
+        with RoTokenizer._load_lock:
+            added = getattr(self, index_method)(terms)
+            self._lexicon_version += 1
         # end with
 
-        return abbrfirstword
+        return added
+
+    def add_wordforms(self, wordforms: Iterable[str]) -> int:
+        """Adds word forms to the lexicon, loading it first, if needed.
+        Returns the number of new terms."""
+
+        return self._add_terms('_index_wordforms', [x.strip() for x in wordforms if x.strip()])
+
+    def add_mwes(self, mwes: Iterable[str]) -> int:
+        """Adds multi-word expressions, with their words separated by `_` (as in `data/mwes.txt`)
+        or by spaces, to the lexicon. Returns the number of new terms."""
+
+        return self._add_terms('_index_mwes', ['_'.join(x.split()) for x in mwes if x.strip()])
+
+    def add_abbreviations(self, abbrs: Iterable[str]) -> int:
+        """Adds abbreviations, e.g. `alin.` or `C.P.C.`, to the lexicon.
+        Returns the number of new terms."""
+
+        return self._add_terms('_index_abbrs', [x.strip() for x in abbrs if x.strip()])
 
     def is_lex_word(self, word: str, exact_match: bool = False) -> bool:
         """Tests if word is in this lexicon or not."""
 
         if exact_match:
-            return word in self._lexicon
+            return bool(self.term_flags(word) & RoTokenizer.lex_flag)
         else:    
-            return word in self._lexicon or word.lower() in self._lexicon
+            return bool(self.term_flags(word) & RoTokenizer._lex_flags)
 
     def is_mwe_first_word(self, word: str) -> bool:
         """Tests if word can start a multi-word expression."""
 
-        return word in self._mwefirstword or word.lower() in self._mwefirstword
+        return bool(self.term_flags(word) & RoTokenizer._mwe_first_flags)
 
     def is_abbr_first_word(self, word: str) -> bool:
         """Tests if word can start an abbreviation."""
 
-        return word in self._abbrfirstword or word.lower() in self._abbrfirstword
+        return bool(self.term_flags(word) & RoTokenizer._abbr_first_flags)
 
     def is_rword(self, word: str) -> bool:
         """If a word contains a Romanian diacritic or it is present
         in the Romanian lexicon, it is a Romanian word."""
 
-        if self.is_lex_word(word) or \
-                self.is_lex_word(word.lower()):
+        # The lowercase form of word.lower() is itself
+        if self.is_lex_word(word):
             return True
         # end if
 
@@ -302,8 +639,7 @@ class RoTokenizer(object):
     def is_abbr(self, word: str) -> bool:
         """A single word can be an abbreviation in the lexicon."""
 
-        return '.' in word and \
-            (word in self._lexicon or word.lower() in self._lexicon)
+        return '.' in word and self.is_lex_word(word)
 
     def tag_word(self, word: str) -> str:
         for c in RoTokenizer._token_classes:
@@ -317,8 +653,49 @@ class RoTokenizer(object):
             # end if
         # end for
 
+        if metrics.enabled:
+            metrics.increment('junk_tokens')
+        # end if
+
         return "JUNK"
 
+    def _cached_tag_word(self, word: str) -> str:
+        """`tag_word()`, for the current lexicon version."""
+
+        tag = self._tag_cache.get(word)
+
+        if tag is None:
+            if len(self._tag_cache) >= RoTokenizer.tag_cache_size:
+                self._tag_cache.clear()
+            # end if
+
+            tag = self.tag_word(word)
+            self._tag_cache[word] = tag
+        elif tag == "JUNK" and metrics.enabled:
+            metrics.increment('junk_tokens')
+        # end if
+
+        return tag
+
+    def _fast_scan(self, input_string: str) -> list:
+        """The tagged runs of characters of the same set, as the
+        first loop of `tokenize()` finds them."""
+
+        if not self.lexicon_loaded:
+            self.load_lexicon()
+        # end if
+
+        if self._tag_cache_version != self._lexicon_version:
+            self._tag_cache = {}
+            self._tag_cache_version = self._lexicon_version
+        # end if
+
+        tag_word = self._cached_tag_word
+
+        return [(word, tag_word(word)) for word in
+                [''.join(run) for _, run in groupby(input_string.replace('\t', ' '),
+                                                    key=RoTokenizer._char_set_indexes.__getitem__)]]
+
     def word_is_number(self, word: str) -> bool:
         if RoTokenizer._number_pattern.search(word) != None:
             return True
@@ -467,6 +844,10 @@ class RoTokenizer(object):
                 dash_tokens = self._decide_dash_split(word)
 
                 if dash_tokens:
+                    if metrics.enabled:
+                        metrics.increment('dash_splits')
+                    # end if
+
                     tokens2.extend(dash_tokens)
                     continue
                 # end if
@@ -568,6 +949,10 @@ class RoTokenizer(object):
                         tok[1] = label
                         tokens3.append(tuple(tok))
 
+                    if metrics.enabled:
+                        metrics.increment(label.lower() + '_matches')
+                    # end if
+
                     i = j
                     phrtok_found = True
                     break
@@ -581,11 +966,9 @@ class RoTokenizer(object):
 
         return tokens3
 
-    def tokenize(self, input_string: str) -> list:
-        """Takes a Python input_string representing a Romanian text
-        and it splits it in words and non-words. This is the main method
-        of this class."""
-        
+    def _scan(self, input_string: str) -> list:
+        """Splits input_string in runs of characters of the same set and tags them."""
+
         crt_word = ""
         tokens = []
         last_set_index = -1
@@ -631,10 +1014,48 @@ class RoTokenizer(object):
             tokens.append((crt_word, self.tag_word(crt_word)))
         # end if
 
+        return tokens
+
+    def tokenize(self, input_string: str) -> list:
+        """Takes a Python input_string representing a Romanian text
+        and it splits it in words and non-words. This is the main method
+        of this class."""
+        
+        timing = metrics.enabled
+
+        if timing:
+            start = perf_counter()
+        # end if
+
+        if self._engine == 'fast':
+            tokens = self._fast_scan(input_string)
+        else:
+            tokens = self._scan(input_string)
+        # end if
+
         tokens = self._tokenize_punctuation(tokens)
+
+        if timing:
+            now = perf_counter()
+            metrics.add_time('ro_tokenizer.scan', now - start)
+            start = now
+        # end if
+
         tokens = self._tokenize_dashed_words(tokens)
+
+        if timing:
+            now = perf_counter()
+            metrics.add_time('ro_tokenizer.dashes', now - start)
+            start = now
+        # end if
+
         tokens = self._recognize_phrasal_tokens(tokens, "ABBR")
         tokens = self._recognize_phrasal_tokens(tokens, "MWE")
+
+        if timing:
+            metrics.add_time('ro_tokenizer.phrasal', perf_counter() - start)
+        # end if
+
         glued_tokens = self._glue_tokens(tokens, do_mwes=True)
         
         # We only need the tokens, not their labels
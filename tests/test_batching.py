@@ -0,0 +1,39 @@
+from pathlib import Path
+from ro_batching import compute_lengths, LengthBucketSampler, pad_sequences
+from . import tokenizer
+
+_sentences_file = Path(__file__).parent.parent / 'corola' / 'corola-sentences-1.txt'
+
+
+def test_compute_lengths():
+    texts = _sentences_file.read_text(encoding='utf-8').splitlines()
+    lengths = compute_lengths(texts, tokenizer, batch_size=10)
+
+    assert lengths.tolist() == [len(tokenizer.encode(x).ids) for x in texts]
+
+
+def test_length_bucket_sampler():
+    lengths = [3, 17, 5, 9, 16, 2, 30, 8, 1, 15]
+    sampler = LengthBucketSampler(lengths, batch_size=2, max_tokens=32, bucket_width=8)
+    batches = list(sampler)
+
+    assert sorted([i for b in batches for i in b]) == list(range(len(lengths)))
+
+    for batch in batches:
+        bucket_maxes = set([sampler.bucket_max_length(lengths[i]) for i in batch])
+        assert len(bucket_maxes) == 1
+        assert len(batch) * bucket_maxes.pop() <= 32
+    # end for
+
+    assert sampler.padded_token_count() < len(lengths) * max(lengths)
+
+    shuffled = LengthBucketSampler(lengths, batch_size=2, shuffle=True, seed=1)
+    shuffled_again = LengthBucketSampler(lengths, batch_size=2, shuffle=True, seed=1)
+    assert list(shuffled) == list(shuffled_again)
+
+
+def test_pad_sequences():
+    padded = pad_sequences([[5, 6, 7], [8]], pad_id=0, pad_to=4)
+
+    assert padded['input_ids'].tolist() == [[5, 6, 7, 0], [8, 0, 0, 0]]
+    assert padded['attention_mask'].tolist() == [[1, 1, 1, 0], [1, 0, 0, 0]]
@@ -0,0 +1,88 @@
+import os
+import shutil
+import pytest
+from pathlib import Path
+from corola import get_sentences_from_xml, write_sentence_chunks, get_gold_tokens, get_gold_training_line
+
+_corola_folder = Path(__file__).parent.parent / 'corola'
+_xml_file = _corola_folder / '73_a_145.txt.ss.xml'
+_sentences_file = _corola_folder / 'corola-sentences-1.txt'
+
+
+def _write_sentence_chunks_in_memory(xml_files: list[str], output_folder: Path, chunk_size: int) -> None:
+    """How the chunks were written before streaming."""
+
+    current_sentence_chunk = []
+    file_counter = 1
+
+    for xf in xml_files:
+        sentences = get_sentences_from_xml(xf)
+
+        if len(current_sentence_chunk) + len(sentences) < chunk_size:
+            current_sentence_chunk.extend(sentences)
+        else:
+            with open(output_folder / f'corola-sentences-{file_counter}.txt', mode='w', encoding='utf-8') as f:
+                for snt in current_sentence_chunk:
+                    print(snt, file=f)
+                # end for
+            # end with
+
+            file_counter += 1
+            current_sentence_chunk = list(sentences)
+        # end if
+    # end for
+
+    if current_sentence_chunk:
+        with open(output_folder / f'corola-sentences-{file_counter}.txt', mode='w', encoding='utf-8') as f:
+            for snt in current_sentence_chunk:
+                print(snt, file=f)
+            # end for
+        # end with
+    # end if
+
+
+def test_sentences_from_xml():
+    sentences = get_sentences_from_xml(str(_xml_file))
+
+    with open(_sentences_file, mode='r', encoding='utf-8') as f:
+        assert sentences == [line.rstrip('\n') for line in f]
+    # end with
+
+
+@pytest.mark.parametrize('chunk_size', [50, 84, 85, 170, 1000])
+def test_write_sentence_chunks(tmp_path, chunk_size):
+    xml_folder = tmp_path / 'xml'
+    xml_folder.mkdir()
+    xml_files = []
+
+    for i in range(4):
+        xml_files.append(str(xml_folder / f'{i}.xml'))
+        shutil.copy(_xml_file, xml_files[-1])
+    # end for
+
+    # An empty file as well
+    xml_files.insert(2, str(xml_folder / 'empty.xml'))
+    Path(xml_files[2]).write_text('<?xml version="1.0" encoding="UTF-8"?>\n<file>\n</file>\n')
+
+    expected_folder = tmp_path / 'expected'
+    expected_folder.mkdir()
+    output_folder = tmp_path / 'output'
+    output_folder.mkdir()
+    _write_sentence_chunks_in_memory(xml_files, expected_folder, chunk_size)
+    write_sentence_chunks(xml_files, str(output_folder), chunk_size=chunk_size, process_count=2)
+
+    assert sorted(os.listdir(output_folder)) == sorted(os.listdir(expected_folder))
+
+    for txt in os.listdir(expected_folder):
+        assert (output_folder / txt).read_bytes() == (expected_folder / txt).read_bytes()
+    # end for
+
+
+def test_gold_training_line():
+    pieces = [
+        ('<w>', 'Nu'), ('<w>', '-mi'), ('<spc/>', ' '), ('<w>', 'plac'), ('<spc/>', ' '),
+        ('<mwe>', 'ceea'), ('<mwe>', ' '), ('<mwe>', 'ce'), ('<spc/>', ' '),
+        ('<w>', 'sînt'), ('<spc/>', ' '), ('<abbr>', 'S.U.A.'), ('<pct>', '\u200b'), ('<pct>', ',')
+    ]
+    assert get_gold_tokens(pieces) == ['Nu', '-mi', 'plac', 'ceea ce', 'sînt', 'S.U.A.', '\u200b', ',']
+    assert get_gold_training_line(pieces) == 'Nu_tk_-mi_tk_plac_tk_ceea ce_tk_sunt_tk_S.U.A._tk_,'
@@ -0,0 +1,50 @@
+import pytest
+from ro_corpusio import open_corpus, is_corpus_file, change_compression, CorpusWriter
+
+_lines = ['Sîntem OK şi ar trebui să-mi meargă, în principiu.', '', 'S.U.A. și nr. 1']
+
+
+@pytest.mark.parametrize('suffix', ['', '.gz', '.bz2', '.xz'])
+def test_write_read(tmp_path, suffix):
+    corpus_file = tmp_path / f'corola-sentences-1.txt{suffix}'
+
+    with CorpusWriter(corpus_file, batch_size=2) as f:
+        f.write_lines(_lines)
+    # end with
+
+    assert f.line_count == len(_lines)
+
+    with open_corpus(corpus_file, mode='r') as f:
+        assert [line.rstrip('\n') for line in f] == _lines
+    # end with
+
+
+def test_multi_member_gzip(tmp_path):
+    shard_1 = tmp_path / 'shard-1.txt.gz'
+    shard_2 = tmp_path / 'shard-2.txt.gz'
+    all_shards = tmp_path / 'all.txt.gz'
+
+    with CorpusWriter(shard_1, batch_size=1, multi_member=True) as f:
+        f.write_lines(_lines)
+    # end with
+
+    with CorpusWriter(shard_2, multi_member=True) as f:
+        f.write_lines(_lines)
+    # end with
+
+    all_shards.write_bytes(shard_1.read_bytes() + shard_2.read_bytes())
+
+    with open_corpus(all_shards, mode='r') as f:
+        assert f.read().split('\n') == _lines + _lines + ['']
+    # end with
+
+
+def test_corpus_file_names():
+    assert is_corpus_file('73_a_145.txt.ss.xml', extension='.xml')
+    assert is_corpus_file('73_a_145.txt.ss.xml.bz2', extension='.xml')
+    assert not is_corpus_file('73_a_145.txt.ss.xml.zip', extension='.xml')
+    assert change_compression('out/corola-sentences-1.txt.gz', suffix='.xz') == \
+        'out/corola-sentences-1.txt.xz'
+    assert change_compression('out/corola-sentences-1.txt.gz', suffix='') == \
+        'out/corola-sentences-1.txt'
+    assert change_compression('corola-sentences-1.txt', suffix=None) == 'corola-sentences-1.txt'
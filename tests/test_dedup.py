@@ -0,0 +1,81 @@
+from pathlib import Path
+from ro_dedup import sentence_hash, dedup_corpus, clean_vocab_file
+from ro_corpusio import open_corpus
+from tokenizers.models import WordPiece
+
+_sentences_file = Path(__file__).parent.parent / 'corola' / 'corola-sentences-1.txt'
+
+
+def test_sentence_hash():
+    assert sentence_hash('Sîntem  aici.\n') == sentence_hash('Suntem aici.')
+    assert sentence_hash('Suntem aici.') != sentence_hash('Suntem acolo.')
+
+
+def test_dedup_corpus(tmp_path):
+    lines = _sentences_file.read_text(encoding='utf-8').splitlines()
+    input_folder = tmp_path / 'input'
+    input_folder.mkdir()
+    # Repeats within and across files, and a normalization-only difference
+    file_lines = [
+        lines[:20] + [''] + lines[5:10] + lines[20:25],
+        lines[20:30] + ['', ''] + [lines[0].replace('ș', 'ş')],
+        lines[:30]
+    ]
+    input_files = []
+
+    for i, x in enumerate(file_lines):
+        input_file = input_folder / f'{i}.txt'
+        input_file.write_text('\n'.join(x) + '\n', encoding='utf-8')
+        input_files.append(str(input_file))
+    # end for
+
+    output_folder = tmp_path / 'output'
+    report = dedup_corpus(input_files, str(output_folder), process_count=2,
+                          partition_count=4, compression='.gz')
+
+    # The reference, in-memory algorithm
+    seen = set()
+    expected_lines = []
+
+    for x in file_lines:
+        expected = []
+
+        for line in x:
+            if not line:
+                expected.append(line)
+            elif sentence_hash(line) not in seen:
+                seen.add(sentence_hash(line))
+                expected.append(line)
+            # end if
+        # end for
+
+        expected_lines.append(expected)
+    # end for
+
+    for i, expected in enumerate(expected_lines):
+        with open_corpus(output_folder / f'{i}.txt.gz', mode='r') as f:
+            assert [line.rstrip('\n') for line in f] == expected
+        # end with
+    # end for
+
+    assert report['unique_sentences'] == len(seen) == 30
+    assert report['sentences'] == sum([len([y for y in x if y]) for x in file_lines])
+    assert report['written_lines'] == sum([len(x) for x in expected_lines])
+    assert 0. < report['dedup_ratio'] < 1.
+    # Nothing but the output files is left behind
+    assert sorted([x.name for x in output_folder.iterdir()]) == ['0.txt.gz', '1.txt.gz', '2.txt.gz']
+
+
+def test_clean_vocab_file(tmp_path):
+    vocab_file = tmp_path / 'vocab.txt'
+    vocab_file.write_text('[PAD]\n[UNK]\na\nb\na\n##a\nb\nc\n', encoding='utf-8')
+
+    # Duplicates make gaps in the ids of the WordPiece model
+    assert sorted(WordPiece.read_file(str(vocab_file)).values()) == [0, 1, 4, 5, 6, 7]
+
+    report = clean_vocab_file(str(vocab_file))
+
+    assert report['duplicates'] == [('a', 4), ('b', 6)]
+    assert report['gaps'] == [2, 3]
+    assert vocab_file.read_text(encoding='utf-8') == '[PAD]\n[UNK]\na\nb\n##a\nc\n'
+    assert sorted(WordPiece.read_file(str(vocab_file)).values()) == list(range(6))
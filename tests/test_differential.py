@@ -0,0 +1,49 @@
+import pytest
+from benchmarks.bench_suite import read_corola_sentences
+from ro_differential import DifferentialHarness, adversarial_strings
+from ro_normalizer import RomanianNormalizer
+from ro_pretokenizer import RomanianPreTokenizer
+from . import corola_vocab_path
+
+
+def test_engines_agree():
+    harness = DifferentialHarness(vocab_file=str(corola_vocab_path), max_divergences=3)
+    harness.run(read_corola_sentences())
+    # normalize() and normalize_str() agree on the corpus lines
+    assert harness.results['normalize_parity.reference']['divergences'] == 0
+
+    harness.run(adversarial_strings(300, seed=42))
+
+    for check in ['normalize_str', 'normalize', 'tokenize', 'pre_tokenize_str', 'pipeline', 'encode']:
+        assert harness.results[check]['checked'] > 0
+        assert harness.results[check]['divergences'] == 0, harness.results[check]['first']
+    # end for
+
+    # Known: the \s and \b of re and of the tokenizers regular expressions differ,
+    # e.g. on '\x1c' or on combining marks, and the 'fast' engine keeps the differences
+    assert harness.results['normalize_parity.fast']['divergences'] == \
+        harness.results['normalize_parity.reference']['divergences']
+    # and they do not count as engine divergences
+    assert harness.divergences == 0
+    assert harness.parity_divergences == 2 * harness.results['normalize_parity.reference']['divergences']
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        RomanianNormalizer(engine='turbo')
+    # end with
+
+    with pytest.raises(ValueError):
+        RomanianPreTokenizer(engine='turbo')
+    # end with
+
+
+def test_tag_cache_lexicon_version():
+    pretokenizer = RomanianPreTokenizer(engine='fast')
+    input_text = 'Conform art. 5 din codul de procedură civilă.'
+
+    assert 'codul de procedură civilă' not in [x[0] for x in pretokenizer.pre_tokenize_str(input_text)]
+
+    pretokenizer._romanian_tokenizer.add_mwes(['codul de procedură civilă'])
+
+    assert 'codul de procedură civilă' in [x[0] for x in pretokenizer.pre_tokenize_str(input_text)]
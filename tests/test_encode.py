@@ -0,0 +1,72 @@
+import io
+import json
+from pathlib import Path
+import numpy as np
+from ro_encode import main, encode_stream, JsonlIdsWriter, iter_u32_records, offsets_file_name
+from . import tokenizer, corola_vocab_path
+
+_sentences_file = Path(__file__).parent.parent / 'corola' / 'corola-sentences-1.txt'
+
+
+def _expected_ids() -> list[list[int]]:
+    lines = _sentences_file.read_text(encoding='utf-8').splitlines()
+    # With an empty line, which has no ids
+    lines.insert(3, '')
+
+    return lines, [x.ids for x in tokenizer.encode_batch(lines, add_special_tokens=False)]
+
+
+def test_encode_jsonl():
+    lines, expected = _expected_ids()
+    output = io.BytesIO()
+    stats = encode_stream([x + '\n' for x in lines], str(corola_vocab_path), JsonlIdsWriter(output),
+                          process_count=2, chunk_size=7)
+
+    assert [json.loads(x) for x in output.getvalue().decode('utf-8').splitlines()] == expected
+    assert stats['lines'] == len(lines)
+    assert stats['ids'] == sum([len(x) for x in expected])
+
+
+def test_encode_npy_u32(tmp_path):
+    lines, expected = _expected_ids()
+    input_file = tmp_path / 'input.txt'
+    input_file.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    npy_file = str(tmp_path / 'output.npy')
+    u32_file = str(tmp_path / 'output.u32')
+
+    assert main(['rwpt-encode', '-p', '2', '-c', '5', '-f', 'npy', '-o', npy_file,
+                 str(corola_vocab_path), str(input_file)]) == 0
+    assert main(['rwpt-encode', '-p', '0', '-f', 'u32', '-o', u32_file,
+                 str(corola_vocab_path), str(input_file)]) == 0
+
+    ids = np.load(npy_file)
+    offsets = np.load(offsets_file_name(npy_file))
+
+    assert ids.dtype == np.uint32
+    assert len(offsets) == len(lines) + 1
+    assert [ids[offsets[i]:offsets[i + 1]].tolist() for i in range(len(lines))] == expected
+    assert [x.tolist() for x in iter_u32_records(u32_file)] == expected
+
+    # The index has the byte offset of each record
+    index = np.fromfile(u32_file + '.idx', dtype='<u8')
+    values = np.fromfile(u32_file, dtype='<u4')
+
+    assert len(index) == len(lines) + 1
+    assert index[-1] == values.nbytes
+    assert values[index[5] // 4] == len(expected[5])
+
+
+def test_encode_special_tokens():
+    lines, expected = _expected_ids()
+    output = io.BytesIO()
+    encode_stream([x + '\n' for x in lines], str(corola_vocab_path), JsonlIdsWriter(output),
+                  process_count=2, chunk_size=7, add_special_tokens=True)
+    encoded = [json.loads(x) for x in output.getvalue().decode('utf-8').splitlines()]
+
+    assert len(encoded) == len(lines)
+
+    for ids, expected_ids in zip(encoded, expected):
+        assert ids[0] == tokenizer.cls_token_id
+        assert ids[-1] == tokenizer.sep_token_id
+        assert ids[1:-1] == expected_ids
+    # end for
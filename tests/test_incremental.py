@@ -0,0 +1,44 @@
+import random
+from pathlib import Path
+import pytest
+from ro_incremental import IncrementalEncoder
+from . import tokenizer
+
+_sentences_file = Path(__file__).parent.parent / 'corola' / 'corola-sentences-1.txt'
+_replacements = ['în principiu', 'de fapt', ' ', '\n', '-', 'mi-a', 's-o', 'etc.', 'Sîntem', 'ş',
+                 'î', '.', ',', 'de', 'principiu', 'în', '']
+
+
+def test_random_edits():
+    text = ' '.join(_sentences_file.read_text(encoding='utf-8').splitlines()[:10])
+    encoder = IncrementalEncoder(tokenizer, text)
+    rnd = random.Random(1234)
+
+    for _ in range(100):
+        start = rnd.randint(0, len(encoder.text))
+        end = min(len(encoder.text), start + rnd.choice([0, 0, 1, 3, 10]))
+        first, removed, inserted = encoder.edit(start, end, rnd.choice(_replacements))
+        expected = tokenizer.encode(encoder.text, add_special_tokens=False)
+
+        assert encoder.ids == expected.ids
+        assert encoder.tokens == expected.tokens
+        assert encoder.offsets == expected.offsets
+        assert encoder.ids[first:first + inserted] == expected.ids[first:first + inserted]
+    # end for
+
+    # Only a small window was encoded for most edits
+    assert encoder.stats['full_encodes'] < 10
+    assert encoder.stats['window_chars'] < 100 * len(text) / 5
+
+
+def test_edit_range():
+    encoder = IncrementalEncoder(tokenizer, 'Merg acasă.')
+    encoder.insert(0, 'Sîntem OK şi ')
+    encoder.delete(len(encoder.text) - 1, len(encoder.text))
+
+    assert encoder.text == 'Sîntem OK şi Merg acasă'
+    assert encoder.tokens == tokenizer.encode(encoder.text).tokens
+
+    with pytest.raises(ValueError):
+        encoder.edit(5, 100, 'x')
+    # end with
@@ -0,0 +1,60 @@
+import sys
+import pickle
+import subprocess
+from pathlib import Path
+from rodna.tokenizer import RoTokenizer
+from ro_wordpiece import RoBertWordPieceTokenizer
+from . import corola_vocab_path
+
+
+def test_lazy_transformers_import():
+    code = 'import sys, ro_wordpiece; print("transformers" in sys.modules); ' + \
+        'ro_wordpiece.RoBertPreTrainedTokenizer; print("transformers" in sys.modules)'
+    output = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent,
+                            capture_output=True, text=True, check=True).stdout
+
+    assert output.split() == ['False', 'True']
+
+
+def test_light_import():
+    # ro_dedup, ro_profiler, numpy and tqdm are only needed to train the vocabulary
+    code = 'import sys, ro_wordpiece; print([x for x in ["ro_dedup", "ro_profiler", "numpy", "tqdm"] if x in sys.modules])'
+    output = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent,
+                            capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == '[]'
+
+
+def test_lazy_lexicon():
+    ro_tokenizer = RoTokenizer()
+
+    assert not ro_tokenizer.lexicon_loaded
+    assert ro_tokenizer.tokenize('Merg să-mi iau ceva.') == ['Merg', 'să', '-mi', 'iau', 'ceva', '.']
+    assert ro_tokenizer.lexicon_loaded
+
+    tokenizer = RoBertWordPieceTokenizer.from_file(vocab=str(corola_vocab_path))
+    lexicon_tokenizer = tokenizer._lexicon_pretokenizer._romanian_tokenizer
+
+    assert not lexicon_tokenizer.lexicon_loaded
+    tokenizer.encode('Merg să-mi iau ceva.')
+    assert lexicon_tokenizer.lexicon_loaded
+    assert tokenizer._tokenizer.model.max_input_chars_per_word == lexicon_tokenizer._maxwordlen
+
+
+def test_pickle():
+    tokenizer = RoBertWordPieceTokenizer.from_file(vocab=str(corola_vocab_path))
+    input_text = 'Sîntem OK şi ar trebui să-mi meargă, în principiu.'
+
+    # Before the lexicon is loaded, only the paths and arguments are pickled
+    unpickled = pickle.loads(pickle.dumps(tokenizer))
+    assert not unpickled._lexicon_pretokenizer._romanian_tokenizer.lexicon_loaded
+    assert unpickled.encode(input_text).tokens == tokenizer.encode(input_text).tokens
+
+    # After, the lexicon is pickled too, so it is not read again
+    unpickled = pickle.loads(pickle.dumps(tokenizer))
+    assert unpickled._lexicon_pretokenizer._romanian_tokenizer.lexicon_loaded
+    assert unpickled.encode(input_text).ids == tokenizer.encode(input_text).ids
+
+    # Not read from a file: the vocabulary itself is pickled
+    in_memory = RoBertWordPieceTokenizer(tokenizer.get_vocab())
+    assert pickle.loads(pickle.dumps(in_memory)).encode(input_text).ids == tokenizer.encode(input_text).ids
@@ -0,0 +1,61 @@
+from pathlib import Path
+from benchmarks.bench_suite import read_corola_sentences
+from rodna.tokenizer import RoTokenizer
+from . import ro_pretokenizer
+
+ro_tokenizer = ro_pretokenizer._romanian_tokenizer
+
+
+def _read_lines(input_file: str | Path) -> list[str]:
+    with open(input_file, mode='r', encoding='utf-8') as f:
+        return [line.strip() for line in f]
+    # end with
+
+
+def _term_sets(tokenizer: RoTokenizer) -> tuple[set[str], set[str], set[str]]:
+    """The lexicon, MWE first words and abbreviation first words sets, as they were read before the lookup."""
+
+    data_folder = Path(RoTokenizer.default_wordforms_file).parent
+    mwes = _read_lines(data_folder / 'mwes.txt')
+    abbrs = _read_lines(data_folder / 'abbrs.txt')
+    lexicon = set(_read_lines(tokenizer._wordforms_file) + mwes + abbrs)
+
+    return lexicon, set([x.split('_')[0] for x in mwes]), set([x.split('.')[0] for x in abbrs])
+
+
+def test_predicates():
+    lexicon, mwefirstword, abbrfirstword = _term_sets(ro_tokenizer)
+    words = set([x for sentence in read_corola_sentences() for x in sentence.split()])
+    words.update(lexicon)
+    words.update(mwefirstword)
+    words.update(abbrfirstword)
+    words.update(['', 'ONU', 'onu', 'Onu', 'ROMÂNIA', 'ș.A.M.D.', 'İ', 'ΑΣ', 'ß'])
+
+    for word in list(words):
+        words.update([word.lower(), word.upper(), word.capitalize(), word.swapcase()])
+    # end for
+
+    for word in words:
+        assert ro_tokenizer.is_lex_word(word, exact_match=True) == (word in lexicon)
+        assert ro_tokenizer.is_lex_word(word) == (word in lexicon or word.lower() in lexicon)
+        assert ro_tokenizer.is_mwe_first_word(word) == (word in mwefirstword or word.lower() in mwefirstword)
+        assert ro_tokenizer.is_abbr_first_word(word) == (word in abbrfirstword or word.lower() in abbrfirstword)
+        assert ro_tokenizer.is_abbr(word) == ('.' in word and (word in lexicon or word.lower() in lexicon))
+    # end for
+
+
+def test_saved_sets(tmp_path):
+    # Only the MWEs and abbreviations are first words, but the 'Mî' abbreviation
+    # and the 'mî' word form have the same lowercase form
+    tokenizer = RoTokenizer()
+    tokenizer.add_abbreviations(['Mî', 'Ab.Cd.'])
+    tokenizer.add_wordforms(['mî'])
+    tokenizer.save_lexicon(tmp_path / 'lexicon.json')
+    restored = RoTokenizer()
+    restored.restore_lexicon_file(tmp_path / 'lexicon.json')
+
+    assert restored._lookup == tokenizer._lookup
+    assert restored.is_lex_word('Mî', exact_match=True) and restored.is_lex_word('mî', exact_match=True)
+    assert not restored.is_lex_word('MÎ', exact_match=True) and restored.is_lex_word('MÎ')
+    assert restored.is_abbr_first_word('Ab') and not restored.is_abbr_first_word('AB')
+    assert not restored.is_abbr_first_word('Cd')
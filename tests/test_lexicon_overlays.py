@@ -0,0 +1,56 @@
+import pickle
+from ro_pretokenizer import RomanianPreTokenizer
+from ro_wordpiece import RoBertWordPieceTokenizer
+from . import corola_vocab_path
+
+_input_text = 'Conform art. 5 din codul de procedură civilă, cf. C.P.C. se aplică.'
+
+
+def _pre_tokens(pretokenizer: RomanianPreTokenizer) -> list[str]:
+    return [x[0] for x in pretokenizer.pre_tokenize_str(_input_text)]
+
+
+def test_add_terms():
+    pretokenizer = RomanianPreTokenizer()
+    ro_tokenizer = pretokenizer._romanian_tokenizer
+
+    assert 'codul de procedură civilă' not in _pre_tokens(pretokenizer)
+    assert 'C.P.C.' not in _pre_tokens(pretokenizer)
+
+    assert ro_tokenizer.add_mwes(['codul de procedură civilă', 'codul_civil']) == 2
+    assert ro_tokenizer.add_abbreviations(['cf.', 'C.P.C.', 'cf.']) == 2
+    assert ro_tokenizer.add_wordforms(['supercalifragilisticexpialidocios']) == 1
+    # Already added
+    assert ro_tokenizer.add_mwes(['codul_de_procedură_civilă']) == 0
+
+    assert _pre_tokens(pretokenizer) == [
+        'Conform', 'art.', '5', 'din', 'codul de procedură civilă', ',',
+        'cf.', 'C.P.C.', 'se', 'aplică', '.']
+    assert ro_tokenizer._maxmwelen >= 4
+    assert ro_tokenizer.is_lex_word('codul_civil')
+
+
+def test_overlays(tmp_path):
+    (tmp_path / 'mwes.txt').write_text('codul_de_procedură_civilă\n', encoding='utf-8')
+    (tmp_path / 'abbrs.txt').write_text('cf.\nC.P.C.\n', encoding='utf-8')
+    pre_tokens = _pre_tokens(RomanianPreTokenizer(overlays=[str(tmp_path)]))
+
+    assert 'codul de procedură civilă' in pre_tokens
+    assert 'C.P.C.' in pre_tokens
+
+
+def test_dependent_values():
+    tokenizer = RoBertWordPieceTokenizer.from_file(vocab=str(corola_vocab_path))
+    tokenizer.encode(_input_text)
+    long_word = 'a' * (tokenizer._tokenizer.model.max_input_chars_per_word + 10)
+    tokenizer.add_wordforms([long_word])
+    tokenizer.add_abbreviations(['C.P.C.'])
+    tokenizer.encode(_input_text)
+
+    # max_input_chars_per_word follows the longest word of the lexicon
+    assert tokenizer._tokenizer.model.max_input_chars_per_word == len(long_word)
+    # The added terms are pickled with the lexicon
+    unpickled = pickle.loads(pickle.dumps(tokenizer))
+
+    assert unpickled._lexicon_pretokenizer._romanian_tokenizer.is_lex_word('C.P.C.')
+    assert unpickled.encode(_input_text).tokens == tokenizer.encode(_input_text).tokens
@@ -0,0 +1,136 @@
+import sys
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import rodna.tokenizer
+from ro_metrics import metrics, StageMetrics
+from . import tokenizer, ro_pretokenizer
+
+_input_text = 'Sîntem OK şi ar trebui să-mi meargă, în principiu, cum ar fi în S.U.A. și ☺.'
+
+
+def test_disabled_metrics():
+    metrics.disable()
+    metrics.reset()
+    tokenizer.encode(_input_text)
+
+    assert metrics.snapshot() == {'stages': {}, 'counters': {}}
+
+
+def test_enabled_metrics():
+    metrics.reset()
+    metrics.enable()
+
+    try:
+        tokens = tokenizer.encode(_input_text).tokens
+    finally:
+        metrics.disable()
+    # end try
+
+    snapshot = metrics.snapshot()
+    stages = snapshot['stages']
+    counters = snapshot['counters']
+
+    assert tokens[6] == '-mi'
+    assert stages['encode']['calls'] == 1
+    assert stages['normalizer']['calls'] == 1
+    assert stages['pre_tokenizer']['calls'] >= 1
+
+    for stage in ['ro_tokenizer.scan', 'ro_tokenizer.dashes', 'ro_tokenizer.phrasal',
+                  'pre_tokenizer.resync', 'wordpiece_model']:
+        assert stages[stage]['calls'] >= 1
+        assert stages[stage]['seconds'] <= stages['encode']['seconds']
+    # end for
+
+    assert counters['dash_splits'] == 1
+    assert counters['mwe_matches'] >= 1
+    assert counters['abbr_matches'] == 1
+    assert counters['junk_tokens'] >= 1
+
+    text = metrics.prometheus_text()
+
+    assert '# TYPE rwpt_stage_seconds_total counter' in text
+    assert 'rwpt_stage_calls_total{stage="encode"} 1\n' in text
+    assert 'rwpt_events_total{event="abbr_matches"} 1\n' in text
+    metrics.reset()
+
+
+def test_out_of_sync_event(capsys):
+    metrics.reset()
+    metrics.log_first = 1
+    metrics.log_every = 2
+
+    try:
+        # Not normalized, so the tab is not in the RoTokenizer output
+        for _ in range(4):
+            ro_pretokenizer.pre_tokenize_str('Merg\tacasă.')
+        # end for
+    finally:
+        metrics.log_first = 10
+        metrics.log_every = 1000
+    # end try
+
+    assert metrics.snapshot()['counters']['out_of_sync'] == 4
+    # Occurrences 1, 2 and 4 are logged
+    assert capsys.readouterr().err.count('out of sync') == 3
+    metrics.reset()
+
+
+def test_rodna_metrics_hook():
+    # rodna imports without the modules of the repository root
+    code = 'import sys, rodna.tokenizer; ' + \
+        'print([x for x in ["ro_metrics", "ro_normalizer", "tokenizers"] if x in sys.modules])'
+    output = subprocess.run([sys.executable, '-c', code], cwd=Path(__file__).parent.parent,
+                            capture_output=True, text=True, check=True).stdout
+
+    assert output.strip() == '[]'
+    assert rodna.tokenizer.metrics is metrics
+
+    own_metrics = StageMetrics()
+    own_metrics.enable()
+    rodna.tokenizer.set_metrics(own_metrics)
+
+    try:
+        ro_pretokenizer._romanian_tokenizer.tokenize('Merg acasă, în S.U.A.')
+    finally:
+        rodna.tokenizer.set_metrics(metrics)
+    # end try
+
+    assert own_metrics.snapshot()['stages']['ro_tokenizer.scan']['calls'] == 1
+    assert own_metrics.snapshot()['counters']['abbr_matches'] == 1
+
+    rodna.tokenizer.set_metrics(None)
+
+    try:
+        assert not rodna.tokenizer.metrics.enabled
+        ro_pretokenizer._romanian_tokenizer.tokenize('Merg acasă.')
+    finally:
+        rodna.tokenizer.set_metrics(metrics)
+    # end try
+
+
+def test_metrics_threads():
+    thread_metrics = StageMetrics()
+
+    def _update(_) -> float:
+        # A pool thread may run several tasks
+        pipeline_start = thread_metrics.pipeline_seconds
+
+        for _ in range(10000):
+            thread_metrics.add_time('normalizer', 1.)
+            thread_metrics.increment('junk_tokens')
+        # end for
+
+        return thread_metrics.pipeline_seconds - pipeline_start
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        pipeline_seconds = list(executor.map(_update, range(4)))
+    # end with
+
+    snapshot = thread_metrics.snapshot()
+
+    assert snapshot['stages']['normalizer'] == {'calls': 40000, 'seconds': 40000.}
+    assert snapshot['counters']['junk_tokens'] == 40000
+    # The pipeline time, subtracted from the encode time, is per thread
+    assert pipeline_seconds == [10000.] * 4
+    assert thread_metrics.pipeline_seconds == 0.
@@ -3,6 +3,10 @@ from tokenizers import Tokenizer
 from tokenizers.models import WordPiece
 from tokenizers.normalizers import Normalizer
 from tokenizers.pre_tokenizers import WhitespaceSplit
+from benchmarks.bench_suite import read_corola_sentences
+from ro_corpusio import CorpusWriter
+from ro_differential import adversarial_strings
+from ro_normalizer import RomanianNormalizer, ro_engines
 
 
 def test_normalization_1():
@@ -32,3 +36,30 @@ def test_normalization_2():
     norm_text = normalizer.normalize_str(sequence=input_text)
     
     assert norm_text == 'Suntem aici, pe neîngrădita miriște din România!'
+
+
+def test_normalize_batch(tmp_path):
+    lines = adversarial_strings(200, seed=5) + read_corola_sentences() + \
+        ['', ' \t', 'Sîntem\x00sînt', 'în\nînapoi', 'Romînia\r\n']
+
+    for engine in ro_engines:
+        normalizer = RomanianNormalizer(engine=engine)
+        expected = [normalizer.normalize_str(x) for x in lines]
+
+        assert normalizer.normalize_batch(lines) == expected
+        # Blocks of one line and of a few lines
+        assert normalizer.normalize_batch(lines, block_chars=1) == expected
+        assert normalizer.normalize_batch(iter(lines), block_chars=100) == expected
+    # end for
+
+    # Reading a file splits the lines at '\r' too
+    file_lines = [x.replace('\r', ' ').replace('\n', ' ') for x in lines]
+    input_file = tmp_path / 'input.txt.gz'
+
+    with CorpusWriter(input_file) as f:
+        f.write_lines(file_lines)
+    # end with
+
+    assert ro_normalizer.normalize_file(input_file, tmp_path / 'output.txt', block_lines=7) == len(file_lines)
+    assert (tmp_path / 'output.txt').read_text(encoding='utf-8') == \
+        ''.join([ro_normalizer.normalize_str(x) + '\n' for x in file_lines])
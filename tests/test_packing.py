@@ -0,0 +1,53 @@
+import pytest
+from ro_packing import SequencePacker, pack_dataset
+from ro_shards import encode_corpus, ShardedTokenDataset
+from . import tokenizer, corola_vocab_path
+
+_cls, _sep, _pad = 101, 102, 0
+
+
+def _packer(block_size: int, **kwargs) -> SequencePacker:
+    return SequencePacker(block_size=block_size, cls_id=_cls, sep_id=_sep, pad_id=_pad, **kwargs)
+
+
+def test_pack_cross_documents():
+    packer = _packer(block_size=6)
+    blocks = [x.tolist() for x in packer.pack([[1, 2, 3], [4, 5], [6, 7, 8, 9, 10, 11, 12]], document_starts=[0, 1])]
+
+    assert blocks == [
+        [_cls, 1, 2, 3, _sep, 4],
+        [_cls, 5, _sep, 6, 7, 8],
+        [_cls, 9, 10, 11, 12, _sep]
+    ]
+    assert packer.utilization == 1.
+
+
+@pytest.mark.parametrize('doc_boundary', ['pad', 'drop'])
+def test_pack_document_boundaries(doc_boundary):
+    packer = _packer(block_size=5, doc_boundary=doc_boundary, drop_last=True)
+    blocks = [x.tolist() for x in packer.pack([[1, 2], [3], [4, 5, 6, 7, 8], [9]], document_starts=[0, 1])]
+
+    if doc_boundary == 'pad':
+        assert blocks == [[_cls, 1, 2, _sep, _pad], [_cls, 3, _sep, 4, 5], [_cls, 6, 7, 8, _sep]]
+    else:
+        assert blocks == [[_cls, 3, _sep, 4, 5], [_cls, 6, 7, 8, _sep]]
+    # end if
+
+
+def test_pack_dataset(tmp_path):
+    input_file = tmp_path / 'a.txt'
+    input_file.write_text('Sîntem OK şi ar trebui să-mi meargă, în principiu.\n\nIa s-o vedem de fapt.\n',
+                          encoding='utf-8')
+    encode_corpus([str(input_file)], vocab_file=str(corola_vocab_path), output_folder=str(tmp_path / 'shards'))
+    dataset = ShardedTokenDataset(str(tmp_path / 'shards'))
+    packer = SequencePacker.from_tokenizer(tokenizer, block_size=8, doc_boundary='pad')
+    blocks = pack_dataset(dataset, str(tmp_path / 'packed.bin'), packer)
+    cls_id = tokenizer.token_to_id('[CLS]')
+    sep_id = tokenizer.token_to_id('[SEP]')
+    pad_id = tokenizer.token_to_id('[PAD]')
+
+    assert blocks.shape[1] == 8
+    assert (blocks[:, 0] == cls_id).all()
+
+    content = [x for x in blocks[:, 1:].flatten().tolist() if x != pad_id]
+    assert content == dataset[0].tolist() + [sep_id] + dataset[1].tolist() + [sep_id]
@@ -2,6 +2,7 @@ from tokenizers.pre_tokenizers import PreTokenizer
 from tokenizers import Tokenizer
 from tokenizers.models import WordPiece
 from tokenizers.normalizers import Normalizer
+from ro_pretokenizer import TrainingPreTokenizer, RomanianPreTokenizer
 from . import ro_normalizer, ro_pretokenizer, ro_train_pretokenizer
 
 _unk_token_str = '[UNK]'
@@ -149,3 +150,26 @@ def test_training_pretokenization():
         'al', 'doilea', 'album', ',', '“', 'Wild',
         'Young', 'Hearts', '”', ';'
     ]
+
+
+def test_training_pretokenization_native():
+    input_text = "  Recunoașterea_tk_artistică_tk_vine_tk_odată cu_tk_lansarea_tk__tk_" + \
+        "celui_tk_de-_tk_al_tk_doilea_tk_album_tk_,_tk_“_tk_Wild_tk_Young_tk_Hearts_tk_”_tk_;\r\n"
+    tokenizer = Tokenizer(model=WordPiece(vocab={_unk_token_str: 0}, unk_token=_unk_token_str))
+    tokenizer.pre_tokenizer = PreTokenizer.custom(ro_train_pretokenizer)
+    python_tokens = [x[0] for x in tokenizer.pre_tokenizer.pre_tokenize_str(input_text)]
+    native_normalizer = TrainingPreTokenizer.native_normalizer()
+    native_pretokenizer = TrainingPreTokenizer.native_pre_tokenizer()
+    native_tokens = [x[0] for x in native_pretokenizer.pre_tokenize_str(
+        native_normalizer.normalize_str(input_text))]
+    assert native_tokens == python_tokens
+
+
+def test_wordforms_file(tmp_path):
+    wordforms_file = tmp_path / 'wordforms.txt'
+    wordforms_file.write_text('merge\n', encoding='utf-8')
+    small_pretokenizer = RomanianPreTokenizer(wordforms_file=str(wordforms_file))
+
+    # Neither 'să' nor '-mi' are in the lexicon, so there is no split
+    assert [x[0] for x in small_pretokenizer.pre_tokenize_str('să-mi merge')] == ['să-mi', 'merge']
+    assert [x[0] for x in ro_pretokenizer.pre_tokenize_str('să-mi merge')] == ['să', '-mi', 'merge']
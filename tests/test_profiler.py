@@ -0,0 +1,79 @@
+import threading
+from multiprocessing import Process
+from ro_profiler import SamplingProfiler, run_profiled, merge_profiles, read_collapsed, clear_profiles, \
+    merged_profile_file, top_functions_file
+from . import ro_normalizer, ro_pretokenizer
+
+_input_text = 'Sîntem OK şi ar trebui să-mi meargă, în principiu.'
+
+
+def _busy_pre_tokenize(count: int) -> None:
+    for _ in range(count):
+        ro_pretokenizer.pre_tokenize_str(ro_normalizer.normalize_str(_input_text))
+    # end for
+
+
+def test_sampling_profiler():
+    with SamplingProfiler(interval=0.001) as profiler:
+        _busy_pre_tokenize(200)
+    # end with
+
+    assert sum(profiler.samples.values()) > 0
+    assert any(['_busy_pre_tokenize (test_profiler.py:' in x for stack in profiler.samples for x in stack])
+
+
+def test_main_thread_only():
+    stop_event = threading.Event()
+    idle_thread = threading.Thread(target=stop_event.wait)
+    idle_thread.start()
+
+    try:
+        with SamplingProfiler(interval=0.001) as profiler:
+            _busy_pre_tokenize(100)
+        # end with
+
+        with SamplingProfiler(interval=0.001, all_threads=True) as all_profiler:
+            _busy_pre_tokenize(100)
+        # end with
+    finally:
+        stop_event.set()
+        idle_thread.join()
+    # end try
+
+    # The idle thread waits in Event.wait()
+    assert not any(['Event.wait' in x for stack in profiler.samples for x in stack])
+    assert any(['Event.wait' in x for stack in all_profiler.samples for x in stack])
+
+
+def test_merge_profiles(tmp_path):
+    workers = [Process(target=run_profiled, args=(str(tmp_path), _busy_pre_tokenize, 200)) for _ in range(2)]
+
+    for worker in workers:
+        worker.start()
+    # end for
+
+    for worker in workers:
+        worker.join()
+    # end for
+
+    profile_files = list(tmp_path.glob('profile-*.collapsed'))
+    summary = merge_profiles(str(tmp_path))
+
+    assert len(profile_files) == 2
+    assert 'from [2] processes' in summary
+    assert (tmp_path / top_functions_file).read_text(encoding='utf-8') == summary
+    # The merged profile is the sum of the worker profiles
+    merged = read_collapsed(tmp_path / merged_profile_file)
+    assert sum(merged.values()) == sum([sum(read_collapsed(x).values()) for x in profile_files])
+    assert any(['RoTokenizer.tokenize' in x for x in merged])
+
+
+def test_clear_profiles(tmp_path):
+    run_profiled(str(tmp_path), _busy_pre_tokenize, 20)
+    merge_profiles(str(tmp_path))
+    (tmp_path / 'notes.txt').write_text('kept', encoding='utf-8')
+
+    # The profiles of an earlier run in a reused folder are not merged again
+    assert clear_profiles(str(tmp_path)) == 3
+    assert [x.name for x in tmp_path.iterdir()] == ['notes.txt']
+    assert 'from [0] processes' in merge_profiles(str(tmp_path))
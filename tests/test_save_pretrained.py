@@ -0,0 +1,82 @@
+import json
+import pickle
+import pytest
+from ro_wordpiece import RoBertWordPieceTokenizer, pretrained_config_file
+from ro_pretrained import RoBertPreTrainedTokenizer
+from . import tokenizer, corola_vocab_path
+
+_input_texts = [
+    'Sîntem OK şi ar trebui să-mi meargă, în principiu.',
+    'Ia s-o vedem de fapt, dacă pîrîie cum trebuie.'
+]
+
+
+def test_save_pretrained(tmp_path):
+    saved_files = tokenizer.save_pretrained(str(tmp_path))
+    loaded = RoBertWordPieceTokenizer.from_pretrained(str(tmp_path))
+
+    assert sorted([x.name for x in tmp_path.iterdir()]) == \
+        sorted(['rwpt_config.json', 'rwpt_pipeline.json', 'vocab.json', 'lexicon.json'])
+    assert len(saved_files) == 4
+    # The lexicon is loaded from the artifact
+    assert loaded._lexicon_pretokenizer._romanian_tokenizer.lexicon_loaded
+    # The vocab.txt has duplicate terms, i.e. unused ids, and an empty term
+    assert loaded.get_vocab() == tokenizer.get_vocab()
+    assert loaded._tokenizer.model.max_input_chars_per_word == \
+        tokenizer._tokenizer.model.max_input_chars_per_word
+
+    for text in _input_texts:
+        expected = tokenizer.encode(text, pair=text)
+        result = loaded.encode(text, pair=text)
+
+        assert result.tokens == expected.tokens
+        assert result.ids == expected.ids
+        assert result.offsets == expected.offsets
+        assert loaded.decode(result.ids) == tokenizer.decode(expected.ids)
+    # end for
+
+    # Pickled as the artifact folder
+    assert pickle.loads(pickle.dumps(loaded)).encode(_input_texts[0]).ids == \
+        tokenizer.encode(_input_texts[0]).ids
+
+
+def test_pickle_added_terms(tmp_path):
+    tokenizer.save_pretrained(str(tmp_path))
+    loaded = RoBertWordPieceTokenizer.from_pretrained(str(tmp_path))
+    loaded.add_mwes(['la Xqzwvbrt-ulmenea'])
+    text = 'Mergem la Xqzwvbrt-ulmenea mâine.'
+
+    # The terms added after loading are not in the artifact folder
+    unpickled = pickle.loads(pickle.dumps(loaded))
+    assert unpickled._lexicon_pretokenizer._romanian_tokenizer.is_lex_word('la_Xqzwvbrt-ulmenea')
+    assert unpickled.encode(text).tokens == loaded.encode(text).tokens
+
+
+def test_format_version(tmp_path):
+    tokenizer.save_pretrained(str(tmp_path))
+    config_file = tmp_path / pretrained_config_file
+    config = json.loads(config_file.read_text(encoding='utf-8'))
+    config['format_version'] += 1
+    config_file.write_text(json.dumps(config), encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        RoBertWordPieceTokenizer.from_pretrained(str(tmp_path))
+    # end with
+
+
+def test_pretrained_tokenizer_save_pretrained(tmp_path):
+    pretrained = RoBertPreTrainedTokenizer.from_pretrained(str(corola_vocab_path), model_max_length=32)
+    saved_files = pretrained.save_pretrained(str(tmp_path))
+    loaded = RoBertPreTrainedTokenizer.from_pretrained(str(tmp_path))
+
+    # Only the written files
+    assert sorted(saved_files) == sorted([str(x) for x in tmp_path.iterdir()])
+    assert (tmp_path / pretrained_config_file) in list(tmp_path.iterdir())
+    # The WordPiece tokenizer is loaded from the artifact, not from a vocab.txt
+    assert loaded._ro_wordpiece_tokenizer._pretrained_folder == str(tmp_path)
+    assert loaded.model_max_length == 32
+
+    for text in _input_texts:
+        assert loaded(text)['input_ids'] == pretrained(text)['input_ids']
+        assert loaded.tokenize(text) == pretrained.tokenize(text)
+    # end for
@@ -0,0 +1,47 @@
+from ro_segmenter import RomanianSentenceSegmenter
+from ro_traindata import process_file
+from . import ro_pretokenizer
+
+ro_segmenter = RomanianSentenceSegmenter(ro_pretokenizer._romanian_tokenizer, max_sentence_chars=80)
+
+
+def test_abbreviations():
+    input_text = 'Conform art. 5 din Legea nr. 10, în S.U.A. se aplică. Scriitorul I. L. Caragiale ' + \
+        'a scris mult! Ce faci? Bine… „Vino aici!" a spus el. (Nu a venit.) Mere, pere ș.a.m.d. Gata.'
+
+    assert ro_segmenter.segment(input_text) == [
+        'Conform art. 5 din Legea nr. 10, în S.U.A. se aplică.',
+        'Scriitorul I. L. Caragiale a scris mult!',
+        'Ce faci?',
+        'Bine…',
+        '„Vino aici!" a spus el.',
+        '(Nu a venit.)',
+        'Mere, pere ș.a.m.d.',
+        'Gata.'
+    ]
+
+
+def test_max_sentence_chars():
+    input_text = ' '.join(['cuvânt'] * 100) + '. ' + 'x' * 200
+
+    for sentence in ro_segmenter.segment(input_text):
+        assert 0 < len(sentence) <= 80
+    # end for
+
+    assert ''.join(ro_segmenter.segment(input_text)).replace(' ', '') == input_text.replace(' ', '')
+
+
+def test_process_file(tmp_path):
+    input_folder = tmp_path / 'raw'
+    input_folder.mkdir()
+    (input_folder / 'raw.txt').write_text(
+        'Sîntem aici. Am plecat în S.U.A. cu nr. 5 pe tricou.\n\nEl a venit? Da.\n', encoding='utf-8')
+    process_file(str(input_folder / 'raw.txt'), str(tmp_path), max_sentence_chars=1000)
+
+    assert (tmp_path / 'raw.txt').read_text(encoding='utf-8').splitlines() == [
+        'Suntem_tk_aici_tk_.',
+        'Am_tk_plecat_tk_în_tk_S.U.A._tk_cu_tk_nr._tk_5_tk_pe_tk_tricou_tk_.',
+        '',
+        'El_tk_a_tk_venit_tk_?',
+        'Da_tk_.'
+    ]
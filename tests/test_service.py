@@ -0,0 +1,192 @@
+import json
+import asyncio
+import pytest
+from ro_service import AsyncRoTokenizer, TokenizerServer
+from . import tokenizer, corola_vocab_path
+
+_input_texts = [
+    'Sîntem OK şi ar trebui să-mi meargă, în principiu.',
+    'Ia s-o vedem de fapt, dacă pîrîie cum trebuie.',
+    'Într-o zi cu soare, și-a făcut-o și mi-a dus-o.'
+] * 10
+
+
+async def _http_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        method: str, path: str, body: dict | None = None) -> tuple[int, dict]:
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write((f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n' +
+                  f'Content-Length: {len(payload)}\r\n\r\n').encode('latin-1') + payload)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+
+    while True:
+        line = await reader.readline()
+
+        if line == b'\r\n':
+            break
+        # end if
+
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.lower()] = value.strip()
+    # end while
+
+    return status, json.loads(await reader.readexactly(int(headers['content-length'])))
+
+
+@pytest.mark.parametrize('process_count', [0, 2])
+def test_async_encode(process_count):
+    async def _run():
+        async with AsyncRoTokenizer(str(corola_vocab_path), max_batch_size=8, max_delay_ms=20.,
+                                    process_count=process_count) as ro_tokenizer:
+            results = await asyncio.gather(*[ro_tokenizer.encode(x) for x in _input_texts])
+            batch_results = await ro_tokenizer.encode_batch(_input_texts[:3])
+
+            return results, batch_results, ro_tokenizer.batch_count
+        # end with
+
+    results, batch_results, batch_count = asyncio.run(_run())
+
+    for text, result in zip(_input_texts, results):
+        encoding = tokenizer.encode(text)
+        assert result['ids'] == encoding.ids
+        assert result['tokens'] == encoding.tokens
+        assert [tuple(x) for x in result['offsets']] == encoding.offsets
+    # end for
+
+    assert batch_results == results[:3]
+    # Concurrent requests were batched
+    assert batch_count < len(_input_texts)
+
+
+def test_backpressure():
+    async def _run():
+        async with AsyncRoTokenizer(str(corola_vocab_path), max_batch_size=2, max_delay_ms=50.,
+                                    max_queue_size=2, process_count=0) as ro_tokenizer:
+            requests = [asyncio.create_task(ro_tokenizer.encode(x, wait=False)) for x in _input_texts]
+            results = await asyncio.gather(*requests, return_exceptions=True)
+        # end with
+
+        return results
+
+    results = asyncio.run(_run())
+    rejected = [x for x in results if isinstance(x, asyncio.QueueFull)]
+
+    assert rejected
+    assert len(rejected) < len(_input_texts)
+    assert all([isinstance(x, dict) for x in results if not isinstance(x, asyncio.QueueFull)])
+
+
+def test_batch_backpressure():
+    async def _run():
+        async with AsyncRoTokenizer(str(corola_vocab_path), max_batch_size=2, max_delay_ms=50.,
+                                    max_queue_size=4, process_count=0) as ro_tokenizer:
+            requests = [asyncio.create_task(ro_tokenizer.encode_batch(_input_texts[:3], wait=False))
+                        for _ in range(5)]
+            results = await asyncio.gather(*requests, return_exceptions=True)
+        # end with
+
+        return results, ro_tokenizer.item_count
+
+    results, item_count = asyncio.run(_run())
+    accepted = [x for x in results if not isinstance(x, asyncio.QueueFull)]
+
+    assert len(accepted) < len(results)
+    assert all([len(x) == 3 for x in accepted])
+    # The texts of the rejected batches were not queued
+    assert item_count == 3 * len(accepted)
+
+
+def test_http_server(tmp_path):
+    async def _run(unix_path):
+        async with AsyncRoTokenizer(str(corola_vocab_path), process_count=0) as ro_tokenizer:
+            server = TokenizerServer(ro_tokenizer)
+            await server.start(unix_path=unix_path)
+
+            if unix_path is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            else:
+                reader, writer = await asyncio.open_unix_connection(unix_path)
+            # end if
+
+            # All on the same keep-alive connection
+            responses = [
+                await _http_request(reader, writer, 'GET', '/health'),
+                await _http_request(reader, writer, 'POST', '/encode', {'text': _input_texts[0]}),
+                await _http_request(reader, writer, 'POST', '/encode', {'texts': _input_texts[:2]}),
+                await _http_request(reader, writer, 'POST', '/encode', {'txt': 'x'}),
+                await _http_request(reader, writer, 'GET', '/encode'),
+                await _http_request(reader, writer, 'GET', '/unknown')
+            ]
+            writer.close()
+            await server.close()
+        # end with
+
+        return responses
+
+    for unix_path in [None, str(tmp_path / 'rwpt.sock')]:
+        responses = asyncio.run(_run(unix_path))
+
+        assert responses[0] == (200, {'status': 'ok'})
+        assert responses[1][0] == 200
+        assert responses[1][1]['ids'] == tokenizer.encode(_input_texts[0]).ids
+        assert responses[2][0] == 200
+        assert [x['ids'] for x in responses[2][1]['encodings']] == \
+            [x.ids for x in tokenizer.encode_batch(_input_texts[:2])]
+        assert [x[0] for x in responses[3:]] == [400, 405, 404]
+    # end for
+
+
+def test_http_errors():
+    async def _run():
+        async with AsyncRoTokenizer(str(corola_vocab_path), max_queue_size=4,
+                                    process_count=0) as ro_tokenizer:
+            server = TokenizerServer(ro_tokenizer)
+            await server.start()
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            responses = [await _http_request(reader, writer, 'POST', '/encode', {'texts': _input_texts[:5]})]
+            # The body was read, the connection is still usable
+            responses.append(await _http_request(reader, writer, 'POST', '/encode', {'texts': _input_texts[:4]}))
+            # Like a worker process that died
+            ro_tokenizer._executor.shutdown()
+            responses.append(await _http_request(reader, writer, 'POST', '/encode', {'text': _input_texts[0]}))
+            writer.close()
+            await server.close()
+        # end with
+
+        return responses
+
+    responses = asyncio.run(_run())
+
+    assert [x[0] for x in responses] == [413, 200, 500]
+
+
+def test_http_bad_content_length():
+    async def _run():
+        async with AsyncRoTokenizer(str(corola_vocab_path), process_count=0) as ro_tokenizer:
+            server = TokenizerServer(ro_tokenizer)
+            await server.start()
+            responses = []
+
+            for content_length in ['abc', '-5', '']:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(('POST /encode HTTP/1.1\r\nHost: localhost\r\n' +
+                              f'Content-Length: {content_length}\r\n\r\n{{}}').encode('latin-1'))
+                await writer.drain()
+                # The server answers and closes the connection
+                responses.append(await asyncio.wait_for(reader.read(), timeout=10.))
+                writer.close()
+            # end for
+
+            await server.close()
+        # end with
+
+        return responses
+
+    for response in asyncio.run(_run()):
+        head, _, body = response.partition(b'\r\n\r\n')
+
+        assert head.startswith(b'HTTP/1.1 400 Bad Request')
+        assert b'Connection: close' in head
+        assert json.loads(body) == {'error': 'Bad Content-Length'}
+    # end for
@@ -0,0 +1,92 @@
+import os
+import gzip
+import pickle
+import pytest
+from pathlib import Path
+from ro_shards import encode_corpus, ShardedTokenDataset
+from . import tokenizer, corola_vocab_path
+
+_sentences_file = Path(__file__).parent.parent / 'corola' / 'corola-sentences-1.txt'
+
+
+def _write_input_files(input_folder: Path) -> tuple[list[str], list[str]]:
+    lines = _sentences_file.read_text(encoding='utf-8').splitlines()
+    # Two documents in the first file
+    (input_folder / 'a.txt').write_text('\n'.join(lines[:10] + [''] + lines[10:20]) + '\n', encoding='utf-8')
+    (input_folder / 'b.txt').write_text('\n'.join(lines[20:]) + '\n', encoding='utf-8')
+    (input_folder / 'c.txt').write_text('', encoding='utf-8')
+
+    return [str(input_folder / x) for x in ['a.txt', 'b.txt', 'c.txt']], lines
+
+
+def test_encode_corpus(tmp_path):
+    input_files, lines = _write_input_files(tmp_path)
+    shards_folder = tmp_path / 'shards'
+    encode_corpus(input_files, vocab_file=str(corola_vocab_path),
+                  output_folder=str(shards_folder), process_count=2)
+    dataset = ShardedTokenDataset(str(shards_folder), verify=True)
+
+    assert len(dataset) == len(lines)
+    assert list(dataset.document_starts) == [0, 10, 20]
+
+    for i in [0, 9, 10, 19, 20, len(lines) - 1]:
+        ids = tokenizer.encode(lines[i], add_special_tokens=False).ids
+        assert dataset[i].tolist() == ids
+        assert dataset.sequence_length(i) == len(ids)
+    # end for
+
+    assert int(dataset.sequence_lengths().sum()) == dataset.token_count
+
+    dataset_copy = pickle.loads(pickle.dumps(dataset))
+    assert dataset_copy[-1].tolist() == dataset[-1].tolist()
+
+
+def test_encode_corpus_resume(tmp_path):
+    input_files, _ = _write_input_files(tmp_path)
+    shards_folder = tmp_path / 'shards'
+    encode_corpus(input_files, vocab_file=str(corola_vocab_path), output_folder=str(shards_folder))
+    a_mtime = os.stat(shards_folder / 'a.txt.ids').st_mtime_ns
+
+    # Corrupt shard 'b.txt', it has to be encoded again
+    with open(shards_folder / 'b.txt.ids', mode='r+b') as f:
+        f.write(b'\xff\xff\xff\xff')
+    # end with
+
+    manifest = encode_corpus(input_files, vocab_file=str(corola_vocab_path),
+                             output_folder=str(shards_folder))
+
+    assert os.stat(shards_folder / 'a.txt.ids').st_mtime_ns == a_mtime
+    assert [x['name'] for x in manifest['shards']] == ['a.txt', 'b.txt', 'c.txt']
+    ShardedTokenDataset(str(shards_folder), verify=True)
+
+
+def test_same_shard_name(tmp_path):
+    input_files, _ = _write_input_files(tmp_path)
+
+    with gzip.open(tmp_path / 'a.txt.gz', mode='wt', encoding='utf-8') as f:
+        f.write('Altă propoziție.\n')
+    # end with
+
+    # a.txt and a.txt.gz would write the same shard
+    with pytest.raises(ValueError):
+        encode_corpus(input_files + [str(tmp_path / 'a.txt.gz')], vocab_file=str(corola_vocab_path),
+                      output_folder=str(tmp_path / 'shards'))
+    # end with
+
+
+def test_encode_corpus_special_tokens(tmp_path):
+    input_files, lines = _write_input_files(tmp_path)
+    shards_folder = tmp_path / 'shards'
+    manifest = encode_corpus(input_files, vocab_file=str(corola_vocab_path),
+                             output_folder=str(shards_folder), add_special_tokens=True)
+    dataset = ShardedTokenDataset(str(shards_folder), verify=True)
+
+    assert manifest['add_special_tokens']
+    assert manifest['special_tokens'] == ['[CLS]', '[SEP]']
+
+    for i in [0, 10, len(lines) - 1]:
+        ids = dataset[i].tolist()
+        assert ids[0] == tokenizer.cls_token_id
+        assert ids[-1] == tokenizer.sep_token_id
+        assert ids[1:-1] == tokenizer.encode(lines[i], add_special_tokens=False).ids
+    # end for
@@ -0,0 +1,60 @@
+import unicodedata
+from ro_traindata import filter_weird_tokens, filter_weird_line, _allowed_unicode_cats, \
+    process_file, process_files
+
+
+def _filter_weird_tokens_by_category(tokens: list[str]) -> list[str]:
+    result = []
+
+    for token in tokens:
+        crt_token = ''.join([c for c in token if unicodedata.category(c) in _allowed_unicode_cats])
+
+        if crt_token:
+            result.append(crt_token)
+        # end if
+    # end for
+
+    return result
+
+
+_weird_tokens = [
+    'Mâine', '​', 'ș́i', '\x00a\x07', '▼▲', '', '_tk_', '﻿',
+    '’', 'nr.', '­', 'x‍y', '\U0001f642', '', 'de fapt', ' '
+]
+
+
+def test_filter_weird_tokens():
+    assert filter_weird_tokens(tokens=_weird_tokens) == \
+        _filter_weird_tokens_by_category(tokens=_weird_tokens)
+
+
+def test_filter_weird_line():
+    for i in range(len(_weird_tokens)):
+        for j in range(i, len(_weird_tokens) + 1):
+            tokens = _weird_tokens[i:j]
+            assert filter_weird_line(tokens=tokens) == \
+                '_tk_'.join(_filter_weird_tokens_by_category(tokens=tokens))
+        # end for
+    # end for
+
+
+def test_process_files_more_than_processes(tmp_path):
+    input_folder = tmp_path / 'input'
+    input_folder.mkdir()
+    input_files = []
+
+    for i, text in enumerate(['Sîntem aici.', 'Ea a mers la şcoală.', 'În principiu, da.']):
+        input_file = input_folder / f'file-{i}.txt'
+        input_file.write_text(text + '\n', encoding='utf-8')
+        input_files.append(str(input_file))
+    # end for
+
+    (tmp_path / 'output').mkdir()
+    (tmp_path / 'expected').mkdir()
+    # The workers of the second and third files start when the first one ends
+    process_files(input_files, str(tmp_path / 'output'), process_count=1)
+    process_file(input_files[2], str(tmp_path / 'expected'))
+
+    assert sorted([x.name for x in (tmp_path / 'output').iterdir()]) == ['file-0.txt', 'file-1.txt', 'file-2.txt']
+    assert (tmp_path / 'output' / 'file-2.txt').read_text(encoding='utf-8') == \
+        (tmp_path / 'expected' / 'file-2.txt').read_text(encoding='utf-8')
@@ -0,0 +1,44 @@
+from pathlib import Path
+import numpy as np
+import pytest
+from ro_vocabprune import read_vocab, count_vocab_usage, coverage_curve, select_kept_ids, write_pruned_vocab
+from ro_wordpiece import RoBertWordPieceTokenizer
+from . import corola_vocab_path
+
+_sentences_file = Path(__file__).parent.parent / 'corola' / 'corola-sentences-1.txt'
+
+
+def test_prune_vocab(tmp_path):
+    vocab = read_vocab(str(corola_vocab_path))
+    counts = count_vocab_usage([str(_sentences_file)], vocab_file=str(corola_vocab_path), max_lines=50)
+
+    assert counts.shape == (len(vocab),)
+    assert counts[vocab.index('[CLS]')] == 0
+
+    curve = coverage_curve(counts, [10, 100, len(vocab)])
+    assert curve[0][1] < curve[1][1] < curve[2][1] == 1.
+
+    kept_ids = select_kept_ids(vocab, counts, target_size=len(vocab) // 2)
+    kept_terms = set([vocab[i] for i in kept_ids])
+
+    assert list(kept_ids) == sorted(kept_ids)
+    assert set(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']) <= kept_terms
+    assert all([x in kept_terms for x in vocab if len(x) == 1 or (x.startswith('##') and len(x) == 3)])
+    # The most used entry is kept
+    assert vocab[int(counts.argmax())] in kept_terms
+
+    # The single characters cannot be pruned
+    with pytest.raises(ValueError):
+        select_kept_ids(vocab, counts, target_size=10)
+    # end with
+
+    write_pruned_vocab(vocab, kept_ids, str(tmp_path))
+    remap = np.load(tmp_path / 'remap.npy')
+    pruned_vocab = read_vocab(str(tmp_path / 'vocab.txt'))
+
+    for old_id in kept_ids:
+        assert pruned_vocab[remap[old_id]] == vocab[old_id]
+    # end for
+
+    pruned_tokenizer = RoBertWordPieceTokenizer.from_file(vocab=str(tmp_path / 'vocab.txt'))
+    assert pruned_tokenizer.encode('Sîntem OK şi ar trebui să-mi meargă.').tokens[0] == 'Suntem'
@@ -0,0 +1,50 @@
+import random
+from collections import Counter
+from ro_vocabsample import reservoir_sample, draw_sample, sample_sizes, train_until_converged
+
+
+def _write_file(path, prefix: str, line_count: int) -> str:
+    path.write_text(''.join([f'{prefix}_tk_{i}_tk_.\n' for i in range(line_count)]), encoding='utf-8')
+    return str(path)
+
+
+def test_reservoir_sample():
+    counts = Counter()
+
+    for seed in range(2000):
+        sample = reservoir_sample(range(50), 10, random.Random(seed))
+        assert len(set(sample)) == 10
+        counts.update(sample)
+    # end for
+
+    # Each line is drawn with a probability of 10 / 50
+    assert all([300 < counts[x] < 500 for x in range(50)])
+    assert sorted(reservoir_sample(range(5), 10, random.Random(1))) == list(range(5))
+    assert sample_sizes(100, 1000) == [100, 200, 400, 800, 1000]
+
+
+def test_draw_sample(tmp_path):
+    files = [_write_file(tmp_path / 'a.txt', 'a', 300), _write_file(tmp_path / 'b.txt', 'b', 100)]
+
+    assert draw_sample(files, 40, seed=5) == draw_sample(list(reversed(files)), 40, seed=5)
+    assert draw_sample(files, 40, seed=5) != draw_sample(files, 40, seed=6)
+
+    sample = draw_sample(files, 40, method='stratified', seed=5)
+
+    # Proportional to the line counts, also in the prefixes
+    assert len(sample) == 40
+    assert sum([x.startswith('a') for x in sample]) == 30
+    assert 12 <= sum([x.startswith('a') for x in sample[:20]]) <= 18
+
+
+def test_train_until_converged(tmp_path):
+    files = [_write_file(tmp_path / 'a.txt', 'ana_tk_are_tk_mere', 200)]
+    tokenizer, report = train_until_converged(files, vocab_size=500, min_frequency=1, start_size=20,
+                                              max_size=160, eval_size=20, min_overlap=0.5, max_drift=0.5)
+
+    assert report['lines'] == 160
+    assert report['eval_lines'] == 20
+    assert report['chosen_size'] == report['steps'][-1]['size']
+    assert report['steps'][0]['size'] == 20
+    assert report['steps'][-1]['overlap'] >= 0.5
+    assert tokenizer.get_vocab_size() > 0